@@ -43,8 +43,12 @@ if os.path.exists(CONFIG_FILE) and os.path.exists(WAL_CONFIG):
         config = json.load(f)
     WALLPAPERS_DIR = configwal.get('wallpapers_dir', WALLPAPERS_DIR_DEFAULT)
     VERTICAL = config.get('vertical', False)  # Use saved value or False as default
+    FILE_INDEX_ROOTS = config.get('file_index_roots', [HOME_DIR])
+    FILE_INDEX_IGNORE = config.get('file_index_ignore', [])
 else:
     WALLPAPERS_DIR = WALLPAPERS_DIR_DEFAULT
     VERTICAL = False  # Default value when no config exists
+    FILE_INDEX_ROOTS = [HOME_DIR]  # Directories the launcher searches for files
+    FILE_INDEX_IGNORE = []  # Name patterns left out of the file index
 
 DOCK_ICON_SIZE = 28
@@ -31,6 +31,10 @@ def run_updater():
 if __name__ == "__main__":
     setproctitle.setproctitle(APP_NAME)
 
+    # Before any widget exists, so fabric's own requests are counted too
+    from utils.ipc_stats import count_fabric_requests
+    count_fabric_requests()
+
     if not os.path.isfile(CONFIG_FILE):
         exec_shell_command_async(f"python {get_relative_path('../config/config.py')}")
 
@@ -90,5 +94,22 @@ if __name__ == "__main__":
         )
     app.set_css = set_css
 
+    def ipc_stats():
+        from utils.hyprland_events import HyprlandEventDispatcher
+        from utils.ipc_stats import IPCStats
+
+        stats = IPCStats.get_initial().snapshot()
+        stats["events"] = HyprlandEventDispatcher.get_initial().stats()
+        return stats
+    app.ipc_stats = ipc_stats
+    def pixbuf_stats():
+        from utils.pixbuf_cache import PixbufCache
+
+        return PixbufCache.get_initial().stats()
+    app.pixbuf_stats = pixbuf_stats
+    # Starts the periodic summary when HYPRFABRICATED_IPC_STATS_INTERVAL is set
+    from utils.ipc_stats import IPCStats
+    IPCStats.get_initial()
+
     app.set_css()
     app.run()
@@ -2,20 +2,27 @@ import json
 from gi.repository import GLib, Gtk, Gdk
 import cairo
 from utils.icon_resolver import IconResolver
-from utils.occlusion import check_occlusion
+from utils.occlusion import OcclusionEngine
+from utils.icon_loader import IconLoader
+from utils.hyprland_events import HyprlandEventDispatcher
+from utils.hyprland_ipc import HyprlandIPC
+from utils.hyprland_state import HyprlandState
 from fabric.widgets.box import Box
 from fabric.widgets.button import Button
 from fabric.widgets.image import Image
 from fabric.widgets.eventbox import EventBox
 from fabric.widgets.wayland import WaylandWindow as Window
 from fabric.hyprland.widgets import get_hyprland_connection
-from fabric.utils import exec_shell_command, exec_shell_command_async, idle_add, remove_handler, get_relative_path
-from fabric.utils.helpers import get_desktop_applications
+from fabric.utils import exec_shell_command_async, idle_add, remove_handler, get_relative_path
+from utils.app_resolver import AppResolver, normalize_window_class
+from utils.desktop_apps import DesktopAppRegistry
 
 import config.data as data
 import logging
 
 OCCLUSION = 36 + data.DOCK_ICON_SIZE
+# Hyprland events that change which apps the dock shows
+DOCK_EVENTS = frozenset(("activewindow", "openwindow", "closewindow", "changefloatingmode"))
 
 def read_config():
     """Read and return the full configuration from the JSON file, handling missing file."""
@@ -27,7 +34,7 @@ def read_config():
         # Migration: Convert old format (simple string array) to new format (array of objects with full app data)
         if "pinned_apps" in data and data["pinned_apps"] and isinstance(data["pinned_apps"][0], str):
             # Get all desktop apps for lookup during migration
-            all_apps = get_desktop_applications()
+            all_apps = DesktopAppRegistry.get_initial().apps
             app_map = {app.name: app for app in all_apps if app.name}
 
             # This is the old format - convert it with full app data
@@ -87,18 +94,25 @@ class Dock(Window):
         Dock._instances.append(self)
         self.config = read_config()
         self.conn = get_hyprland_connection()
-        self.icon = IconResolver()
+        self.state = HyprlandState.get_initial()
+        self.ipc = HyprlandIPC.get_initial()
+        self.icon = IconResolver.get_initial()
+        self.icon_loader = IconLoader.get_initial()
+        self.icon_loader.prefetch_sizes.add(data.DOCK_ICON_SIZE)
         self.pinned = self.config.get("pinned_apps", [])
         self.config_path = get_relative_path("../config/dock.json")
-        self.app_map = {}  # Initialize the app map
-        self._all_apps = get_desktop_applications() # Get all apps for lookup
-        # Create app identifiers mapping
-        self.app_identifiers = self._build_app_identifiers_map()
+        self.apps = DesktopAppRegistry.get_initial()
+        self.resolver = AppResolver.get_initial()
+        self.update_app_map()
+        self.apps.connect("changed", self._on_apps_changed)
         self.is_hidden = False
         self.hide_id = None
         self._arranger_handler = None
         self._drag_in_progress = False  # Drag lock flag
         self.is_hovered = False
+        # Buttons are kept across updates, keyed by app identifier
+        self._buttons = {}
+        self.separator = Box(orientation="v" if not data.VERTICAL else "h", v_expand=not data.VERTICAL, h_expand=data.VERTICAL, name="dock-separator")
 
         # Set up UI containers
         self.view = Box(name="viewport", orientation="h" if not data.VERTICAL else "v", spacing=4)
@@ -135,6 +149,11 @@ class Dock(Window):
         self.view.connect("drag-begin", self.on_drag_begin)
         self.view.connect("drag-end", self.on_drag_end)
 
+        # Occlusion is pushed by the engine instead of polled
+        self.occlusion = OcclusionEngine.get_initial()
+        self.occlusion.register("dock", ("bottom", OCCLUSION) if not data.VERTICAL else ("right", OCCLUSION))
+        self.occlusion.connect("occlusion-changed", self._on_occlusion_changed)
+
         # Initialization
         if self.conn.ready:
             self.update_dock()
@@ -143,56 +162,19 @@ class Dock(Window):
             self.conn.connect("event::ready", self.update_dock)
             self.conn.connect("event::ready", self.check_hide)
 
-        for ev in ("activewindow", "openwindow", "closewindow", "changefloatingmode"):
-            self.conn.connect(f"event::{ev}", self.update_dock)
-        self.conn.connect("event::workspace", self.check_hide)
+        # Bursts of events (opening one app fires several) rebuild the dock once
+        self.events = HyprlandEventDispatcher.get_initial()
+        self.events.subscribe(DOCK_EVENTS | {"workspace"}, self.on_hyprland_events)
 
-        GLib.timeout_add(250, self.check_occlusion_state)
         # Monitor dock.json for changes
         GLib.timeout_add_seconds(1, self.check_config_change)
 
-    def _build_app_identifiers_map(self):
-        """Build a mapping of app identifiers (class names, executables, names) to DesktopApp objects"""
-        identifiers = {}
-        for app in self._all_apps:
-            # Map by name (lowercase)
-            if app.name:
-                identifiers[app.name.lower()] = app
-
-            # Map by display name
-            if app.display_name:
-                identifiers[app.display_name.lower()] = app
-
-            # Map by window class if available
-            if app.window_class:
-                identifiers[app.window_class.lower()] = app
-
-            # Map by executable name if available
-            if app.executable:
-                exe_basename = app.executable.split('/')[-1].lower()
-                identifiers[exe_basename] = app
-
-            # Map by command line if available (without parameters)
-            if app.command_line:
-                cmd_base = app.command_line.split()[0].split('/')[-1].lower()
-                identifiers[cmd_base] = app
-
-        return identifiers
-
-    def _normalize_window_class(self, class_name):
-        """Normalize window class by removing common suffixes and lowercase."""
-        if not class_name:
-            return ""
-
-        normalized = class_name.lower()
-
-        # Remove common suffixes
-        suffixes = [".bin", ".exe", ".so", "-bin", "-gtk"]
-        for suffix in suffixes:
-            if normalized.endswith(suffix):
-                normalized = normalized[:-len(suffix)]
-
-        return normalized
+    def on_hyprland_events(self, events):
+        """Handle one coalesced burst of Hyprland events"""
+        if events & DOCK_EVENTS:
+            self.update_dock()
+        if "workspace" in events:
+            self.check_hide()
 
     def _classes_match(self, class1, class2):
         """Check if two window class names match with stricter comparison."""
@@ -200,8 +182,8 @@ class Dock(Window):
             return False
 
         # Normalize both classes
-        norm1 = self._normalize_window_class(class1)
-        norm2 = self._normalize_window_class(class2)
+        norm1 = normalize_window_class(class1)
+        norm2 = normalize_window_class(class2)
 
         # Direct match after normalization
         if norm1 == norm2:
@@ -244,11 +226,8 @@ class Dock(Window):
 
         self.is_hovered = False
         self.delay_hide()
-        # Immediate occlusion check on true leave using simplified format
-        occlusion_region = ("bottom", OCCLUSION) if not data.VERTICAL else ("right", OCCLUSION)
-        # Only add occlusion style if not dragging an icon.
-        if not self._drag_in_progress and (check_occlusion(occlusion_region) or not self.view.get_children()):
-            self.wrapper.add_style_class("occluded")
+        # Immediate occlusion check on true leave
+        self.check_occlusion_state()
         return True
 
     # Enhanced app lookup methods
@@ -257,83 +236,57 @@ class Dock(Window):
 
         If app_identifier is a dict, it will use all available keys for matching.
         """
-        if not app_identifier:
-            return None
-
-        # If we got a dict object with app data (new format)
-        if isinstance(app_identifier, dict):
-            # Try to find by all available identifiers in priority order
-            for key in ["window_class", "executable", "command_line", "name", "display_name"]:
-                if key in app_identifier and app_identifier[key]:
-                    app = self.find_app_by_key(app_identifier[key])
-                    if app:
-                        return app
-            return None
-
-        # Simple string identifier (backward compatibility)
-        return self.find_app_by_key(app_identifier)
+        return self.resolver.find_app(app_identifier, fuzzy=True)
 
     def find_app_by_key(self, key_value):
         """Find app by a single identifier value"""
-        if not key_value:
-            return None
-
-        # Try direct lookup in our identifiers map
-        normalized_id = str(key_value).lower()
-        if normalized_id in self.app_identifiers:
-            return self.app_identifiers[normalized_id]
-
-        # Try fuzzy matching - find apps where the identifier is part of their names
-        for app in self._all_apps:
-            if app.name and normalized_id in app.name.lower():
-                return app
-            if app.display_name and normalized_id in app.display_name.lower():
-                return app
-            if app.window_class and normalized_id in app.window_class.lower():
-                return app
-            if app.executable and normalized_id in app.executable.lower():
-                return app
-            if app.command_line and normalized_id in app.command_line.lower():
-                return app
-
-        return None
+        return self.resolver.find(key_value, fuzzy=True)
 
     # Update the dock's app map using DesktopApp objects from the system.
     def update_app_map(self):
         """Updates the mapping of commands to DesktopApp objects."""
-        self._all_apps = get_desktop_applications() # Refresh all apps
+        self._all_apps = self.apps.apps
         self.app_map = {app.name: app for app in self._all_apps if app.name} # Map app names to DesktopApp objects
-        self.app_identifiers = self._build_app_identifiers_map()  # Rebuild identifiers map
 
-    def create_button(self, app_identifier, instances):
-        """Create dock application button"""
-        desktop_app = self.find_app(app_identifier) # Find app by identifier
-        icon_img = None
-        display_name = None
+    def _on_apps_changed(self, *_):
+        self.update_app_map()
+        self.update_dock()
 
-        if desktop_app:
-            icon_img = desktop_app.get_icon_pixbuf(size=data.DOCK_ICON_SIZE)
-            display_name = desktop_app.display_name or desktop_app.name
+    @staticmethod
+    def _button_key(app_identifier):
+        """Stable key used to reuse a dock button across updates"""
+        if isinstance(app_identifier, dict):
+            for key in ["name", "window_class", "executable", "command_line", "display_name"]:
+                if app_identifier.get(key):
+                    return str(app_identifier[key]).lower()
+            return ""
+        return str(app_identifier).lower()
 
-        # Extract identifier for fallback
+    @staticmethod
+    def _icon_key(app_identifier, desktop_app):
+        """Everything the button icon depends on"""
         id_value = app_identifier["name"] if isinstance(app_identifier, dict) else app_identifier
+        if desktop_app is None:
+            return (None, None, id_value)
+        return (desktop_app.name, desktop_app.icon_name, id_value)
 
-        if not icon_img:
-            # Fallback to IconResolver with the app command
-            icon_img = self.icon.get_icon_pixbuf(id_value, data.DOCK_ICON_SIZE) # Use identifier for fallback
+    def _tooltip_for(self, app_identifier, instances, desktop_app):
+        display_name = (desktop_app.display_name or desktop_app.name) if desktop_app else None
+        id_value = app_identifier["name"] if isinstance(app_identifier, dict) else app_identifier
+        tooltip = display_name or (id_value if isinstance(id_value, str) else "Unknown")
+        if not display_name and instances and instances[0].title:
+            tooltip = instances[0].title
+        return tooltip
 
-        if not icon_img: # Double check after exec path try
-            # Fallback icon if no DesktopApp is found
-            icon_img = self.icon.get_icon_pixbuf("application-x-executable-symbolic", data.DOCK_ICON_SIZE)
-            # Final fallback
-            if not icon_img:
-                icon_img = self.icon.get_icon_pixbuf("image-missing", data.DOCK_ICON_SIZE)
+    def create_button(self, app_identifier, instances):
+        """Create dock application button"""
+        desktop_app = self.find_app(app_identifier) # Find app by identifier
 
-        items = [Image(pixbuf=icon_img)]
+        # Extract identifier for fallback
+        id_value = app_identifier["name"] if isinstance(app_identifier, dict) else app_identifier
 
-        tooltip = display_name or (id_value if isinstance(id_value, str) else "Unknown")
-        if not display_name and instances and instances[0].get("title"):
-            tooltip = instances[0]["title"]
+        image = Image()
+        items = [image]
 
         button = Button(
             child= Box(
@@ -342,8 +295,9 @@ class Dock(Window):
                 h_align="center",
                 children=items,
             ),
-            on_clicked=lambda *a: self.handle_app(app_identifier, instances, desktop_app), # Pass desktop_app as well
-            tooltip_text=tooltip,
+            # Read the data from the button, it is updated in place on every refresh
+            on_clicked=lambda b: self.handle_app(b.app_identifier, b.instances, b.desktop_app),
+            tooltip_text=self._tooltip_for(app_identifier, instances, desktop_app),
             name="dock-app-button",
         )
 
@@ -351,6 +305,9 @@ class Dock(Window):
         button.app_identifier = app_identifier
         button.desktop_app = desktop_app
         button.instances = instances
+        button.icon_key = self._icon_key(app_identifier, desktop_app)
+        button.icon_image = image
+        self._load_icon(button, id_value, desktop_app)
 
         if instances:
             button.add_style_class("instance") # Style running apps
@@ -376,6 +333,112 @@ class Dock(Window):
         button.connect("enter-notify-event", self._on_child_enter)
         return button
 
+    def _load_icon(self, button, id_value, desktop_app):
+        """Resolved and decoded in the background, a placeholder is shown until then"""
+        size = data.DOCK_ICON_SIZE
+        placeholder = self.icon_loader.placeholder(size)
+
+        def show(pixbuf):
+            pixbuf = pixbuf or placeholder
+            if button.icon_image.get_pixbuf() is not pixbuf:
+                button.icon_image.set_from_pixbuf(pixbuf)
+            # Failed loads are asked for again on a later reconcile
+            button.icon_missing = pixbuf is placeholder
+
+        def loaded(pixbuf):
+            button.icon_loading = False
+            # The button may have been removed while its icon was loading
+            if button in self._buttons.values():
+                show(pixbuf)
+
+        pixbuf = self.icon_loader.load(id_value, size, loaded, desktop_app)
+        button.icon_loading = pixbuf is None
+        show(pixbuf)
+
+    def update_button(self, button, app_identifier, instances, desktop_app):
+        """Refresh an existing button in place, touching only what changed"""
+        button.app_identifier = app_identifier
+        button.desktop_app = desktop_app
+
+        if bool(instances) != bool(button.instances):
+            if instances:
+                button.add_style_class("instance")
+            else:
+                button.remove_style_class("instance")
+        button.instances = instances
+
+        tooltip = self._tooltip_for(app_identifier, instances, desktop_app)
+        if button.get_tooltip_text() != tooltip:
+            button.set_tooltip_text(tooltip)
+
+    def _get_button(self, key, app_identifier, instances):
+        """Reuse the button for this app if there is one, otherwise create it"""
+        button = self._buttons.get(key)
+        if button is not None:
+            desktop_app = self.find_app(app_identifier)
+            if button.icon_key == self._icon_key(app_identifier, desktop_app):
+                self.update_button(button, app_identifier, instances, desktop_app)
+                if button.icon_missing and not button.icon_loading:
+                    # Still the placeholder, the loader decides whether it's time to retry
+                    id_value = app_identifier["name"] if isinstance(app_identifier, dict) else app_identifier
+                    self._load_icon(button, id_value, desktop_app)
+                return button
+            # The resolved app changed, so the icon has to be rebuilt
+            button.destroy()
+        button = self.create_button(app_identifier, instances)
+        self._buttons[key] = button
+        return button
+
+    def reconcile(self, entries):
+        """
+        Bring the viewport in line with `entries` (pinned, open) with as few
+        widget operations as possible: insert, remove or reorder only what changed.
+        """
+        pinned_entries, open_entries = entries
+        # key -> [app_identifier, instances, is_pinned], in dock order
+        merged = {}
+        for is_pinned, section in ((True, pinned_entries), (False, open_entries)):
+            for app_identifier, instances in section:
+                key = self._button_key(app_identifier)
+                if key not in merged:
+                    merged[key] = [app_identifier, list(instances), is_pinned]
+                    continue
+                # Two entries resolved to the same app, its windows join the first one
+                kept = merged[key][1]
+                addresses = {inst.address for inst in kept}
+                kept.extend(inst for inst in instances if inst.address not in addresses)
+
+        seen = set(merged)
+        pinned_buttons, open_buttons = [], []
+        for key, (app_identifier, instances, is_pinned) in merged.items():
+            target = pinned_buttons if is_pinned else open_buttons
+            target.append(self._get_button(key, app_identifier, instances))
+
+        # Drop buttons of apps that are gone
+        for key in [k for k in self._buttons if k not in seen]:
+            self._buttons.pop(key).destroy()
+
+        children = list(pinned_buttons)
+        # Only add separator if both pinned and open buttons exist
+        if pinned_buttons and open_buttons:
+            children.append(self.separator)
+        children += open_buttons
+
+        current = self.view.get_children()
+        if current == children:
+            return False
+
+        for child in current:
+            if child not in children:
+                self.view.remove(child)
+        attached = set(self.view.get_children())
+        for index, child in enumerate(children):
+            if child not in attached:
+                self.view.add(child)
+                child.show_all()
+            self.view.reorder_child(child, index)
+        return True
+
     # Enhanced app launching with multiple fallbacks
     def handle_app(self, app_identifier, instances, desktop_app=None):
         """Handle application button clicks with improved fallbacks"""
@@ -411,13 +474,11 @@ class Dock(Window):
             # Handle window switching for running instances
             focused = self.get_focused()
             idx = next(
-                (i for i, inst in enumerate(instances) if inst["address"] == focused),
+                (i for i, inst in enumerate(instances) if inst.address == focused),
                 -1,
             )
             next_inst = instances[(idx + 1) % len(instances)]
-            exec_shell_command(
-                f"hyprctl dispatch focuswindow address:{next_inst['address']}"
-            )
+            self.ipc.dispatch(f"focuswindow address:{next_inst.address}")
 
     def _on_child_enter(self, widget, event):
         """Maintain hover state when entering child widgets"""
@@ -459,18 +520,17 @@ class Dock(Window):
         """Determine if dock should auto-hide"""
         clients = self.get_clients()
         current_ws = self.get_workspace()
-        ws_clients = [w for w in clients if w["workspace"]["id"] == current_ws]
+        ws_clients = [w for w in clients if w.workspace_id == current_ws]
 
         if not ws_clients:
             self.toggle_dock(show=True)
-        elif any(not w.get("floating") and not w.get("fullscreen") for w in ws_clients):
+        elif any(not w.floating and not w.fullscreen for w in ws_clients):
             self.delay_hide()
         else:
             self.toggle_dock(show=True)
 
     def update_dock(self, *args):
         """Refresh dock contents and clear drag lock."""
-        self.update_app_map()  # Update app map before creating buttons
         arranger_handler = getattr(self, "_arranger_handler", None)
         if arranger_handler:
             remove_handler(arranger_handler)
@@ -483,15 +543,15 @@ class Dock(Window):
             window_id = None
 
             # Try initialClass first (most reliable)
-            if class_name := c.get("initialClass", "").lower():
+            if class_name := c.initial_class.lower():
                 window_id = class_name
 
             # Try class second (fallback)
-            elif class_name := c.get("class", "").lower():
+            elif class_name := c.class_name.lower():
                 window_id = class_name
 
             # Use title as last resort if both class identifiers are missing
-            elif title := c.get("title", "").lower():
+            elif title := c.title.lower():
                 # Extract app name from title (common format: "App Name - Document")
                 possible_name = title.split(" - ")[0].strip()
                 if possible_name and len(potential_name) > 1:  # Avoid single letter app names
@@ -504,18 +564,18 @@ class Dock(Window):
                 window_id = "unknown-app"
 
             # Log window for debugging purposes
-            logging.debug(f"Window detected: {window_id} (from {c.get('initialClass', '')}/{c.get('class', '')}/{c.get('title', '')})")
+            logging.debug(f"Window detected: {window_id} (from {c.initial_class}/{c.class_name}/{c.title})")
 
             # Add to running windows - store with both original and normalized keys
             running_windows.setdefault(window_id, []).append(c)
 
             # Also store with normalized key for more flexible matching
-            normalized_id = self._normalize_window_class(window_id)
+            normalized_id = normalize_window_class(window_id)
             if normalized_id != window_id:
                 running_windows.setdefault(normalized_id, []).extend(running_windows[window_id])
 
         # Map pinned apps to their running instances
-        pinned_buttons = []
+        pinned_entries = []
         used_window_classes = set()  # Track which window classes we've already assigned
 
         for app_data in self.pinned:
@@ -562,7 +622,7 @@ class Dock(Window):
                     break
 
                 # Try normalized version
-                normalized = self._normalize_window_class(identifier)
+                normalized = normalize_window_class(identifier)
                 if normalized in running_windows:
                     instances = running_windows[normalized]
                     matched_class = normalized
@@ -585,35 +645,26 @@ class Dock(Window):
             if matched_class:
                 used_window_classes.add(matched_class)
                 # Also mark the normalized version as used
-                used_window_classes.add(self._normalize_window_class(matched_class))
+                used_window_classes.add(normalize_window_class(matched_class))
                 logging.debug(f"Matched pinned app {app_data} to running instances via {matched_class}")
 
-            # Create button for this pinned app with any found instances
-            pinned_buttons.append(self.create_button(app_data, instances))
+            # Keep this pinned app with any found instances
+            pinned_entries.append((app_data, instances))
 
         # For any remaining window classes that aren't assigned to pinned apps
-        open_buttons = []
+        open_entries = []
         for class_name, instances in running_windows.items():
             if class_name not in used_window_classes:
                 # Enhanced app identification for running windows
                 app = None
 
                 # Try multiple methods to find the correct app
-                # 1. Direct lookup by class name
-                app = self.app_identifiers.get(class_name)
+                # 1. Class name, exact, normalized and then as a substring
+                app = self.find_app_by_key(class_name)
 
-                # 2. Try with normalized class name
-                if not app:
-                    norm_class = self._normalize_window_class(class_name)
-                    app = self.app_identifiers.get(norm_class)
-
-                # 3. Try with our more robust find_app method
-                if not app:
-                    app = self.find_app_by_key(class_name)
-
-                # 4. Try using window title which often contains app name
-                if not app and instances and instances[0].get("title"):
-                    title = instances[0].get("title", "")
+                # 2. Try using window title which often contains app name
+                if not app and instances and instances[0].title:
+                    title = instances[0].title
                     # Extract potential app name from title (common format: "App Name - Document")
                     potential_name = title.split(" - ")[0].strip()
                     if len(potential_name) > 2:  # Avoid very short names
@@ -633,18 +684,14 @@ class Dock(Window):
                     # Fallback to just class name
                     identifier = class_name
 
-                open_buttons.append(self.create_button(identifier, instances))
+                open_entries.append((identifier, instances))
 
-        # Assemble dock layout
-        children = pinned_buttons
-        # Only add separator if both pinned and open buttons exist
-        if pinned_buttons and open_buttons:
-            children += [Box(orientation="v" if not data.VERTICAL else "h", v_expand=not data.VERTICAL, h_expand=data.VERTICAL, name="dock-separator")]
-        children += open_buttons
-
-        self.view.children = children
-        idle_add(self._update_size)
+        # Apply only the differences to the dock layout, and only relayout
+        # when the set or order of buttons changed
+        if self.reconcile((pinned_entries, open_entries)):
+            idle_add(self._update_size)
         self._drag_in_progress = False  # Clear the drag lock
+        self.check_occlusion_state()
 
     def _update_size(self):
         """Update window size based on content"""
@@ -654,41 +701,32 @@ class Dock(Window):
 
     def get_clients(self):
         """Get current client list"""
-        try:
-            return json.loads(self.conn.send_command("j/clients").reply.decode())
-        except json.JSONDecodeError:
-            return []
+        return self.state.clients
 
     def get_focused(self):
         """Get focused window address"""
-        try:
-            return json.loads(
-                self.conn.send_command("j/activewindow").reply.decode()
-            ).get("address", "")
-        except json.JSONDecodeError:
-            return ""
+        active_window = self.state.active_window
+        return active_window.address if active_window else ""
 
     def get_workspace(self):
         """Get current workspace ID"""
-        try:
-            return json.loads(
-                self.conn.send_command("j/activeworkspace").reply.decode()
-            ).get("id", 0)
-        except json.JSONDecodeError:
-            return 0
+        active_workspace = self.state.active_workspace
+        return active_workspace.id if active_workspace else 0
+
+    def _on_occlusion_changed(self, _, name, occluded):
+        if name == "dock":
+            self.check_occlusion_state()
 
     def check_occlusion_state(self):
-        """Periodic occlusion check"""
+        """Apply the occlusion state reported by the engine"""
         # Skip occlusion check if hovered or dragging an icon
         if self.is_hovered or self._drag_in_progress:
             self.wrapper.remove_style_class("occluded")
-            return True
-        occlusion_region = ("bottom", OCCLUSION) if not data.VERTICAL else ("right", OCCLUSION)
-        if check_occlusion(occlusion_region) or not self.view.get_children():
+            return
+        if self.occlusion.is_occluded("dock") or not self.view.get_children():
             self.wrapper.add_style_class("occluded")
         else:
             self.wrapper.remove_style_class("occluded")
-        return True
 
     def _find_drag_target(self, widget):
         """Find valid drag target in viewport"""
@@ -733,10 +771,9 @@ class Dock(Window):
                                  ((source_index < separator_index and target_index > separator_index) or
                                   (source_index > separator_index and target_index < separator_index)))
 
-            # Move the item in the children list
-            child = children.pop(source_index)
-            children.insert(target_index, child)
-            self.view.children = children  # Update view immediately
+            # Move the item in place
+            child = children[source_index]
+            self.view.reorder_child(child, target_index)
 
             # Update pinned apps configuration
             self.update_pinned_apps(skip_update=not cross_section_drag)
@@ -786,11 +823,12 @@ class Dock(Window):
                             self.update_dock()  # Update dock after file save
                         elif instances: # Close if running and unpinned
                             # Close running app (if not pinned)
-                            address = instances[0].get("address")
+                            address = instances[0].address
                             if address:
-                                exec_shell_command(f"hyprctl dispatch closewindow address:{address}")
-                                self.update_dock()  # Update dock after closing window
+                                # The closewindow event updates the dock once the window is gone
+                                self.ipc.dispatch(f"closewindow address:{address}")
             self._drag_in_progress = False  # Clear the drag lock
+            self.check_occlusion_state()
 
         GLib.idle_add(process_drag_end)  # Deferred execution with idle_add
 
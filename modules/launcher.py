@@ -1,5 +1,3 @@
-import operator
-from collections.abc import Iterator
 from fabric.widgets.box import Box
 from fabric.widgets.label import Label
 from fabric.widgets.button import Button
@@ -7,22 +5,58 @@ from fabric.widgets.entry import Entry
 from fabric.widgets.image import Image
 from fabric.widgets.scrolledwindow import ScrolledWindow
 from fabric.utils import (
-    DesktopApp,
-    get_desktop_applications,
-    idle_add,
-    remove_handler,
     exec_shell_command_async,
     get_relative_path,
 )
-from gi.repository import GLib, Gdk
+from gi.repository import GLib, Gdk, Gtk
 import modules.icons as icons
-import config.data as data
 import json
-import os
-import re
-import math
 import subprocess
 from modules.dock import Dock  # Import the Dock class
+from utils.calculator import CalcHistory, CalculatorError, evaluate, format_result
+from utils.frecency import UsageStore
+from utils.launcher_providers import Provider, SearchPipeline, SearchResult, default_providers
+
+
+# Height of the results area, and how many rows could ever fit in it
+VIEWPORT_HEIGHT = 105
+SLOT_POOL_SIZE = 8
+SLOT_SPACING = 4
+# Used to count rows until a slot has been allocated
+ROW_HEIGHT_GUESS = 32
+
+
+class AppSlot(Button):
+    """A result row, rebound to another result instead of being rebuilt."""
+
+    def __init__(self, on_launch, **kwargs):
+        self.result = None
+        self.icon = Image(name="app-icon", h_align="start")
+        self.label = Label(
+            name="app-label",
+            ellipsization="end",
+            v_align="center",
+            h_align="center",
+        )
+        super().__init__(
+            name="app-slot-button",
+            child=Box(
+                name="app-slot-box",
+                orientation="h",
+                spacing=10,
+                children=[self.icon, self.label],
+            ),
+            on_clicked=lambda *_: self.result is not None and on_launch(self.result),
+            **kwargs,
+        )
+
+    def bind(self, result: SearchResult):
+        if result is self.result:
+            return
+        self.result = result
+        self.icon.set_from_pixbuf(result.icon(24))
+        self.label.set_label(result.title)
+        self.set_tooltip_text(result.subtitle)
 
 
 class AppLauncher(Box):
@@ -37,18 +71,41 @@ class AppLauncher(Box):
         self.notch = kwargs["notch"]
         self.selected_index = -1  # Track the selected item index
 
-        self._arranger_handler: int = 0
-        self._all_apps = get_desktop_applications()
+        self.usage = UsageStore.get_initial()
 
-        # Calculator history initialization
-        self.calc_history_path = f"{data.CACHE_DIR}/calc.json"
-        if os.path.exists(self.calc_history_path):
-            with open(self.calc_history_path, "r") as f:
-                self.calc_history = json.load(f)
-        else:
-            self.calc_history = []
+        # Every provider searches on its own worker thread, and its results
+        # are merged into the list as soon as they arrive
+        self.providers = default_providers()
+        self.search_pipeline = SearchPipeline(
+            self.providers, self._on_provider_results, self._on_search_settled
+        )
+        self._provider_results: dict[Provider, list[SearchResult]] = {}
+        self._selection_moved = False
+        self._activate_when_ready = False
+
+        # Calculator history, read the first time calculator mode is used
+        self.calc = CalcHistory()
+        self._calc_buttons: list | None = None
 
         self.viewport = Box(name="viewport", spacing=4, orientation="v")
+
+        # Result rows are a fixed pool of slots rebound to whichever results
+        # are scrolled into view, the scrollbar works on model rows
+        self._results: list[SearchResult] = []
+        self._first_row = 0
+        self._row_height = 0
+        self._scroll_remainder = 0.0
+        self._syncing_scrollbar = False
+        self._slots = [AppSlot(self.launch_app) for _ in range(SLOT_POOL_SIZE)]
+        self._slots[0].connect("size-allocate", self._on_slot_allocated)
+        self.slot_box = Box(name="app-slots", spacing=SLOT_SPACING, orientation="v", h_expand=True)
+        self.scroll_adjustment = Gtk.Adjustment()
+        self.scroll_adjustment.connect("value-changed", self._on_scrollbar_moved)
+        self.scrollbar = Gtk.Scrollbar(
+            orientation=Gtk.Orientation.VERTICAL, adjustment=self.scroll_adjustment
+        )
+        self.scrollbar.set_no_show_all(True)
+        self.app_list = Box(orientation="h", children=[self.slot_box, self.scrollbar])
         self.search_entry = Entry(
             name="search-entry",
             placeholder="Search Applications...",
@@ -64,13 +121,16 @@ class AppLauncher(Box):
             on_key_press_event=self.on_search_entry_key_press,  # Handle key presses
         )
         self.search_entry.props.xalign = 0.5
+        self.calc_preview = Label(name="calc-preview", h_align="start", ellipsization="end")
+        self.calc_preview.set_no_show_all(True)
         self.scrolled_window = ScrolledWindow(
             name="scrolled-window",
             spacing=10,
-            min_content_size=(450, 105),
-            max_content_size=(450, 105),
+            min_content_size=(450, VIEWPORT_HEIGHT),
+            max_content_size=(450, VIEWPORT_HEIGHT),
             child=self.viewport,
         )
+        self.scrolled_window.connect("scroll-event", self._on_scroll_event)
         self.configpath = get_relative_path("../config/config.py")
         self.header_box = Box(
             name="header_box",
@@ -102,6 +162,7 @@ class AppLauncher(Box):
             orientation="v",
             children=[
                 self.header_box,
+                self.calc_preview,
                 self.scrolled_window,
             ],
         )
@@ -111,13 +172,20 @@ class AppLauncher(Box):
         self.add(self.launcher_box)
         self.show_all()
 
+    @property
+    def calc_history(self) -> list[str]:
+        return self.calc.entries
+
     def close_launcher(self):
+        self.calc_preview.set_visible(False)
+        self.search_pipeline.cancel()  # Drop searches still in flight
+        self._activate_when_ready = False
         self.viewport.children = []
+        self._results = []
         self.selected_index = -1  # Reset selection
         self.notch.close_notch()
 
     def open_launcher(self):
-        self._all_apps = get_desktop_applications()
         self.arrange_viewport()
 
     def arrange_viewport(self, query: str = ""):
@@ -125,46 +193,105 @@ class AppLauncher(Box):
             # In calculator mode, update history view once (not per keystroke)
             self.update_calculator_viewport()
             return
-        remove_handler(self._arranger_handler) if self._arranger_handler else None
-        self.viewport.children = []
-        self.selected_index = -1  # Clear selection when viewport changes
-
-        filtered_apps_iter = iter(
-            sorted(
-                [
-                    app
-                    for app in self._all_apps
-                    if query.casefold()
-                    in (
-                        (app.display_name or "")
-                        + (" " + app.name + " ")
-                        + (app.generic_name or "")
-                    ).casefold()
-                ],
-                key=lambda app: (app.display_name or "").casefold(),
-            )
+        self.calc_preview.set_visible(False)
+        # The old rows stay up until the first provider of this query answers
+        self._provider_results = {}
+        self.search_pipeline.search(query)
+
+    def _on_provider_results(self, provider: Provider, results: list[SearchResult]):
+        first = not self._provider_results
+        selected = None
+        if not first and self._selection_moved and 0 <= self.selected_index < len(self._results):
+            selected = self._results[self.selected_index]
+        self._provider_results[provider] = results
+
+        # Stable sort, equal scores keep provider order and then each provider's own order
+        self._results = sorted(
+            (result for p in self.providers for result in self._provider_results.get(p, ())),
+            key=lambda result: -result.score,
         )
-        should_resize = operator.length_hint(filtered_apps_iter) == len(self._all_apps)
-
-        self._arranger_handler = idle_add(
-            lambda apps_iter: self.add_next_application(apps_iter)
-            or self.handle_arrange_complete(should_resize, query),
-            filtered_apps_iter,
-            pin=True,
+        if self.app_list.get_parent() is None:
+            self.viewport.children = [self.app_list]
+        query = self.search_entry.get_text()
+        if first:
+            self._first_row = 0
+            self._selection_moved = False
+        if selected is not None and selected in self._results:
+            # Rows arriving later must not move what the user picked
+            self.update_selection(self._results.index(selected))
+            return
+        # Only auto-select first item if query exists
+        self.selected_index = 0 if query.strip() != "" and self._results else -1
+        self.render_slots()
+        if first and not query.strip():
+            GLib.idle_add(self.resize_viewport)
+
+    def _on_search_settled(self):
+        if not self._provider_results:
+            self._results = []
+            self.selected_index = -1
+            self.render_slots()
+        if self._activate_when_ready:
+            self._activate_when_ready = False
+            self.on_search_entry_activate(self.search_entry.get_text())
+
+    def visible_rows(self) -> int:
+        row_height = self._row_height or ROW_HEIGHT_GUESS
+        rows = (VIEWPORT_HEIGHT + SLOT_SPACING) // (row_height + SLOT_SPACING)
+        return max(1, min(SLOT_POOL_SIZE, rows))
+
+    def render_slots(self):
+        """Bind the pooled slots to the rows from `_first_row` on."""
+        rows = self.visible_rows()
+        self._first_row = max(0, min(self._first_row, len(self._results) - rows))
+        shown = self._slots[: max(0, min(rows, len(self._results) - self._first_row))]
+        if self.slot_box.get_children() != shown:
+            self.slot_box.children = shown
+        for offset, slot in enumerate(shown):
+            index = self._first_row + offset
+            slot.bind(self._results[index])
+            context = slot.get_style_context()
+            if index == self.selected_index:
+                context.add_class("selected")
+            else:
+                context.remove_class("selected")
+
+        self._syncing_scrollbar = True
+        self.scroll_adjustment.configure(
+            self._first_row, 0, max(len(self._results), rows), 1, rows, rows
         )
+        self._syncing_scrollbar = False
+        self.scrollbar.set_visible(len(self._results) > rows)
 
-    def handle_arrange_complete(self, should_resize, query):
-        if should_resize:
-            self.resize_viewport()
-        # Only auto-select first item if query exists
-        if query.strip() != "" and self.viewport.get_children():
-            self.update_selection(0)
-        return False
+    def _on_slot_allocated(self, slot, allocation):
+        # Rows are only counted once a slot reports its real height
+        if allocation.height > 1 and allocation.height != self._row_height:
+            self._row_height = allocation.height
+            GLib.idle_add(lambda: self.render_slots() or False)
 
-    def add_next_application(self, apps_iter: Iterator[DesktopApp]):
-        if not (app := next(apps_iter, None)):
-            return False
-        self.viewport.add(self.bake_application_slot(app))
+    def _on_scrollbar_moved(self, adjustment):
+        if self._syncing_scrollbar:
+            return
+        first_row = int(adjustment.get_value())
+        if first_row != self._first_row:
+            self._first_row = first_row
+            self.render_slots()
+
+    def _on_scroll_event(self, _, event):
+        if self.search_entry.get_text().startswith("="):
+            return False  # Calculator history scrolls natively
+        if event.direction == Gdk.ScrollDirection.UP:
+            delta = -1
+        elif event.direction == Gdk.ScrollDirection.DOWN:
+            delta = 1
+        else:
+            _, _, dy = event.get_scroll_deltas()
+            self._scroll_remainder += dy
+            delta = int(self._scroll_remainder)
+            self._scroll_remainder -= delta
+        if delta:
+            self._first_row += delta
+            self.render_slots()
         return True
 
     def resize_viewport(self):
@@ -173,35 +300,25 @@ class AppLauncher(Box):
         )
         return False
 
-    def bake_application_slot(self, app: DesktopApp, **kwargs) -> Button:
-        button = Button(
-            name="app-slot-button",
-            child=Box(
-                name="app-slot-box",
-                orientation="h",
-                spacing=10,
-                children=[
-                    Image(
-                        name="app-icon",
-                        pixbuf=app.get_icon_pixbuf(size=24),
-                        h_align="start",
-                    ),
-                    Label(
-                        name="app-label",
-                        label=app.display_name or "Unknown",
-                        ellipsization="end",
-                        v_align="center",
-                        h_align="center",
-                    ),
-                ],
-            ),
-            tooltip_text=app.description,
-            on_clicked=lambda *_: (app.launch(), self.close_launcher()),
-            **kwargs,
-        )
-        return button
+    def launch_app(self, result: SearchResult):
+        # Clicks and Enter on the search entry both end up here
+        if result.usage_key:
+            self.usage.record(result.usage_key)
+        result.activate()
+        self.close_launcher()
 
     def update_selection(self, new_index: int):
+        if not self.search_entry.get_text().startswith("="):
+            self.selected_index = new_index if 0 <= new_index < len(self._results) else -1
+            if self.selected_index != -1:
+                # Scroll just enough to bring the selected row into view
+                rows = self.visible_rows()
+                if self.selected_index < self._first_row:
+                    self._first_row = self.selected_index
+                elif self.selected_index >= self._first_row + rows:
+                    self._first_row = self.selected_index - rows + 1
+            self.render_slots()
+            return
         # Unselect current
         if self.selected_index != -1 and self.selected_index < len(
             self.viewport.get_children()
@@ -259,16 +376,19 @@ class AppLauncher(Box):
             case ":p":
                 self.notch.open_notch("power")
             case _:
-                children = self.viewport.get_children()
-                if children:
+                if not self.search_pipeline.settled:
+                    # Enter right after typing, launch once the results are in
+                    self._activate_when_ready = True
+                    return
+                if self._results:
                     # Only activate if we have selection or non-empty query
                     if text.strip() == "" and self.selected_index == -1:
                         return  # Prevent accidental activation when empty
                     selected_index = (
                         self.selected_index if self.selected_index != -1 else 0
                     )
-                    if 0 <= selected_index < len(children):
-                        children[selected_index].clicked()
+                    if 0 <= selected_index < len(self._results):
+                        self.launch_app(self._results[selected_index])
 
     def on_search_entry_key_press(self, widget, event):
         if event.keyval in (Gdk.KEY_Return, Gdk.KEY_KP_Enter) and (
@@ -316,27 +436,11 @@ class AppLauncher(Box):
 
     def add_selected_app_to_dock(self):
         """Adds the currently selected application to the dock.json file with comprehensive metadata."""
-        children = self.viewport.get_children()
-        if (
-            not children
-            or self.selected_index == -1
-            or self.selected_index >= len(children)
-        ):
+        if not 0 <= self.selected_index < len(self._results):
             return  # No app selected
-
-        selected_button = children[self.selected_index]
-        # Extract the app's display name from the label to find the DesktopApp object
-        selected_app = next(
-            (
-                app
-                for app in self._all_apps
-                if app.display_name
-                == selected_button.get_child().get_children()[1].props.label
-            ),
-            None,
-        )
-        if not selected_app:
-            return
+        selected_app = self._results[self.selected_index].app
+        if selected_app is None:
+            return  # Only applications can be pinned
 
         # Create comprehensive app data dictionary - Include all available properties
         # Filter out None values to keep the JSON clean
@@ -390,47 +494,57 @@ class AppLauncher(Box):
         Dock.notify_config_change()
 
     def move_selection(self, delta: int):
-        children = self.viewport.get_children()
-        if not children:
+        if self.search_entry.get_text().startswith("="):
+            count = len(self.viewport.get_children())
+        else:
+            count = len(self._results)
+        if not count:
             return
         # Allow starting selection from nothing when empty
         if self.selected_index == -1 and delta == 1:
             new_index = 0
         else:
             new_index = self.selected_index + delta
-        new_index = max(0, min(new_index, len(children) - 1))
+        new_index = max(0, min(new_index, count - 1))
+        self._selection_moved = True
         self.update_selection(new_index)
 
-    def save_calc_history(self):
-        with open(self.calc_history_path, "w") as f:
-            json.dump(self.calc_history, f)
-
     def evaluate_calculator_expression(self, text: str):
         # Remove the '=' prefix and extra spaces
         expr = text.lstrip("=").strip()
         if not expr:
             return
-        # Replace operators: '^' -> '**', and '×' -> '*'
-        expr = expr.replace("^", "**").replace("×", "*")
-        # Replace factorial: e.g. 5! -> math.factorial(5)
-        expr = re.sub(r"(\d+)!", r"math.factorial(\1)", expr)
-        # Replace brackets: allow [] and {} as ()
-        for old, new in [("[", "("), ("]", ")"), ("{", "("), ("}", ")")]:
-            expr = expr.replace(old, new)
         try:
-            result = eval(expr, {"__builtins__": None, "math": math})
-        except Exception as e:
+            result = format_result(evaluate(expr))
+        except CalculatorError as e:
             result = f"Error: {e}"
         # Prepend to history (newest first)
-        self.calc_history.insert(0, f"{text} => {result}")
-        self.save_calc_history()
+        self.calc.add(f"{text} => {result}")
+        self._calc_buttons = None
         self.update_calculator_viewport()
 
+    def update_calculator_preview(self, text: str):
+        expr = text.lstrip("=").strip()
+        try:
+            # Compiled expressions are cached, so this is cheap on every keystroke
+            preview = f"= {format_result(evaluate(expr))}" if expr else None
+        except CalculatorError:
+            preview = None  # Usually just not finished typing yet
+        if preview is not None:
+            self.calc_preview.set_label(preview)
+        self.calc_preview.set_visible(preview is not None)
+
     def update_calculator_viewport(self):
-        self.viewport.children = []
-        for item in self.calc_history:
-            btn = self.create_calc_history_button(item)
-            self.viewport.add(btn)
+        self.search_pipeline.cancel()  # Drop searches still in flight
+        self._activate_when_ready = False
+        self.update_calculator_preview(self.search_entry.get_text())
+        # History buttons are only rebuilt after the history changed
+        if self._calc_buttons is None:
+            self._calc_buttons = [
+                self.create_calc_history_button(item) for item in self.calc_history
+            ]
+        if self.viewport.get_children() != self._calc_buttons:
+            self.viewport.children = self._calc_buttons
         # Remove resetting selected_index unconditionally so that a highlighted result isn't lost.
         # Optionally, only reset if the input is not more than "=".
         # if self.search_entry.get_text().strip() != "=":
@@ -469,6 +583,6 @@ class AppLauncher(Box):
 
     def delete_selected_calc_history(self):
         if self.selected_index != -1 and self.selected_index < len(self.calc_history):
-            del self.calc_history[self.selected_index]
-            self.save_calc_history()
+            self.calc.remove(self.selected_index)
+            self._calc_buttons = None
             self.update_calculator_viewport()
@@ -20,9 +20,13 @@ import config.data as data
 from modules.player import PlayerSmall
 from modules.tools import Toolbox
 from utils.icon_resolver import IconResolver
-from fabric.utils.helpers import get_desktop_applications
+from utils.app_resolver import AppResolver
+from utils.icon_loader import IconLoader
+from utils.desktop_apps import DesktopAppRegistry
 from fabric.widgets.image import Image
-from utils.occlusion import check_occlusion
+from utils.occlusion import OcclusionEngine
+from utils.hyprland_events import HyprlandEventDispatcher
+from utils.hyprland_state import HyprlandState
 
 class Notch(Window):
     def __init__(self, **kwargs):
@@ -46,9 +50,14 @@ class Notch(Window):
         self.notification = NotificationContainer(notch=self)
         self.notification_history = self.notification.history
 
-        self.icon_resolver = IconResolver()
-        self._all_apps = get_desktop_applications()
-        self.app_identifiers = self._build_app_identifiers_map()
+        self.state = HyprlandState.get_initial()
+        self.icon_resolver = IconResolver.get_initial()
+        self.icon_loader = IconLoader.get_initial()
+        self.icon_loader.prefetch_sizes.add(20)
+        self._window_icon_app_id = None
+        self.apps = DesktopAppRegistry.get_initial()
+        self.resolver = AppResolver.get_initial()
+        self.apps.connect("changed", self._on_apps_changed)
 
         self.dashboard = Dashboard(notch=self)
         self.launcher = AppLauncher(notch=self)
@@ -92,8 +101,11 @@ class Notch(Window):
         )
         self.active_window_box.connect("button-press-event", lambda widget, event: (self.open_notch("dashboard"), False)[1])
 
-        self.active_window.connect("notify::label", self.update_window_icon)
-        self.active_window.connect("notify::label", self.on_active_window_changed)  # Connect to window change event
+        # Icon and occlusion flash follow the active window, not every title change
+        HyprlandEventDispatcher.get_initial().subscribe(
+            ("activewindow",),
+            lambda *_: (self.update_window_icon(), self.on_active_window_changed()),
+        )
 
         self.active_window.get_children()[0].set_hexpand(True)
         self.active_window.get_children()[0].set_halign(Gtk.Align.FILL)
@@ -263,8 +275,12 @@ class Notch(Window):
         # Track current window class
         self._current_window_class = self._get_current_window_class()
         
-        # Start checking for occlusion every 250ms
-        GLib.timeout_add(250, self._check_occlusion)
+        # Occlusion of the top edge is pushed by the engine instead of polled
+        self.occlusion = OcclusionEngine.get_initial()
+        if data.VERTICAL:
+            self.occlusion.register("notch", ("top", 40))
+            self.occlusion.connect("occlusion-changed", self._on_occlusion_changed)
+            self._check_occlusion()
 
     def on_button_enter(self, widget, event):
         self.is_hovered = True  # Set hover state
@@ -285,6 +301,7 @@ class Notch(Window):
         window = widget.get_window()
         if window:
             window.set_cursor(None)
+        self._check_occlusion()
         return True
 
     # Add new hover event handlers for the entire notch
@@ -303,6 +320,7 @@ class Notch(Window):
             return False  # Ignore child-to-child movements
             
         self.is_hovered = False
+        self._check_occlusion()
         return False  # Allow event propagation
 
     def close_notch(self):
@@ -340,6 +358,7 @@ class Notch(Window):
         ]:
             self.stack.remove_style_class(style)
         self.stack.set_visible_child(self.compact)
+        self._check_occlusion()
 
     def open_notch(self, widget):
         self.notch_wrap.remove_style_class("occluded")
@@ -677,87 +696,18 @@ class Notch(Window):
             label.set_hexpand(True)
             label.set_halign(Gtk.Align.FILL)
             label.queue_resize()
-            # Update icon after restoring label properties
-            self.update_window_icon()
-
-    def _build_app_identifiers_map(self):
-        """Build a mapping of app identifiers (class names, executables, names) to DesktopApp objects"""
-        identifiers = {}
-        for app in self._all_apps:
-            # Map by name (lowercase)
-            if app.name:
-                identifiers[app.name.lower()] = app
-
-            # Map by display name
-            if app.display_name:
-                identifiers[app.display_name.lower()] = app
-
-            # Map by window class if available
-            if app.window_class:
-                identifiers[app.window_class.lower()] = app
-
-            # Map by executable name if available
-            if app.executable:
-                exe_basename = app.executable.split('/')[-1].lower()
-                identifiers[exe_basename] = app
-
-            # Map by command line if available (without parameters)
-            if app.command_line:
-                cmd_base = app.command_line.split()[0].split('/')[-1].lower()
-                identifiers[cmd_base] = app
 
-        return identifiers
-
-    def _normalize_window_class(self, class_name):
-        """Normalize window class by removing common suffixes and lowercase."""
-        if not class_name:
-            return ""
-
-        normalized = class_name.lower()
-
-        # Remove common suffixes
-        suffixes = [".bin", ".exe", ".so", "-bin", "-gtk"]
-        for suffix in suffixes:
-            if normalized.endswith(suffix):
-                normalized = normalized[:-len(suffix)]
-
-        return normalized
+    def _on_apps_changed(self, *_):
+        self.update_window_icon()
 
     def find_app(self, app_identifier):
         """Return the DesktopApp object by matching any app identifier."""
-        if not app_identifier:
-            return None
-
-        # Try direct lookup in our identifiers map
-        normalized_id = str(app_identifier).lower()
-        if normalized_id in self.app_identifiers:
-            return self.app_identifiers[normalized_id]
-
-        # Try with normalized class name
-        norm_id = self._normalize_window_class(normalized_id)
-        if norm_id in self.app_identifiers:
-            return self.app_identifiers[norm_id]
-
-        # More targeted matching with exact names only
-        for app in self._all_apps:
-            if app.name and app.name.lower() == normalized_id:
-                return app
-            if app.window_class and app.window_class.lower() == normalized_id:
-                return app
-            if app.display_name and app.display_name.lower() == normalized_id:
-                return app
-            # Try with executable basename
-            if app.executable:
-                exe_base = app.executable.split('/')[-1].lower()
-                if exe_base == normalized_id:
-                    return app
-            # Try with command basename
-            if app.command_line:
-                cmd_base = app.command_line.split()[0].split('/')[-1].lower()
-                if cmd_base == normalized_id:
-                    return app
-
-        return None
+        return self.resolver.find(app_identifier)
+
+    def _on_window_icon_ready(self, app_id, pixbuf):
+        # The active window may have changed while the icon was loading
+        if pixbuf is not None and app_id == self._window_icon_app_id:
+            self.window_icon.set_from_pixbuf(pixbuf)
 
     def update_window_icon(self, *args):
         """Update the window icon based on the current active window title"""
@@ -776,32 +726,24 @@ class Notch(Window):
         # For any active window, ensure icon is visible
         self.window_icon.set_visible(True)
 
-        # Try to get window class from Hyprland
-        from fabric.hyprland.widgets import get_hyprland_connection
-        conn = get_hyprland_connection()
-        if conn:
+        # Get window class from the shared Hyprland state
+        active_window = self.state.active_window
+        if active_window:
             try:
-                import json
-                active_window = json.loads(conn.send_command("j/activewindow").reply.decode())
-                app_id = active_window.get("initialClass", "") or active_window.get("class", "")
+                app_id = active_window.initial_class or active_window.class_name
 
                 # Find app using icon resolver or desktop apps
                 icon_size = 20
                 desktop_app = self.find_app(app_id)
 
-                # Get icon using improved method with fallbacks
-                icon_pixbuf = None
-                if desktop_app:
-                    icon_pixbuf = desktop_app.get_icon_pixbuf(size=icon_size)
-
-                if not icon_pixbuf:
-                    # Try non-symbolic icon first (full color)
-                    icon_pixbuf = self.icon_resolver.get_icon_pixbuf(app_id, icon_size)
-
-                if not icon_pixbuf and "-" in app_id:
-                    # Try with base name (no suffix) for flatpak apps
-                    base_app_id = app_id.split("-")[0]
-                    icon_pixbuf = self.icon_resolver.get_icon_pixbuf(base_app_id, icon_size)
+                # Loaded in the background the first time an app shows up
+                self._window_icon_app_id = app_id
+                icon_pixbuf = self.icon_loader.load(
+                    app_id,
+                    icon_size,
+                    lambda pixbuf: self._on_window_icon_ready(app_id, pixbuf),
+                    desktop_app,
+                )
 
                 if icon_pixbuf:
                     self.window_icon.set_from_pixbuf(icon_pixbuf)
@@ -819,45 +761,40 @@ class Notch(Window):
                 except:
                     self.window_icon.set_from_icon_name("application-x-executable-symbolic", 20)
         else:
+            self._window_icon_app_id = None
             try:
                 self.window_icon.set_from_icon_name("application-x-executable", 20)
             except:
                 self.window_icon.set_from_icon_name("application-x-executable-symbolic", 20)
 
+    def _on_occlusion_changed(self, _, name, occluded):
+        if name == "notch":
+            self._check_occlusion()
+
     def _check_occlusion(self):
         """
-        Check if top 40px of the screen is occluded by any window
+        Apply the occlusion state of the top 40px reported by the engine
         and update the notch_box style accordingly.
         """
         # If notch is open or hovered, remove occluded class and skip further checks
         if self._is_notch_open or self.is_hovered or self._prevent_occlusion:
             if data.VERTICAL:
                 self.notch_wrap.remove_style_class("occluded")
-            return True
-            
+            return
+
         # Only check occlusion if not hovered, not open, and in vertical mode
         if data.VERTICAL:
-            is_occluded = check_occlusion(("top", 40))
-            
             # Add or remove style class based on occlusion
-            if is_occluded:
+            if self.occlusion.is_occluded("notch"):
                 self.notch_wrap.add_style_class("occluded")
             else:
                 self.notch_wrap.remove_style_class("occluded")
-        
-        return True  # Return True to keep the timeout active
 
     def _get_current_window_class(self):
         """Get the class of the currently active window"""
-        try:
-            from fabric.hyprland.widgets import get_hyprland_connection
-            conn = get_hyprland_connection()
-            if conn:
-                import json
-                active_window = json.loads(conn.send_command("j/activewindow").reply.decode())
-                return active_window.get("initialClass", "") or active_window.get("class", "")
-        except Exception as e:
-            print(f"Error getting window class: {e}")
+        active_window = self.state.active_window
+        if active_window:
+            return active_window.initial_class or active_window.class_name
         return ""
 
     def on_active_window_changed(self, *args):
@@ -896,6 +833,7 @@ class Notch(Window):
         # Reset the prevent flag
         self._prevent_occlusion = False
         self._occlusion_timer_id = None
-        
-        # Now let the regular check handle it
+
+        # Re-apply the current occlusion state
+        self._check_occlusion()
         return False  # Don't repeat the timeout
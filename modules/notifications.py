@@ -21,6 +21,7 @@ from fabric.widgets.scrolledwindow import ScrolledWindow
 import modules.icons as icons
 
 import config.data as data
+from utils.pixbuf_cache import PixbufCache
 
 # Persistence directory and file (history)
 PERSISTENT_DIR = f"/tmp/{data.APP_NAME}/notifications"
@@ -60,9 +61,8 @@ def load_scaled_pixbuf(notification_box, width, height):
     if hasattr(notification_box, "cached_image_path") and notification_box.cached_image_path and os.path.exists(notification_box.cached_image_path):
         try:
             logger.debug(f"Attempting to load cached image from: {notification_box.cached_image_path} for notification {notification.id}")
-            pixbuf = GdkPixbuf.Pixbuf.new_from_file(notification_box.cached_image_path)
+            pixbuf = PixbufCache.get_initial().file(notification_box.cached_image_path, width, height)
             if pixbuf:
-                pixbuf = pixbuf.scale_simple(width, height, GdkPixbuf.InterpType.BILINEAR)
                 logger.info(f"Successfully loaded cached image from: {notification_box.cached_image_path} for notification {notification.id}")
             return pixbuf
         except Exception as e:
@@ -88,12 +88,10 @@ def get_app_icon_pixbuf(icon_path, width, height):
     if not os.path.exists(icon_path):
         logger.warning(f"Icon path does not exist: {icon_path}")
         return None
-    try:
-        pixbuf = GdkPixbuf.Pixbuf.new_from_file(icon_path)
-        return pixbuf.scale_simple(width, height, GdkPixbuf.InterpType.BILINEAR)
-    except Exception as e:
-        logger.error(f"Failed to load or scale icon: {e}")
-        return None
+    pixbuf = PixbufCache.get_initial().file(icon_path, width, height)
+    if pixbuf is None:
+        logger.error(f"Failed to load or scale icon: {icon_path}")
+    return pixbuf
 
 class ActionButton(Button):
     def __init__(self, action: NotificationAction, index: int, total: int, notification_box):
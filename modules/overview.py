@@ -1,10 +1,7 @@
 # Thanks to https://github.com/muhchaudhary for the original code. You are a legend.
-import json
-
 import cairo
 import gi
 from loguru import logger
-from fabric.hyprland.service import Hyprland
 from fabric.widgets.box import Box
 from fabric.widgets.button import Button
 from fabric.widgets.eventbox import EventBox
@@ -15,7 +12,13 @@ import modules.icons as icons
 
 # WIP icon resolver (app_id to guessing the icon name)
 from utils.icon_resolver import IconResolver
-from fabric.utils.helpers import get_desktop_applications
+from utils.hyprland_events import HyprlandEventDispatcher
+from utils.hyprland_ipc import HyprlandIPC
+from utils.hyprland_state import HyprlandState
+from utils.occlusion import OcclusionEngine
+from utils.pixbuf_cache import PixbufCache
+from utils.app_resolver import AppResolver, normalize_window_class
+from utils.desktop_apps import DesktopAppRegistry
 
 gi.require_version("Gtk", "3.0")
 from gi.repository import Gdk, Gtk
@@ -24,8 +27,8 @@ screen = Gdk.Screen.get_default()
 CURRENT_WIDTH = screen.get_width()
 CURRENT_HEIGHT = screen.get_height()
 
-icon_resolver = IconResolver()
-connection = Hyprland()
+icon_resolver = IconResolver.get_initial()
+ipc = HyprlandIPC.get_initial()
 SCALE = 0.1
 
 # Credit to Aylur for the drag and drop code
@@ -58,7 +61,7 @@ class HyprlandWindowButton(Button):
         transform: int = 0,
     ):
         self.transform = transform % 4
-        self.size = size if transform in [0, 2] else (size[1], size[0])
+        self.size = self._oriented(size)
         self.address = address
         self.app_id = app_id
         self.title = title
@@ -74,7 +77,7 @@ class HyprlandWindowButton(Button):
         # Get icon using improved method with fallbacks
         icon_pixbuf = None
         if desktop_app:
-            icon_pixbuf = desktop_app.get_icon_pixbuf(size=icon_size_main)
+            icon_pixbuf = PixbufCache.get_initial().app_icon(desktop_app, icon_size_main)
         
         if not icon_pixbuf:
             # Fallback to IconResolver
@@ -90,10 +93,10 @@ class HyprlandWindowButton(Button):
             name="overview-client-box",
             image=Image(pixbuf=icon_pixbuf),
             tooltip_text=title,
-            size=size,
+            size=self.size,
             on_clicked=self.on_button_click,
-            on_button_press_event=lambda _, event: connection.send_command(
-                f"/dispatch closewindow address:{address}"
+            on_button_press_event=lambda _, event: ipc.dispatch(
+                f"closewindow address:{address}"
             )
             if event.button == 3
             else None,
@@ -116,10 +119,23 @@ class HyprlandWindowButton(Button):
 
         self.connect("key_press_event", self.on_key_press_event)
 
+    def _oriented(self, size):
+        return size if self.transform in [0, 2] else (size[1], size[0])
+
+    def update_client(self, title: str, size):
+        """Apply a new title or size without rebuilding the button."""
+        if title != self.title:
+            self.title = title
+            self.set_tooltip_text(title)
+        size = self._oriented(size)
+        if size != self.size:
+            self.size = size
+            self.set_size_request(int(size[0]), int(size[1]))
+
     def on_key_press_event(self, widget, event):
         if event.get_state() & Gdk.ModifierType.SHIFT_MASK:
             if event.keyval in (Gdk.KEY_Return, Gdk.KEY_KP_Enter, Gdk.KEY_space):
-                connection.send_command(f"/dispatch closewindow address:{self.address}")
+                ipc.dispatch(f"closewindow address:{self.address}")
                 return True
         return False
 
@@ -130,7 +146,7 @@ class HyprlandWindowButton(Button):
         # Enhanced icon resolution for overlay
         icon_pixbuf = None
         if hasattr(self, 'desktop_app') and self.desktop_app:
-            icon_pixbuf = self.desktop_app.get_icon_pixbuf(size=icon_size_overlay)
+            icon_pixbuf = PixbufCache.get_initial().app_icon(self.desktop_app, icon_size_overlay)
             
         if not icon_pixbuf:
             icon_pixbuf = icon_resolver.get_icon_pixbuf(self.app_id, icon_size_overlay)
@@ -154,27 +170,29 @@ class HyprlandWindowButton(Button):
         )
 
     def on_button_click(self, *_):
-        connection.send_command(f"/dispatch focuswindow address:{self.address}")
+        ipc.dispatch(f"focuswindow address:{self.address}")
 
 
 class WorkspaceEventBox(EventBox):
-    def __init__(self, workspace_id: int, fixed: Gtk.Fixed | None = None):
+    def __init__(self, workspace_id: int, fixed: Gtk.Fixed):
+        self.workspace_id = workspace_id
         self.fixed = fixed
+        self.add_label = Label(
+            name="overview-add-label",
+            h_expand=True,
+            v_expand=True,
+            markup=icons.circle_plus,
+        )
+        # Visibility follows the workspace contents, not show_all()
+        self.add_label.set_no_show_all(True)
         super().__init__(
             name="overview-workspace-bg",
             h_expand=True,
             v_expand=True,
             size=(int(CURRENT_WIDTH * SCALE), int(CURRENT_HEIGHT * SCALE)),
-            child=fixed
-            if fixed
-            else Label(
-                name="overview-add-label",
-                h_expand=True,
-                v_expand=True,
-                markup=icons.circle_plus,
-            ),
-            on_drag_data_received=lambda _w, _c, _x, _y, data, *_: connection.send_command(
-                f"/dispatch movetoworkspacesilent {workspace_id},address:{data.get_data().decode()}"
+            child=Overlay(child=fixed, overlays=self.add_label),
+            on_drag_data_received=lambda _w, _c, x, y, data, *_: self.on_drop(
+                x, y, data.get_data().decode()
             ),
         )
         self.drag_dest_set(
@@ -182,8 +200,24 @@ class WorkspaceEventBox(EventBox):
             TARGET,
             Gdk.DragAction.COPY,
         )
-        if fixed:
-            fixed.show_all()
+        fixed.show_all()
+        self.set_empty(True)
+
+    def on_drop(self, x: int, y: int, address: str):
+        # Dropping a window back onto itself is a no-op, skip the dispatch
+        state = HyprlandState.get_initial()
+        workspace = next((w for w in state.workspaces if w.id == self.workspace_id), None)
+        monitor = next((m for m in state.monitors if workspace and m.id == workspace.monitor_id), None)
+        if monitor is not None:
+            hits = OcclusionEngine.get_initial().index.windows_at(
+                self.workspace_id, monitor.x + int(x / SCALE), monitor.y + int(y / SCALE)
+            )
+            if address in hits:
+                return
+        ipc.dispatch(f"movetoworkspacesilent {self.workspace_id},address:{address}")
+
+    def set_empty(self, empty: bool):
+        self.add_label.set_visible(empty)
 
 
 
@@ -191,43 +225,37 @@ class Overview(Box):
     def __init__(self, **kwargs):
         # Initialize as a Box instead of a PopupWindow.
         super().__init__(name="overview", orientation="v", spacing=8, **kwargs)
-        self.workspace_boxes: dict[int, Box] = {}
+        self.workspace_boxes: dict[int, Gtk.Fixed] = {}
+        self.workspace_events: dict[int, WorkspaceEventBox] = {}
         self.clients: dict[str, HyprlandWindowButton] = {}
+        self._pending_update = False
         
-        # Initialize app registry for better icon resolution
-        self._all_apps = get_desktop_applications()
-        self.app_identifiers = self._build_app_identifiers_map()
+        # Shared app registry for better icon resolution
+        self.apps = DesktopAppRegistry.get_initial()
+        self.resolver = AppResolver.get_initial()
+        self.apps.connect("changed", self._on_apps_changed)
         
         # Remove the window_class_aliases dictionary completely
 
-        connection.connect("event::openwindow", self.do_update)
-        connection.connect("event::closewindow", self.do_update)
-        connection.connect("event::movewindow", self.do_update)
+        self.build_workspaces()
+
+        self.state = HyprlandState.get_initial()
+        HyprlandEventDispatcher.get_initial().subscribe(
+            ("openwindow", "closewindow", "movewindow"), self.do_update
+        )
+        # Updates are skipped while hidden, catch up when shown again
+        self.connect("map", lambda *_: self._pending_update and self.update())
+        self._pending_update = True
         self.update()
         
-    def _normalize_window_class(self, class_name):
-        """Normalize window class by removing common suffixes and lowercase."""
-        if not class_name:
-            return ""
-            
-        normalized = class_name.lower()
-        
-        # Remove common suffixes
-        suffixes = [".bin", ".exe", ".so", "-bin", "-gtk"]
-        for suffix in suffixes:
-            if normalized.endswith(suffix):
-                normalized = normalized[:-len(suffix)]
-                
-        return normalized
-    
     def _classes_match(self, class1, class2):
         """Check if two window class names match with stricter comparison."""
         if not class1 or not class2:
             return False
             
         # Normalize both classes
-        norm1 = self._normalize_window_class(class1)
-        norm2 = self._normalize_window_class(class2)
+        norm1 = normalize_window_class(class1)
+        norm2 = normalize_window_class(class2)
         
         # Direct match after normalization
         if norm1 == norm2:
@@ -237,137 +265,93 @@ class Overview(Box):
         # This avoids incorrectly matching flatpak apps and others
         return False
         
-    def _build_app_identifiers_map(self):
-        """Build a mapping of app identifiers (class names, executables, names) to DesktopApp objects"""
-        identifiers = {}
-        for app in self._all_apps:
-            # Map by name (lowercase)
-            if app.name:
-                identifiers[app.name.lower()] = app
-                
-            # Map by display name
-            if app.display_name:
-                identifiers[app.display_name.lower()] = app
-                
-            # Map by window class if available
-            if app.window_class:
-                identifiers[app.window_class.lower()] = app
-                
-            # Map by executable name if available
-            if app.executable:
-                exe_basename = app.executable.split('/')[-1].lower()
-                identifiers[exe_basename] = app
-                
-            # Map by command line if available (without parameters)
-            if app.command_line:
-                cmd_base = app.command_line.split()[0].split('/')[-1].lower()
-                identifiers[cmd_base] = app
-                
-        return identifiers
-        
+    def _on_apps_changed(self, *_):
+        self.update(signal_update=True)
+
     def find_app(self, app_identifier):
         """Return the DesktopApp object by matching any app identifier."""
-        if not app_identifier:
-            return None
-        
-        # Try direct lookup in our identifiers map
-        normalized_id = str(app_identifier).lower()
-        if normalized_id in self.app_identifiers:
-            return self.app_identifiers[normalized_id]
-            
-        # Try with normalized class name
-        norm_id = self._normalize_window_class(normalized_id)
-        if norm_id in self.app_identifiers:
-            return self.app_identifiers[norm_id]
-            
-        # More targeted matching with exact names only
-        for app in self._all_apps:
-            if app.name and app.name.lower() == normalized_id:
-                return app
-            if app.window_class and app.window_class.lower() == normalized_id:
-                return app
-            if app.display_name and app.display_name.lower() == normalized_id:
-                return app
-            # Try with executable basename
-            if app.executable:
-                exe_base = app.executable.split('/')[-1].lower()
-                if exe_base == normalized_id:
-                    return app
-            # Try with command basename
-            if app.command_line:
-                cmd_base = app.command_line.split()[0].split('/')[-1].lower()
-                if cmd_base == normalized_id:
-                    return app
-                
-        return None
-
-    def update(self, signal_update=False):
-        # Refresh app registry when updating to ensure latest data
-        self._all_apps = get_desktop_applications()
-        self.app_identifiers = self._build_app_identifiers_map()
-        
-        # Remove old clients and workspaces.
-        for client in self.clients.values():
-            client.destroy()
-        self.clients.clear()
+        return self.resolver.find(app_identifier)
 
-        for workspace in self.workspace_boxes.values():
-            workspace.destroy()
-        self.workspace_boxes.clear()
-
-        # Create two rows in this Box.
+    def build_workspaces(self):
+        """Create the two rows of workspaces once, they are reused by every update."""
         self.children = [Box(spacing=8), Box(spacing=8)]
-
-        monitors = {
-            monitor["id"]: (monitor["x"], monitor["y"], monitor["transform"])
-            for monitor in json.loads(
-                connection.send_command("j/monitors").reply.decode()
-            )
-        }
-
-        for client in json.loads(
-            str(connection.send_command("j/clients").reply.decode())
-        ):
-            # Exclude special workspaces.
-            if client["workspace"]["id"] > 0:
-                self.clients[client["address"]] = HyprlandWindowButton(
-                    window=self,
-                    title=client["title"],
-                    address=client["address"],
-                    app_id=client["initialClass"],
-                    size=(client["size"][0] * SCALE, client["size"][1] * SCALE),
-                    transform=monitors[client["monitor"]][2],
-                )
-                if client["workspace"]["id"] not in self.workspace_boxes:
-                    self.workspace_boxes[client["workspace"]["id"]] = Gtk.Fixed.new()
-                self.workspace_boxes[client["workspace"]["id"]].put(
-                    self.clients[client["address"]],
-                    abs(client["at"][0] - monitors[client["monitor"]][0]) * SCALE,
-                    abs(client["at"][1] - monitors[client["monitor"]][1]) * SCALE,
-                )
-
-        # Lay out workspaces into two rows.
         for w_id in range(1, 11):
             if w_id <= 5:
                 overview_row = self.children[0]
             else:
                 overview_row = self.children[1]
+            self.workspace_boxes[w_id] = Gtk.Fixed.new()
+            self.workspace_events[w_id] = WorkspaceEventBox(w_id, self.workspace_boxes[w_id])
             overview_row.add(
                 Box(
                     name="overview-workspace-box",
                     orientation="vertical",
                     children=[
                         Label(name="overview-workspace-label", label=f"Workspace {w_id}"),
-                        WorkspaceEventBox(
-                            w_id,
-                            self.workspace_boxes[w_id]
-                            if w_id in self.workspace_boxes
-                            else None,
-                        ),
+                        self.workspace_events[w_id],
                     ],
                 )
             )
 
-    def do_update(self, *_):
-        logger.info(f"[Overview] Updating for :{_[1].name}")
+    def update(self, signal_update=False):
+        # Nothing to draw while hidden, the map handler catches up later
+        if signal_update and not self.get_mapped():
+            self._pending_update = True
+            return
+        self._pending_update = False
+
+        monitors = {monitor.id: monitor for monitor in self.state.monitors}
+        wanted = {}
+        for client in self.state.clients:
+            # Exclude special workspaces and clients on unknown monitors.
+            monitor = monitors.get(client.monitor)
+            if client.workspace_id in self.workspace_boxes and monitor:
+                wanted[client.address] = (client, monitor)
+
+        # Destroy buttons of windows that are gone.
+        for address in [a for a in self.clients if a not in wanted]:
+            self.clients.pop(address).destroy()
+
+        for address, (client, monitor) in wanted.items():
+            fixed = self.workspace_boxes[client.workspace_id]
+            x = int(abs(client.at[0] - monitor.x) * SCALE)
+            y = int(abs(client.at[1] - monitor.y) * SCALE)
+            size = (client.size[0] * SCALE, client.size[1] * SCALE)
+
+            button = self.clients.get(address)
+            if button is not None and (
+                button.app_id != client.initial_class
+                or button.transform != monitor.transform % 4
+            ):
+                # Icon or orientation changed, rebuild this one button.
+                button.destroy()
+                button = None
+
+            if button is None:
+                button = HyprlandWindowButton(
+                    window=self,
+                    title=client.title,
+                    address=address,
+                    app_id=client.initial_class,
+                    size=size,
+                    transform=monitor.transform,
+                )
+                self.clients[address] = button
+                fixed.put(button, x, y)
+                button.show_all()
+            else:
+                button.update_client(client.title, size)
+                if button.get_parent() is not fixed:
+                    # Moved to another workspace.
+                    button.get_parent().remove(button)
+                    fixed.put(button, x, y)
+                elif button.position != (x, y):
+                    fixed.move(button, x, y)
+            button.position = (x, y)
+
+        for w_id, event_box in self.workspace_events.items():
+            event_box.set_empty(not self.workspace_boxes[w_id].get_children())
+
+    def do_update(self, events):
+        logger.info(f"[Overview] Updating for: {', '.join(sorted(events))}")
         self.update(signal_update=True)
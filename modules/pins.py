@@ -2,7 +2,6 @@ import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk, Gdk, GdkPixbuf, GLib, Gio
 import os
-import subprocess
 import json
 import cairo
 from pathlib import Path
@@ -14,6 +13,7 @@ from fabric.widgets.label import Label
 from fabric.widgets.scrolledwindow import ScrolledWindow
 
 import modules.icons as icons
+from utils.functions import open_file
 
 SAVE_FILE = os.path.expanduser("~/.pins.json")
 
@@ -27,12 +27,6 @@ def createSurfaceFromWidget(widget: Gtk.Widget) -> cairo.ImageSurface:
     widget.draw(cr)
     return surface
 
-def open_file(filepath):
-    try:
-        subprocess.Popen(["xdg-open", filepath])
-    except Exception as e:
-        print("Error opening file:", e)
-
 class FileChangeHandler(FileSystemEventHandler):
     def __init__(self, app):
         self.app = app
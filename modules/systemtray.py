@@ -4,6 +4,7 @@ gi.require_version("Gray", "0.1")
 from gi.repository import Gray, Gtk, Gdk, GdkPixbuf, GLib
 
 import config.data as data
+from utils.pixbuf_cache import PixbufCache
 
 class SystemTray(Gtk.Box):
     def __init__(self, pixel_size: int = 20, **kwargs) -> None:
@@ -44,43 +45,24 @@ class SystemTray(Gtk.Box):
 
         pixmap = Gray.get_pixmap_for_pixmaps(item.get_icon_pixmaps(), self.pixel_size)
 
-        try:
-            if pixmap is not None:
-                pixbuf = pixmap.as_pixbuf(self.pixel_size, GdkPixbuf.InterpType.HYPER)
-            else:
-                icon_name = item.get_icon_name()
-                icon_theme_path = item.get_icon_theme_path()
+        if pixmap is not None:
+            # Pixmaps are sent by the item itself and may change at any time
+            pixbuf = pixmap.as_pixbuf(self.pixel_size, GdkPixbuf.InterpType.HYPER)
+        else:
+            pixbufs = PixbufCache.get_initial()
+            icon_name = item.get_icon_name()
+            icon_theme_path = item.get_icon_theme_path()
 
-                # Use custom theme path if available
-                if icon_theme_path:
-                    custom_theme = Gtk.IconTheme.new()
-                    custom_theme.prepend_search_path(icon_theme_path)
-                    try:
-                        pixbuf = custom_theme.load_icon(
-                            icon_name,
-                            self.pixel_size,
-                            Gtk.IconLookupFlags.FORCE_SIZE,
-                        )
-                    except GLib.Error:
-                        # Fallback to default theme if custom path fails
-                        pixbuf = Gtk.IconTheme.get_default().load_icon(
-                            icon_name,
-                            self.pixel_size,
-                            Gtk.IconLookupFlags.FORCE_SIZE,
-                        )
-                else:
-                    pixbuf = Gtk.IconTheme.get_default().load_icon(
-                        icon_name,
-                        self.pixel_size,
-                        Gtk.IconLookupFlags.FORCE_SIZE,
-                    )
-        except GLib.Error:
+            pixbuf = None
+            # Use custom theme path if available
+            if icon_theme_path:
+                pixbuf = pixbufs.icon(icon_name, self.pixel_size, search_path=icon_theme_path)
+            # Fallback to default theme if custom path fails
+            if pixbuf is None:
+                pixbuf = pixbufs.icon(icon_name, self.pixel_size)
             # Fallback to 'image-missing' icon
-            pixbuf = Gtk.IconTheme.get_default().load_icon(
-                "image-missing",
-                self.pixel_size,
-                Gtk.IconLookupFlags.FORCE_SIZE,
-            )
+            if pixbuf is None:
+                pixbuf = pixbufs.icon("image-missing", self.pixel_size)
 
         button.set_image(Gtk.Image.new_from_pixbuf(pixbuf))
         return button
@@ -0,0 +1,144 @@
+from utils.desktop_apps import DesktopAppRegistry
+
+# Suffixes stripped from window classes before comparing them
+CLASS_SUFFIXES = (".bin", ".exe", ".so", "-bin", "-gtk")
+
+# Titles end up as lookup keys too, keep the memo from growing forever
+MEMO_LIMIT = 4096
+
+
+def normalize_window_class(class_name):
+    """Normalize window class by removing common suffixes and lowercase."""
+    if not class_name:
+        return ""
+
+    normalized = class_name.lower()
+    for suffix in CLASS_SUFFIXES:
+        if normalized.endswith(suffix):
+            normalized = normalized[: -len(suffix)]
+
+    return normalized
+
+
+def _trigrams(text: str):
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class AppResolver:
+    """
+    Maps window classes and other identifiers to DesktopApp objects.
+
+    Exact keys (name, display name, window class, executable and command
+    basenames) are precomputed, substring lookups go through a trigram
+    index, and answers are memoized until the app registry changes.
+    """
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if AppResolver.instance is None:
+            AppResolver.instance = AppResolver()
+
+        return AppResolver.instance
+
+    def __init__(self, registry: DesktopAppRegistry | None = None):
+        self.registry = registry or DesktopAppRegistry.get_initial()
+        self._generation = -1
+        self._apps: list = []
+        self._identifiers: dict[str, object] = {}
+        # Lowercased searchable fields per app, in registry order
+        self._haystacks: list[tuple[str, ...]] = []
+        self._postings: dict[str, set[int]] = {}
+        self._memo: dict[tuple[str, bool], object] = {}
+
+    def _ensure_index(self):
+        # Checked on every lookup rather than on the registry signal, so
+        # modules reacting to that signal never see a stale index
+        if self._generation == self.registry.generation:
+            return
+
+        self._apps = self.registry.apps
+        self._identifiers = {}
+        self._haystacks = []
+        self._postings = {}
+        self._memo = {}
+        for i, app in enumerate(self._apps):
+            keys = [app.name, app.display_name, app.window_class]
+            if app.executable:
+                keys.append(app.executable.split("/")[-1])
+            if app.command_line and app.command_line.split():
+                keys.append(app.command_line.split()[0].split("/")[-1])
+            for key in keys:
+                if key:
+                    self._identifiers[key.lower()] = app
+
+            fields = tuple(
+                field.lower()
+                for field in (
+                    app.name,
+                    app.display_name,
+                    app.window_class,
+                    app.executable,
+                    app.command_line,
+                )
+                if field
+            )
+            self._haystacks.append(fields)
+            for gram in set().union(*map(_trigrams, fields)):
+                self._postings.setdefault(gram, set()).add(i)
+        self._generation = self.registry.generation
+
+    def _find_substring(self, needle: str):
+        """First app, in registry order, with a field containing `needle`."""
+        if len(needle) < 3:
+            candidates = range(len(self._apps))
+        else:
+            postings = [self._postings.get(gram) for gram in _trigrams(needle)]
+            if not all(postings):
+                return None
+            candidates = sorted(set.intersection(*postings))
+        for i in candidates:
+            if any(needle in field for field in self._haystacks[i]):
+                return self._apps[i]
+        return None
+
+    def find(self, key, fuzzy: bool = False):
+        """
+        Resolve a single identifier. Exact and normalized keys are tried
+        first, `fuzzy` falls back to a substring match on any field.
+        """
+        if not key:
+            return None
+        self._ensure_index()
+
+        needle = str(key).lower()
+        memo_key = (needle, fuzzy)
+        if memo_key in self._memo:
+            return self._memo[memo_key]
+
+        app = self._identifiers.get(needle) or self._identifiers.get(
+            normalize_window_class(needle)
+        )
+        if app is None and fuzzy:
+            app = self._find_substring(needle)
+
+        if len(self._memo) >= MEMO_LIMIT:
+            self._memo.clear()
+        self._memo[memo_key] = app
+        return app
+
+    def find_app(self, app_identifier, fuzzy: bool = False):
+        """Resolve a pinned-app dict by its keys in priority order, or a plain identifier."""
+        if not app_identifier:
+            return None
+
+        if isinstance(app_identifier, dict):
+            for key in ["window_class", "executable", "command_line", "name", "display_name"]:
+                if app_identifier.get(key):
+                    app = self.find(app_identifier[key], fuzzy)
+                    if app:
+                        return app
+            return None
+
+        return self.find(app_identifier, fuzzy)
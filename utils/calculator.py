@@ -0,0 +1,284 @@
+import ast
+import decimal
+import json
+import math
+import operator
+import os
+import re
+from collections.abc import Callable
+from functools import lru_cache
+
+from loguru import logger
+
+import config.data as data
+
+HISTORY_FILE = data.CACHE_DIR + "/calc_history.log"
+# History kept before this log existed, imported once
+LEGACY_HISTORY_FILE = data.CACHE_DIR + "/calc.json"
+
+MAX_HISTORY = 100
+# Appended lines tolerated before the log is rewritten with the kept entries
+COMPACT_AFTER = 2 * MAX_HISTORY
+
+# Guards against inputs that would hang the shell, like 9**9**9
+MAX_RESULT_BITS = 100_000
+MAX_FACTORIAL = 1_000
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+
+_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+CONSTANTS = {name: getattr(math, name) for name in ("pi", "e", "tau", "inf", "nan")}
+
+
+class CalculatorError(ValueError):
+    """The expression is not something the calculator accepts."""
+
+
+def _power(base, exponent):
+    # Floats overflow on their own, exact integers would grow until memory runs out
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0:
+        if base.bit_length() * exponent > MAX_RESULT_BITS:
+            raise CalculatorError("result too large")
+    return operator.pow(base, exponent)
+
+
+def _factorial(n):
+    if n > MAX_FACTORIAL:
+        raise CalculatorError("factorial too large")
+    return math.factorial(n)
+
+
+def _check_bits(log_value: float):
+    # `log_value` is the natural log of the result, estimated without computing it
+    if log_value / math.log(2) > MAX_RESULT_BITS:
+        raise CalculatorError("result too large")
+
+
+def _perm(n, k=None):
+    if isinstance(n, int) and n >= 0:
+        k = n if k is None else k
+        if isinstance(k, int) and 0 <= k <= n:
+            _check_bits(math.lgamma(n + 1) - math.lgamma(n - k + 1))
+    return math.perm(n, k)
+
+
+def _comb(n, k):
+    if isinstance(n, int) and isinstance(k, int) and 0 <= k <= n:
+        _check_bits(math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1))
+    return math.comb(n, k)
+
+
+def _lcm(*integers):
+    # Never larger than the product of its arguments
+    if sum(abs(i).bit_length() for i in integers if isinstance(i, int)) > MAX_RESULT_BITS:
+        raise CalculatorError("result too large")
+    return math.lcm(*integers)
+
+
+FUNCTIONS: dict[str, Callable] = {
+    name: getattr(math, name)
+    for name in (
+        "sqrt", "cbrt", "exp", "log", "log2", "log10", "sin", "cos", "tan", "asin",
+        "acos", "atan", "atan2", "sinh", "cosh", "tanh", "degrees", "radians", "floor",
+        "ceil", "trunc", "fabs", "gcd", "hypot", "isqrt",
+    )
+    if hasattr(math, name)
+}
+FUNCTIONS.update(
+    abs=abs, round=round, min=min, max=max,
+    factorial=_factorial, pow=_power, perm=_perm, comb=_comb, lcm=_lcm,
+)
+
+
+def _preprocess(text: str) -> str:
+    # Same shorthands the launcher always accepted
+    expr = text.replace("^", "**").replace("×", "*")
+    expr = re.sub(r"(\d+)!", r"factorial(\1)", expr)
+    for old, new in [("[", "("), ("]", ")"), ("{", "("), ("}", ")")]:
+        expr = expr.replace(old, new)
+    return expr
+
+
+def _compile_node(node: ast.AST) -> Callable[[], object]:
+    if isinstance(node, ast.Expression):
+        return _compile_node(node.body)
+
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float, complex)):
+            raise CalculatorError(f"unsupported value {node.value!r}")
+        value = node.value
+        return lambda: value
+
+    if isinstance(node, ast.BinOp):
+        left, right = _compile_node(node.left), _compile_node(node.right)
+        if isinstance(node.op, ast.Pow):
+            return lambda: _power(left(), right())
+        op = _BINARY_OPERATORS.get(type(node.op))
+        if op is None:
+            raise CalculatorError(f"unsupported operator {type(node.op).__name__}")
+        return lambda: op(left(), right())
+
+    if isinstance(node, ast.UnaryOp):
+        op = _UNARY_OPERATORS.get(type(node.op))
+        if op is None:
+            raise CalculatorError(f"unsupported operator {type(node.op).__name__}")
+        operand = _compile_node(node.operand)
+        return lambda: op(operand())
+
+    if isinstance(node, ast.Name) and node.id in CONSTANTS:
+        value = CONSTANTS[node.id]
+        return lambda: value
+
+    if isinstance(node, ast.Call) and not node.keywords:
+        func = node.func
+        # `math.sqrt(2)` keeps working alongside plain `sqrt(2)`
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == "math":
+            name = func.attr
+        elif isinstance(func, ast.Name):
+            name = func.id
+        else:
+            name = None
+        if name in FUNCTIONS:
+            function = FUNCTIONS[name]
+            args = [_compile_node(arg) for arg in node.args]
+            return lambda: function(*(arg() for arg in args))
+        raise CalculatorError(f"unknown function {name or ast.unparse(func)}")
+
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "math":
+        if node.attr in CONSTANTS:
+            value = CONSTANTS[node.attr]
+            return lambda: value
+
+    if isinstance(node, ast.Name):
+        raise CalculatorError(f"unknown name {node.id}")
+    raise CalculatorError(f"unsupported syntax {type(node).__name__}")
+
+
+@lru_cache(maxsize=256)
+def compile_expression(text: str) -> Callable[[], object]:
+    """
+    Compile a calculator expression into a function computing it.
+
+    Only numbers, arithmetic, the constants in CONSTANTS and the functions
+    in FUNCTIONS are accepted, anything else raises CalculatorError.
+    """
+    try:
+        tree = ast.parse(_preprocess(text).strip(), mode="eval")
+    except SyntaxError as e:
+        raise CalculatorError(e.msg) from None
+    return _compile_node(tree)
+
+
+def evaluate(text: str):
+    """Value of `text`, raising CalculatorError or the arithmetic error it hits."""
+    try:
+        return compile_expression(text)()
+    except (OverflowError, ZeroDivisionError, ValueError, TypeError) as e:
+        if isinstance(e, CalculatorError):
+            raise
+        raise CalculatorError(str(e)) from None
+
+
+def format_result(value) -> str:
+    try:
+        return str(value)
+    except ValueError:
+        # Integers past Python's limit for converting them to decimal text
+        return format(decimal.Decimal(value), ".12e")
+
+
+class CalcHistory:
+    """
+    The newest MAX_HISTORY calculator results, in an append-only log.
+
+    Each line is one JSON encoded entry, oldest first. New results are
+    appended, and the log is only rewritten when it grew well past the
+    limit or an entry was deleted. Nothing is read before `entries` is
+    first used.
+    """
+
+    def __init__(self, path: str = HISTORY_FILE):
+        self.path = path
+        self._entries: list[str] | None = None
+        self._lines = 0
+
+    @property
+    def entries(self) -> list[str]:
+        """Entries, newest first."""
+        if self._entries is None:
+            self._load()
+        return self._entries
+
+    def _load(self):
+        entries = []
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    self._lines += 1
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            entries = self._import_legacy()
+        except OSError as e:
+            logger.warning(f"[Calculator] Failed to read history: {e}")
+        self._entries = list(reversed(entries[-MAX_HISTORY:]))
+
+    def _import_legacy(self) -> list[str]:
+        try:
+            with open(LEGACY_HISTORY_FILE) as f:
+                legacy = json.load(f)
+        except (OSError, ValueError):
+            return []
+        entries = [str(entry) for entry in reversed(legacy)][-MAX_HISTORY:]
+        self._entries = list(reversed(entries))
+        self.compact()
+        try:
+            os.remove(LEGACY_HISTORY_FILE)
+        except OSError:
+            pass
+        return entries
+
+    def add(self, entry: str):
+        entries = self.entries
+        entries.insert(0, entry)
+        del entries[MAX_HISTORY:]
+        try:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._lines += 1
+        except OSError as e:
+            logger.warning(f"[Calculator] Failed to save history: {e}")
+        if self._lines > COMPACT_AFTER:
+            self.compact()
+
+    def remove(self, index: int):
+        entries = self.entries
+        if 0 <= index < len(entries):
+            del entries[index]
+            self.compact()
+
+    def compact(self):
+        """Rewrite the log with only the kept entries."""
+        tmp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                for entry in reversed(self._entries or []):
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_path, self.path)
+            self._lines = len(self._entries or [])
+        except OSError as e:
+            logger.warning(f"[Calculator] Failed to rewrite history: {e}")
@@ -0,0 +1,336 @@
+import json
+import os
+import threading
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+from fabric.core.service import Service, Signal
+from fabric.utils.helpers import DesktopApp, get_desktop_applications
+from gi.repository import Gio, GLib, Gtk
+from loguru import logger
+
+import config.data as data
+
+# Package managers rewrite several .desktop files in a row, wait for them to settle
+RELOAD_DELAY_MS = 500
+
+# After a warm start, reparse everything once the shell is up
+RESCAN_DELAY_MS = 3000
+
+SNAPSHOT_FILE = data.CACHE_DIR + "/desktop_apps.json"
+SNAPSHOT_VERSION = 1
+
+
+def app_id(app) -> str:
+    """Stable key of a DesktopApp, its desktop file id when there is one."""
+    desktop_id = getattr(app, "desktop_id", None)
+    if desktop_id is None:
+        info = getattr(app, "_app", None)
+        desktop_id = info.get_id() if info is not None else None
+    return desktop_id or app.name or app.display_name or ""
+
+
+def application_dirs() -> list[str]:
+    """Every directory Gio reads .desktop files from, subdirectories included."""
+    roots = [GLib.get_user_data_dir(), *GLib.get_system_data_dirs()]
+    dirs = []
+    for root in roots:
+        top = os.path.join(root, "applications")
+        if top in dirs:
+            continue
+        dirs.append(top)
+        for path, subdirs, _ in os.walk(top):
+            dirs.extend(os.path.join(path, name) for name in sorted(subdirs))
+    return dirs
+
+
+def _mtime(path: str) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class SnapshotApp:
+    """
+    An application restored from the registry snapshot.
+
+    Carries the same fields as a fabric DesktopApp without parsing its
+    .desktop file. The Gio.DesktopAppInfo is only loaded when something
+    actually needs it, like launching.
+    """
+
+    def __init__(self, entry: dict):
+        self.desktop_id: str = entry["id"]
+        self.path: str | None = entry.get("path")
+        self.name: str | None = entry.get("name")
+        self.display_name: str | None = entry.get("display_name")
+        self.generic_name: str | None = entry.get("generic_name")
+        self.description: str | None = entry.get("description")
+        self.window_class: str | None = entry.get("window_class")
+        self.executable: str | None = entry.get("executable")
+        self.command_line: str | None = entry.get("command_line")
+        self.icon_name: str | None = entry.get("icon_name")
+        self.keywords: list[str] = entry.get("keywords") or []
+        self._info = None
+
+    @property
+    def _app(self):
+        if self._info is None:
+            if self.path:
+                self._info = Gio.DesktopAppInfo.new_from_filename(self.path)
+            if self._info is None:
+                self._info = Gio.DesktopAppInfo.new(self.desktop_id)
+        return self._info
+
+    @property
+    def icon(self):
+        if not self.icon_name:
+            return None
+        try:
+            return Gio.Icon.new_for_string(self.icon_name)
+        except GLib.Error:
+            return None
+
+    def launch(self):
+        info = self._app
+        return info.launch() if info is not None else False
+
+    def get_icon_pixbuf(
+        self,
+        size: int = 48,
+        default_icon: str | None = "image-missing",
+        flags: Gtk.IconLookupFlags = Gtk.IconLookupFlags.FORCE_SIZE,
+    ):
+        theme = Gtk.IconTheme.get_default()
+        icon = self.icon
+        icon_info = theme.lookup_by_gicon(icon, size, flags) if icon is not None else None
+        try:
+            if icon_info is not None:
+                return icon_info.load_icon()
+            return theme.load_icon(default_icon, size, flags) if default_icon else None
+        except GLib.Error:
+            return None
+
+
+def _snapshot_entry(app) -> dict:
+    info = getattr(app, "_app", None)
+    if isinstance(app, SnapshotApp):
+        path, keywords = app.path, app.keywords
+    else:
+        path = info.get_filename() if info is not None else None
+        keywords = list(info.get_keywords() or []) if info is not None else []
+    return {
+        "id": app_id(app),
+        "path": path,
+        "mtime": _mtime(path) if path else None,
+        "name": app.name,
+        "display_name": app.display_name,
+        "generic_name": app.generic_name,
+        "description": app.description,
+        "window_class": app.window_class,
+        "executable": app.executable,
+        "command_line": app.command_line,
+        "icon_name": app.icon_name,
+        "keywords": keywords,
+    }
+
+
+def _fingerprint(app) -> tuple:
+    return (
+        app.name,
+        app.display_name,
+        app.generic_name,
+        app.window_class,
+        app.executable,
+        app.command_line,
+        app.icon_name,
+    )
+
+
+class DesktopAppRegistry(Service):
+    """
+    Installed applications, parsed once and shared by every module.
+
+    The list is reloaded only when Gio reports that the installed
+    applications changed, and the differences are announced through
+    `app-added`, `app-removed` and `app-changed`, followed by one `changed`.
+
+    Every load is written to a snapshot under CACHE_DIR. On the next start
+    the snapshot is used as is if no application directory and no recorded
+    .desktop file changed since, and the real list is read in the
+    background afterwards to reconcile anything the check missed.
+    """
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if DesktopAppRegistry.instance is None:
+            DesktopAppRegistry.instance = DesktopAppRegistry()
+
+        return DesktopAppRegistry.instance
+
+    @Signal
+    def app_added(self, app: object) -> None: ...
+
+    @Signal
+    def app_removed(self, app: object) -> None: ...
+
+    @Signal
+    def app_changed(self, app: object) -> None: ...
+
+    @Signal
+    def changed(self) -> None: ...
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._apps: dict[str, object] = {}
+        self._fingerprints: dict[str, tuple] = {}
+        self._reload_id = 0
+        self._scanning = False
+        self._scan_again = False
+        self.generation = 0
+        if self._load_snapshot():
+            GLib.timeout_add(RESCAN_DELAY_MS, self._reload)
+        else:
+            self.load()
+
+        # Must be kept alive, and only fires once the app list has been read
+        self._monitor = Gio.AppInfoMonitor.get()
+        self._monitor.connect("changed", self._on_monitor_changed)
+
+    @property
+    def apps(self) -> list:
+        return list(self._apps.values())
+
+    def get(self, desktop_id: str):
+        return self._apps.get(desktop_id)
+
+    def _on_monitor_changed(self, *_):
+        if self._reload_id:
+            GLib.source_remove(self._reload_id)
+        self._reload_id = GLib.timeout_add(RELOAD_DELAY_MS, self._reload)
+
+    def _reload(self):
+        self._reload_id = 0
+        self.rescan()
+        return False
+
+    def load(self):
+        """Read the installed applications and announce what changed since the last read."""
+        try:
+            apps = get_desktop_applications()
+        except Exception as e:
+            logger.warning(f"[DesktopApps] Failed to read desktop applications: {e}")
+            return
+        self._apply(apps)
+
+    def rescan(self):
+        """Like `load`, but the .desktop files are parsed on a worker thread."""
+        if self._scanning:
+            self._scan_again = True
+            return
+        self._scanning = True
+        threading.Thread(target=self._scan, name="desktop-apps", daemon=True).start()
+
+    def _scan(self):
+        try:
+            # Gio's app info parsing is thread safe, wrapping it in DesktopApp
+            # touches the icon theme and has to wait for the main loop
+            infos = [info for info in Gio.DesktopAppInfo.get_all() if info.should_show()]
+        except Exception as e:
+            logger.warning(f"[DesktopApps] Failed to read desktop applications: {e}")
+            infos = None
+        GLib.idle_add(self._on_scanned, infos)
+
+    def _on_scanned(self, infos):
+        self._scanning = False
+        if infos is not None:
+            self._apply([DesktopApp(info) for info in infos])
+        if self._scan_again:
+            self._scan_again = False
+            self.rescan()
+        return False
+
+    def _apply(self, apps: list):
+        new_apps = {}
+        for app in apps:
+            new_apps.setdefault(app_id(app), app)
+        new_fingerprints = {key: _fingerprint(app) for key, app in new_apps.items()}
+
+        first_load = self.generation == 0
+        added = [app for key, app in new_apps.items() if key not in self._apps]
+        removed = [app for key, app in self._apps.items() if key not in new_apps]
+        updated = [
+            app
+            for key, app in new_apps.items()
+            if key in self._fingerprints and self._fingerprints[key] != new_fingerprints[key]
+        ]
+
+        self._apps = new_apps
+        self._fingerprints = new_fingerprints
+        # Rewritten after every read, even without changes, to keep recorded mtimes current
+        self._save_snapshot()
+        if first_load:
+            self.generation = 1
+            return
+        if not (added or removed or updated):
+            return
+
+        self.generation += 1
+        logger.info(
+            f"[DesktopApps] {len(added)} added, {len(removed)} removed, {len(updated)} changed"
+        )
+        for app in added:
+            self.emit("app-added", app)
+        for app in removed:
+            self.emit("app-removed", app)
+        for app in updated:
+            self.emit("app-changed", app)
+        self.emit("changed")
+
+    def _load_snapshot(self) -> bool:
+        try:
+            with open(SNAPSHOT_FILE) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            return False
+        dirs = snapshot.get("dirs") or {}
+        if list(dirs) != application_dirs():
+            return False
+        if any(_mtime(path) != mtime for path, mtime in dirs.items()):
+            return False
+
+        try:
+            apps = [SnapshotApp(entry) for entry in snapshot["apps"]]
+        except (KeyError, TypeError):
+            return False
+        for entry in snapshot["apps"]:
+            if entry.get("path") and _mtime(entry["path"]) != entry.get("mtime"):
+                return False
+
+        self._apps = {app.desktop_id: app for app in apps}
+        self._fingerprints = {key: _fingerprint(app) for key, app in self._apps.items()}
+        self.generation = 1
+        logger.debug(f"[DesktopApps] Restored {len(apps)} applications from snapshot")
+        return True
+
+    def _save_snapshot(self):
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "dirs": {path: _mtime(path) for path in application_dirs()},
+            "apps": [_snapshot_entry(app) for app in self._apps.values()],
+        }
+        tmp_path = SNAPSHOT_FILE + ".tmp"
+        try:
+            os.makedirs(data.CACHE_DIR, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+            os.replace(tmp_path, SNAPSHOT_FILE)
+        except OSError as e:
+            logger.warning(f"[DesktopApps] Failed to write application snapshot: {e}")
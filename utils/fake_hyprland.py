@@ -0,0 +1,712 @@
+"""
+Stand-in for the Hyprland IPC sockets, for profiling the shell without a compositor.
+
+Serves the request socket (`.socket.sock`) from an in-memory model and
+streams events on `.socket2.sock`, either generated from a scenario or
+replayed from a recorded trace. Point the shell at it through the
+instance signature it prints:
+
+    python -m utils.fake_hyprland scenario --windows 500 --workspaces 10 --rate 200
+    HYPRLAND_INSTANCE_SIGNATURE=fake-bench python main.py
+
+Traces are recorded from a real session with
+
+    python -m utils.fake_hyprland record --out session.jsonl
+
+and replayed with `python -m utils.fake_hyprland replay session.jsonl`.
+Only the standard library is used so it runs on any Linux box.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from collections import Counter
+
+BATCH_DELIMITER = "\n\n\n"
+
+MONITOR_WIDTH = 2560
+MONITOR_HEIGHT = 1440
+GAP = 10
+
+APP_CLASSES = (
+    "firefox",
+    "kitty",
+    "code",
+    "thunar",
+    "discord",
+    "spotify",
+    "org.gnome.Nautilus",
+    "obsidian",
+    "mpv",
+    "steam",
+)
+
+
+def socket_dir(signature: str) -> str:
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR") or f"/run/user/{os.getuid()}"
+    return os.path.join(runtime_dir, "hypr", signature)
+
+
+class Model:
+    """Compositor state shaped like the `j/` replies of Hyprland."""
+
+    def __init__(self):
+        self.monitors: list[dict] = []
+        self.workspaces: dict[int, dict] = {}
+        self.clients: dict[str, dict] = {}
+        self.active_address: str | None = None
+        self.focused_monitor = 0
+        self._next_address = 0x55D0_0000_0000
+        self._next_pid = 10000
+
+    # Building
+
+    def add_monitor(self, name: str, x: int, width=MONITOR_WIDTH, height=MONITOR_HEIGHT):
+        monitor_id = len(self.monitors)
+        self.monitors.append(
+            {
+                "id": monitor_id,
+                "name": name,
+                "description": f"Fake Display {name}",
+                "make": "Fake",
+                "model": "Display",
+                "serial": name,
+                "width": width,
+                "height": height,
+                "refreshRate": 60.0,
+                "x": x,
+                "y": 0,
+                "activeWorkspace": {"id": -1, "name": ""},
+                "specialWorkspace": {"id": 0, "name": ""},
+                "reserved": [0, 0, 0, 0],
+                "scale": 1.0,
+                "transform": 0,
+                "focused": monitor_id == self.focused_monitor,
+                "dpmsStatus": True,
+                "vrr": False,
+                "disabled": False,
+            }
+        )
+
+    def add_workspace(self, workspace_id: int, monitor_id: int):
+        monitor = self.monitors[monitor_id]
+        self.workspaces[workspace_id] = {
+            "id": workspace_id,
+            "name": str(workspace_id),
+            "monitor": monitor["name"],
+            "monitorID": monitor_id,
+            "windows": 0,
+            "hasfullscreen": False,
+            "lastwindow": "0x0",
+            "lastwindowtitle": "",
+        }
+        if monitor["activeWorkspace"]["id"] == -1:
+            monitor["activeWorkspace"] = {"id": workspace_id, "name": str(workspace_id)}
+
+    def new_address(self) -> str:
+        self._next_address += 0x1A0
+        return hex(self._next_address)
+
+    def add_client(self, workspace_id: int, class_name: str, title: str, floating=False, address=None) -> dict:
+        workspace = self.workspaces.setdefault(
+            workspace_id,
+            {
+                "id": workspace_id,
+                "name": str(workspace_id),
+                "monitor": self.monitors[0]["name"],
+                "monitorID": 0,
+                "windows": 0,
+                "hasfullscreen": False,
+                "lastwindow": "0x0",
+                "lastwindowtitle": "",
+            },
+        )
+        self._next_pid += 1
+        client = {
+            "address": address or self.new_address(),
+            "mapped": True,
+            "hidden": False,
+            "at": [0, 0],
+            "size": [0, 0],
+            "workspace": {"id": workspace_id, "name": workspace["name"]},
+            "floating": floating,
+            "pseudo": False,
+            "monitor": workspace["monitorID"],
+            "class": class_name,
+            "title": title,
+            "initialClass": class_name,
+            "initialTitle": title,
+            "pid": self._next_pid,
+            "xwayland": False,
+            "pinned": False,
+            "fullscreen": 0,
+            "fullscreenClient": 0,
+            "grouped": [],
+            "tags": [],
+            "swallowing": "0x0",
+            "focusHistoryID": 0,
+        }
+        self.clients[client["address"]] = client
+        self.retile(workspace_id)
+        return client
+
+    # Geometry
+
+    def retile(self, workspace_id: int):
+        """Lay the tiled windows of a workspace out on a grid, like a dwindle layout would."""
+        workspace = self.workspaces.get(workspace_id)
+        if workspace is None:
+            return
+        monitor = self.monitors[workspace["monitorID"]]
+        windows = [c for c in self.clients.values() if c["workspace"]["id"] == workspace_id]
+        workspace["windows"] = len(windows)
+        tiled = [c for c in windows if not c["floating"]]
+        if tiled:
+            columns = max(1, round(len(tiled) ** 0.5))
+            rows = -(-len(tiled) // columns)
+            width = (monitor["width"] - GAP) // columns - GAP
+            height = (monitor["height"] - GAP) // rows - GAP
+            for i, client in enumerate(tiled):
+                column, row = i % columns, i // columns
+                client["at"] = [
+                    monitor["x"] + GAP + column * (width + GAP),
+                    monitor["y"] + GAP + row * (height + GAP),
+                ]
+                client["size"] = [width, height]
+        for client in windows:
+            if client["floating"] and client["size"] == [0, 0]:
+                client["size"] = [800, 600]
+                client["at"] = [monitor["x"] + 200, monitor["y"] + 200]
+
+    # Queries
+
+    def active_window(self) -> dict:
+        return self.clients.get(self.active_address, {}) if self.active_address else {}
+
+    def active_workspace(self) -> dict:
+        monitor = self.monitors[self.focused_monitor]
+        return self.workspaces.get(monitor["activeWorkspace"]["id"], {})
+
+    def query(self, name: str):
+        if name == "clients":
+            return list(self.clients.values())
+        if name == "monitors":
+            return self.monitors
+        if name == "workspaces":
+            return list(self.workspaces.values())
+        if name == "activewindow":
+            return self.active_window()
+        if name == "activeworkspace":
+            return self.active_workspace()
+        if name == "version":
+            return {"branch": "fake", "commit": "0", "tag": "v0.0.0-fake"}
+        if name == "layers":
+            return {}
+        if name == "devices":
+            return {"mice": [], "keyboards": [], "tablets": [], "touch": [], "switches": []}
+        return None
+
+    # Mutations, each returns the events Hyprland would emit for it
+
+    def focus(self, address: str) -> list[str]:
+        client = self.clients.get(address)
+        if client is None:
+            return []
+        self.active_address = address
+        events = []
+        workspace = self.workspaces[client["workspace"]["id"]]
+        monitor = self.monitors[workspace["monitorID"]]
+        if monitor["activeWorkspace"]["id"] != workspace["id"]:
+            events += self.switch_workspace(workspace["id"])
+        workspace["lastwindow"] = address
+        workspace["lastwindowtitle"] = client["title"]
+        return events + [
+            f"activewindow>>{client['class']},{client['title']}",
+            f"activewindowv2>>{address[2:]}",
+        ]
+
+    def switch_workspace(self, workspace_id: int) -> list[str]:
+        workspace = self.workspaces.get(workspace_id)
+        if workspace is None:
+            return []
+        events = []
+        if workspace["monitorID"] != self.focused_monitor:
+            for monitor in self.monitors:
+                monitor["focused"] = monitor["id"] == workspace["monitorID"]
+            self.focused_monitor = workspace["monitorID"]
+            events.append(f"focusedmon>>{workspace['monitor']},{workspace['name']}")
+        self.monitors[workspace["monitorID"]]["activeWorkspace"] = {
+            "id": workspace_id,
+            "name": workspace["name"],
+        }
+        return events + [f"workspace>>{workspace['name']}", f"workspacev2>>{workspace_id},{workspace['name']}"]
+
+    def open(self, workspace_id: int, class_name: str, title: str, floating=False, address=None) -> list[str]:
+        client = self.add_client(workspace_id, class_name, title, floating, address)
+        self.active_address = client["address"]
+        return [
+            f"openwindow>>{client['address'][2:]},{client['workspace']['name']},{class_name},{title}",
+            f"activewindow>>{class_name},{title}",
+            f"activewindowv2>>{client['address'][2:]}",
+        ]
+
+    def close(self, address: str) -> list[str]:
+        client = self.clients.pop(address, None)
+        if client is None:
+            return []
+        self.retile(client["workspace"]["id"])
+        events = [f"closewindow>>{address[2:]}"]
+        if self.active_address == address:
+            self.active_address = None
+            events += ["activewindow>>,", "activewindowv2>>"]
+        return events
+
+    def move(self, address: str, workspace_id: int) -> list[str]:
+        client = self.clients.get(address)
+        if client is None or workspace_id not in self.workspaces:
+            return []
+        old_workspace = client["workspace"]["id"]
+        workspace = self.workspaces[workspace_id]
+        client["workspace"] = {"id": workspace_id, "name": workspace["name"]}
+        client["monitor"] = workspace["monitorID"]
+        self.retile(old_workspace)
+        self.retile(workspace_id)
+        return [
+            f"movewindow>>{address[2:]},{workspace['name']}",
+            f"movewindowv2>>{address[2:]},{workspace_id},{workspace['name']}",
+        ]
+
+    def set_title(self, address: str, title: str) -> list[str]:
+        client = self.clients.get(address)
+        if client is None:
+            return []
+        client["title"] = title
+        events = [f"windowtitle>>{address[2:]}", f"windowtitlev2>>{address[2:]},{title}"]
+        if self.active_address == address:
+            events.append(f"activewindow>>{client['class']},{title}")
+        return events
+
+    def toggle_floating(self, address: str) -> list[str]:
+        client = self.clients.get(address)
+        if client is None:
+            return []
+        client["floating"] = not client["floating"]
+        if client["floating"]:
+            client["size"] = [0, 0]
+        self.retile(client["workspace"]["id"])
+        return [f"changefloatingmode>>{address[2:]},{int(client['floating'])}"]
+
+    def drag(self, address: str, dx: int, dy: int) -> list[str]:
+        """Move a floating window. Hyprland emits nothing for the drag itself."""
+        client = self.clients.get(address)
+        if client is None or not client["floating"]:
+            return []
+        client["at"] = [client["at"][0] + dx, client["at"][1] + dy]
+        return []
+
+    def dispatch(self, arguments: str) -> tuple[str, list[str]]:
+        """Run a `dispatch` request, returns the reply and the resulting events."""
+        name, _, args = arguments.strip().partition(" ")
+        address = None
+        if "address:" in args:
+            address = args.split("address:", 1)[1].split(",", 1)[0].strip()
+        if name == "focuswindow" and address:
+            return "ok", self.focus(address)
+        if name in ("closewindow", "killwindow") and address:
+            return "ok", self.close(address)
+        if name in ("movetoworkspace", "movetoworkspacesilent"):
+            target, _, rest = args.partition(",")
+            address = address or self.active_address
+            if not target.lstrip("-").isdigit() or address is None:
+                return "ok", []
+            events = self.move(address, int(target))
+            if name == "movetoworkspace":
+                events += self.focus(address)
+            return "ok", events
+        if name == "workspace" and args.strip().lstrip("-").isdigit():
+            return "ok", self.switch_workspace(int(args))
+        if name == "togglefloating":
+            address = address or self.active_address
+            return "ok", self.toggle_floating(address) if address else []
+        # exec, exit and the rest have no effect on the model
+        return "ok", []
+
+    def apply_event(self, line: str):
+        """Keep the model in step with an event replayed from a trace."""
+        name, _, data = line.partition(">>")
+        fields = data.split(",")
+        if name == "openwindow" and len(fields) >= 4:
+            address = "0x" + fields[0]
+            workspace_id = int(fields[1]) if fields[1].lstrip("-").isdigit() else 1
+            self.add_client(workspace_id, fields[2], ",".join(fields[3:]), address=address)
+        elif name == "closewindow":
+            self.close("0x" + fields[0])
+        elif name == "movewindowv2" and len(fields) >= 2 and fields[1].lstrip("-").isdigit():
+            if int(fields[1]) not in self.workspaces:
+                self.add_workspace(int(fields[1]), self.focused_monitor)
+            self.move("0x" + fields[0], int(fields[1]))
+        elif name == "activewindowv2":
+            self.active_address = "0x" + fields[0] if fields[0] else None
+        elif name == "workspacev2" and fields[0].lstrip("-").isdigit():
+            if int(fields[0]) not in self.workspaces:
+                self.add_workspace(int(fields[0]), self.focused_monitor)
+            self.switch_workspace(int(fields[0]))
+        elif name == "changefloatingmode" and len(fields) >= 2:
+            client = self.clients.get("0x" + fields[0])
+            if client is not None and client["floating"] != (fields[1] == "1"):
+                self.toggle_floating(client["address"])
+        elif name == "windowtitlev2" and len(fields) >= 2:
+            self.set_title("0x" + fields[0], ",".join(fields[1:]))
+
+    def load_snapshot(self, snapshot: dict):
+        """Start from the state captured at the beginning of a recorded trace."""
+        self.monitors = snapshot.get("monitors") or self.monitors
+        self.workspaces = {w["id"]: w for w in snapshot.get("workspaces", [])}
+        self.clients = {c["address"]: c for c in snapshot.get("clients", [])}
+        self.active_address = (snapshot.get("activewindow") or {}).get("address")
+        self.focused_monitor = next(
+            (m["id"] for m in self.monitors if m.get("focused")), 0
+        )
+
+
+def build_scenario(windows: int, workspaces: int, monitors: int, seed: int) -> Model:
+    rng = random.Random(seed)
+    model = Model()
+    for i in range(monitors):
+        model.add_monitor(f"DP-{i + 1}", i * MONITOR_WIDTH)
+    for workspace_id in range(1, workspaces + 1):
+        model.add_workspace(workspace_id, (workspace_id - 1) % monitors)
+    for i in range(windows):
+        class_name = rng.choice(APP_CLASSES)
+        model.add_client(
+            rng.randint(1, workspaces),
+            class_name,
+            f"{class_name} window {i}",
+            floating=rng.random() < 0.15,
+        )
+    if model.clients:
+        model.active_address = next(iter(model.clients))
+    return model
+
+
+class ScenarioDriver:
+    """Turns a steady event rate into plausible desktop activity."""
+
+    def __init__(self, model: Model, windows: int, workspaces: int, seed: int):
+        self.model = model
+        self.target_windows = windows
+        self.workspaces = workspaces
+        self.rng = random.Random(seed + 1)
+        self.counter = 0
+
+    def step(self) -> list[str]:
+        model, rng = self.model, self.rng
+        self.counter += 1
+        addresses = list(model.clients)
+        roll = rng.random()
+        if not addresses or (roll < 0.08 and len(addresses) < self.target_windows * 1.1):
+            class_name = rng.choice(APP_CLASSES)
+            return model.open(
+                rng.randint(1, self.workspaces), class_name, f"{class_name} window n{self.counter}"
+            )
+        address = rng.choice(addresses)
+        if roll < 0.16 and len(addresses) > self.target_windows * 0.9:
+            return model.close(address)
+        if roll < 0.50:
+            return model.focus(address)
+        if roll < 0.70:
+            return model.set_title(address, f"{model.clients[address]['class']} title {self.counter}")
+        if roll < 0.85:
+            floating = [a for a in addresses if model.clients[a]["floating"]]
+            if floating:
+                # A drag is only noticed through the focus change that follows it
+                address = rng.choice(floating)
+                model.drag(address, rng.randint(-40, 40), rng.randint(-40, 40))
+                return model.focus(address)
+            return model.toggle_floating(address)
+        if roll < 0.93:
+            return model.move(address, rng.randint(1, self.workspaces))
+        if roll < 0.97:
+            return model.toggle_floating(address)
+        return model.switch_workspace(rng.randint(1, self.workspaces))
+
+
+class FakeHyprland:
+    def __init__(self, model: Model, signature: str):
+        self.model = model
+        self.signature = signature
+        self.directory = socket_dir(signature)
+        self.listeners: set[asyncio.StreamWriter] = set()
+        self.requests = Counter()
+        self.events_sent = 0
+
+    @property
+    def request_path(self):
+        return os.path.join(self.directory, ".socket.sock")
+
+    @property
+    def event_path(self):
+        return os.path.join(self.directory, ".socket2.sock")
+
+    async def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for path in (self.request_path, self.event_path):
+            if os.path.exists(path):
+                os.unlink(path)
+        self.request_server = await asyncio.start_unix_server(self.on_request, self.request_path)
+        self.event_server = await asyncio.start_unix_server(self.on_listener, self.event_path)
+
+    async def stop(self):
+        for server in (self.request_server, self.event_server):
+            server.close()
+        for writer in list(self.listeners):
+            writer.close()
+        for path in (self.request_path, self.event_path):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def answer(self, command: str) -> str:
+        if command.startswith("[[BATCH]]"):
+            return BATCH_DELIMITER.join(
+                self.answer(part) for part in command[len("[[BATCH]]"):].split(";") if part
+            )
+        head, _, arguments = command.strip().partition(" ")
+        flags, _, name = head.rpartition("/")
+        self.requests[name] += 1
+        if name == "dispatch":
+            reply, events = self.model.dispatch(arguments)
+            self.broadcast(events)
+            return reply
+        if name in ("keyword", "reload", "setcursor", "notify"):
+            return "ok"
+        if name == "splash":
+            return "Fake Hyprland is serving this session"
+        result = self.model.query(name)
+        if result is None:
+            return "unknown request"
+        return json.dumps(result) if "j" in flags else json.dumps(result, indent=1)
+
+    async def on_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            data = await reader.read(65536)
+            writer.write(self.answer(data.decode(errors="replace")).encode())
+            await writer.drain()
+        except (ConnectionError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def on_listener(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.listeners.add(writer)
+        try:
+            await reader.read()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.listeners.discard(writer)
+
+    def broadcast(self, events: list[str]):
+        if not events:
+            return
+        payload = "".join(f"{event}\n" for event in events).encode()
+        self.events_sent += len(events)
+        for writer in list(self.listeners):
+            if writer.is_closing():
+                self.listeners.discard(writer)
+                continue
+            writer.write(payload)
+
+    def summary(self, elapsed: float) -> str:
+        total = sum(self.requests.values())
+        top = ", ".join(f"{name}={count}" for name, count in self.requests.most_common(8))
+        return (
+            f"{elapsed:.1f}s: {self.events_sent} events sent "
+            f"({self.events_sent / elapsed if elapsed else 0:.1f}/s), {total} requests served "
+            f"({total / elapsed if elapsed else 0:.1f}/s) [{top}]"
+        )
+
+
+async def run_scenario(server: FakeHyprland, driver: ScenarioDriver | None, rate: float, duration: float):
+    started = time.monotonic()
+    if driver is None or rate <= 0:
+        await asyncio.sleep(duration if duration > 0 else float("inf"))
+        return
+    interval = 1 / rate
+    next_at = started
+    while duration <= 0 or time.monotonic() - started < duration:
+        now = time.monotonic()
+        # Catch up in one go when the loop fell behind the requested rate.
+        # A step can emit several events, the budget is spent per event.
+        while next_at <= now:
+            events = driver.step()
+            server.broadcast(events)
+            next_at += interval * max(len(events), 1)
+        await asyncio.sleep(next_at - time.monotonic())
+
+
+async def run_replay(server: FakeHyprland, events: list[tuple[float | None, str]], speed: float, rate: float):
+    started = time.monotonic()
+    for i, (at, line) in enumerate(events):
+        if at is not None:
+            delay = at / speed - (time.monotonic() - started)
+        else:
+            delay = (i / rate if rate > 0 else 0) - (time.monotonic() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        server.model.apply_event(line)
+        server.broadcast([line])
+
+
+def load_trace(path: str) -> tuple[dict | None, list[tuple[float | None, str]]]:
+    """
+    Read a trace: JSON lines with {"t": seconds, "event": "name>>data"}, an
+    optional {"snapshot": {...}} first line, or a raw socket2 dump.
+    """
+    snapshot = None
+    events = []
+    with open(path, "r") as file:
+        for line in file:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                if "snapshot" in entry:
+                    snapshot = entry["snapshot"]
+                else:
+                    events.append((entry.get("t"), entry["event"]))
+            elif ">>" in line:
+                events.append((None, line))
+    return snapshot, events
+
+
+def record(out: str, duration: float):
+    """Capture the real compositor's state and events into a replayable trace."""
+    signature = os.getenv("HYPRLAND_INSTANCE_SIGNATURE")
+    if not signature:
+        sys.exit("HYPRLAND_INSTANCE_SIGNATURE is not set, is Hyprland running?")
+    directory = socket_dir(signature)
+
+    def query(command: str):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(os.path.join(directory, ".socket.sock"))
+            sock.sendall(command.encode())
+            chunks = []
+            while chunk := sock.recv(65536):
+                chunks.append(chunk)
+        return json.loads(b"".join(chunks).decode())
+
+    snapshot = {
+        name: query(f"j/{name}")
+        for name in ("monitors", "workspaces", "clients", "activewindow", "activeworkspace")
+    }
+    started = time.monotonic()
+    count = 0
+    with open(out, "w") as file, socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        file.write(json.dumps({"snapshot": snapshot}) + "\n")
+        sock.connect(os.path.join(directory, ".socket2.sock"))
+        sock.settimeout(0.5)
+        buffer = b""
+        try:
+            while duration <= 0 or time.monotonic() - started < duration:
+                try:
+                    chunk = sock.recv(65536)
+                except socket.timeout:
+                    continue
+                if not chunk:
+                    break
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                at = round(time.monotonic() - started, 4)
+                for line in lines:
+                    file.write(json.dumps({"t": at, "event": line.decode(errors="replace")}) + "\n")
+                    count += 1
+        except KeyboardInterrupt:
+            pass
+    print(f"Recorded {count} events in {time.monotonic() - started:.1f}s to {out}")
+
+
+async def serve(args):
+    if args.mode == "replay":
+        snapshot, events = load_trace(args.trace)
+        model = build_scenario(0, args.workspaces, args.monitors, args.seed)
+        if snapshot:
+            model.load_snapshot(snapshot)
+        driver = None
+    else:
+        model = build_scenario(args.windows, args.workspaces, args.monitors, args.seed)
+        driver = ScenarioDriver(model, args.windows, args.workspaces, args.seed)
+
+    server = FakeHyprland(model, args.signature)
+    await server.start()
+    print(f"Fake Hyprland listening in {server.directory}")
+    print(f"export HYPRLAND_INSTANCE_SIGNATURE={args.signature}", flush=True)
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    if args.mode == "replay":
+        # Give the shell a moment to connect before the trace starts
+        await asyncio.sleep(args.delay)
+        task = asyncio.create_task(run_replay(server, events, args.speed, args.rate))
+    else:
+        await asyncio.sleep(args.delay)
+        task = asyncio.create_task(run_scenario(server, driver, args.rate, args.duration))
+
+    started = time.monotonic()
+    stopper = asyncio.create_task(stop.wait())
+    await asyncio.wait({task, stopper}, return_when=asyncio.FIRST_COMPLETED)
+    if task.done() and args.mode == "replay" and not stop.is_set() and args.linger:
+        print("Trace finished, still serving requests (Ctrl+C to stop)", flush=True)
+        await stopper
+    task.cancel()
+    stopper.cancel()
+    print(server.summary(time.monotonic() - started))
+    await server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.fake_hyprland", description=__doc__.split("\n\n")[0].strip())
+    modes = parser.add_subparsers(dest="mode", required=True)
+
+    def add_common(sub):
+        sub.add_argument("--signature", default="fake-bench", help="instance signature to serve under")
+        sub.add_argument("--monitors", type=int, default=2)
+        sub.add_argument("--workspaces", type=int, default=10)
+        sub.add_argument("--seed", type=int, default=1)
+        sub.add_argument("--delay", type=float, default=2.0, help="seconds to wait before sending events")
+
+    scenario = modes.add_parser("scenario", help="generate windows and events")
+    add_common(scenario)
+    scenario.add_argument("--windows", type=int, default=500)
+    scenario.add_argument("--rate", type=float, default=200, help="events per second, 0 to only serve requests")
+    scenario.add_argument("--duration", type=float, default=60, help="seconds, 0 to run until interrupted")
+
+    replay = modes.add_parser("replay", help="replay a recorded trace")
+    add_common(replay)
+    replay.add_argument("trace")
+    replay.add_argument("--speed", type=float, default=1.0, help="time scale for timestamped traces")
+    replay.add_argument("--rate", type=float, default=200, help="events per second for raw socket2 dumps")
+    replay.add_argument("--linger", action="store_true", help="keep serving requests after the trace ends")
+
+    recorder = modes.add_parser("record", help="record a trace from the running Hyprland")
+    recorder.add_argument("--out", default="hyprland-trace.jsonl")
+    recorder.add_argument("--duration", type=float, default=0, help="seconds, 0 to run until interrupted")
+
+    args = parser.parse_args(argv)
+    if args.mode == "record":
+        record(args.out, args.duration)
+    else:
+        asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,539 @@
+import array
+import fnmatch
+import os
+import struct
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from gi.repository import GLib
+from loguru import logger
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+import config.data as data
+from utils.fuzzy import fuzzy_score
+
+INDEX_FILE = data.CACHE_DIR + "/file_index.bin"
+INDEX_MAGIC = b"HFFI"
+INDEX_VERSION = 1
+_HEADER = struct.Struct("<4sIIIII")
+
+# Never indexed, on top of the user's own patterns and per-directory ignore files
+DEFAULT_IGNORE = (".*", "node_modules", "__pycache__", "*.pyc", "*~")
+IGNORE_FILES = (".gitignore", ".ignore")
+
+# Changes are written out this long after the last one
+SAVE_DELAY_S = 30
+# Removed paths tolerated, as a share of all ids, before the next save renumbers
+COMPACT_RATIO = 0.25
+
+# Candidates verified between two polls of a query's deadline and `stale` callback
+CHECK_INTERVAL = 512
+
+# Ranked below basename matches of the same quality
+PATH_MATCH_PENALTY = 32
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _parse_ignore_file(path: str) -> list[tuple[str, bool, bool]]:
+    """
+    (pattern, directories only, anchored) of every rule in a gitignore-style
+    file. Negated rules are not supported and skipped.
+    """
+    rules = []
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith(("#", "!")):
+            continue
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if line.startswith("**/"):
+            line = line[3:]
+        anchored = "/" in line
+        rules.append((line.lstrip("/"), dir_only, anchored))
+    return rules
+
+
+class IgnoreRules:
+    """
+    Global name patterns, plus the rules of `.gitignore` and `.ignore` files,
+    which apply below the directory holding them.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._dir_rules: dict[str, list] = {}
+
+    def rules_for(self, directory: str) -> list[tuple[str, bool, bool]]:
+        rules = self._dir_rules.get(directory)
+        if rules is None:
+            rules = []
+            for name in IGNORE_FILES:
+                rules.extend(_parse_ignore_file(os.path.join(directory, name)))
+            self._dir_rules[directory] = rules
+        return rules
+
+    def forget(self, directory: str):
+        """Drop the cached rules of `directory`, after its ignore files changed."""
+        self._dir_rules.pop(directory, None)
+
+    def ignored(self, path: str, is_dir: bool, chain: list[tuple[str, list]]) -> bool:
+        """
+        Whether `path` is ignored, given the (directory, rules) of its
+        ancestors below the index root.
+        """
+        name = os.path.basename(path)
+        if any(fnmatch.fnmatchcase(name, pattern) for pattern in self.patterns):
+            return True
+        for directory, rules in chain:
+            relative = None
+            for pattern, dir_only, anchored in rules:
+                if dir_only and not is_dir:
+                    continue
+                if anchored:
+                    if relative is None:
+                        relative = os.path.relpath(path, directory)
+                    if fnmatch.fnmatchcase(relative, pattern):
+                        return True
+                elif fnmatch.fnmatchcase(name, pattern):
+                    return True
+        return False
+
+    def chain(self, root: str, directory: str) -> list[tuple[str, list]] | None:
+        """
+        Rules of `directory` and its ancestors up to `root`, None when one of
+        those directories is ignored itself.
+        """
+        chain = [(root, self.rules_for(root))]
+        relative = os.path.relpath(directory, root)
+        if relative == ".":
+            return chain
+        current = root
+        for part in relative.split(os.sep):
+            current = os.path.join(current, part)
+            if self.ignored(current, True, chain):
+                return None
+            chain.append((current, self.rules_for(current)))
+        return chain
+
+
+class PathIndex:
+    """
+    Indexed paths and their trigram postings.
+
+    Every path gets an id, its position in `paths`. Postings map each
+    trigram of the casefolded path below its root to the ids containing
+    it. Removing a path only clears its slot, stale ids in the postings are
+    skipped by queries and dropped when the index is compacted.
+    """
+
+    def __init__(self, roots: list[str]):
+        self.roots = roots
+        self.paths: list[str | None] = []
+        # Start of the part below the root, which is what queries match
+        self.offsets = array.array("H")
+        self.ids: dict[str, int] = {}
+        self.postings: dict[str, array.array] = {}
+        self.removed = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, path: str, offset: int):
+        if path in self.ids:
+            return
+        i = len(self.paths)
+        # Filled before any posting refers to the slot, for readers on other threads
+        self.offsets.append(offset)
+        self.paths.append(path)
+        self.ids[path] = i
+        postings = self.postings
+        for trigram in trigrams(path[offset:].casefold()):
+            posting = postings.get(trigram)
+            if posting is None:
+                postings[trigram] = array.array("I", (i,))
+            else:
+                posting.append(i)
+
+    def remove(self, path: str):
+        i = self.ids.pop(path, None)
+        if i is not None:
+            self.paths[i] = None
+            self.removed += 1
+
+    def remove_tree(self, path: str):
+        self.remove(path)
+        prefix = path.rstrip(os.sep) + os.sep
+        for child in [p for p in self.ids if p.startswith(prefix)]:
+            self.remove(child)
+
+    def compacted(self) -> "PathIndex":
+        """A copy without removed paths, ids renumbered."""
+        index = PathIndex(self.roots)
+        remap = array.array("i", [-1]) * len(self.paths)
+        for i, path in enumerate(self.paths):
+            if path is not None:
+                remap[i] = len(index.paths)
+                index.ids[path] = len(index.paths)
+                index.paths.append(path)
+                index.offsets.append(self.offsets[i])
+        for trigram, posting in self.postings.items():
+            kept = array.array("I", (remap[i] for i in posting if remap[i] >= 0))
+            if kept:
+                index.postings[trigram] = kept
+        return index
+
+    def save(self, path: str):
+        """Write the index, in native byte order since it never leaves this machine."""
+        index = self.compacted() if self.removed else self
+        keys = list(index.postings)
+        counts = array.array("I", (len(index.postings[key]) for key in keys))
+        roots_blob = "\0".join(index.roots).encode("utf-8", "surrogateescape")
+        paths_blob = "\0".join(index.paths).encode("utf-8", "surrogateescape")
+        keys_blob = "\0".join(keys).encode("utf-8", "surrogateescape")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(
+                _HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(roots_blob), len(paths_blob), len(keys_blob), len(keys))
+            )
+            f.write(roots_blob)
+            f.write(paths_blob)
+            f.write(keys_blob)
+            f.write(index.offsets.tobytes())
+            f.write(counts.tobytes())
+            for key in keys:
+                f.write(index.postings[key].tobytes())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str, roots: list[str]) -> "PathIndex | None":
+        """The index saved at `path`, None when it is missing, damaged or for other roots."""
+        try:
+            with open(path, "rb") as f:
+                buffer = f.read()
+            magic, version, roots_len, paths_len, keys_len, n_keys = _HEADER.unpack_from(buffer)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                return None
+            position = _HEADER.size
+
+            def take(length: int) -> bytes:
+                nonlocal position
+                chunk = buffer[position : position + length]
+                if len(chunk) != length:
+                    raise ValueError("truncated index")
+                position += length
+                return chunk
+
+            saved_roots = take(roots_len).decode("utf-8", "surrogateescape").split("\0")
+            if saved_roots != roots:
+                return None
+            paths_blob = take(paths_len).decode("utf-8", "surrogateescape")
+            keys_blob = take(keys_len).decode("utf-8", "surrogateescape")
+            index = PathIndex(roots)
+            index.paths = paths_blob.split("\0") if paths_blob else []
+            index.offsets.frombytes(take(len(index.paths) * index.offsets.itemsize))
+            counts = array.array("I")
+            counts.frombytes(take(n_keys * counts.itemsize))
+            keys = keys_blob.split("\0") if keys_blob else []
+            if len(keys) != n_keys:
+                raise ValueError("key count mismatch")
+            for key, count in zip(keys, counts):
+                posting = array.array("I")
+                posting.frombytes(take(count * posting.itemsize))
+                index.postings[key] = posting
+        except (OSError, ValueError, struct.error) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"[FileIndex] Ignoring damaged index: {e}")
+            return None
+        index.ids = {p: i for i, p in enumerate(index.paths)}
+        return index
+
+    def search(
+        self,
+        query: str,
+        limit: int,
+        deadline: float | None = None,
+        stale: Callable[[], bool] | None = None,
+    ) -> list[tuple[float, str]]:
+        """
+        (score, path) of the best matches, best first.
+
+        Every whitespace separated term must appear in the path below its
+        root. Terms of three or more characters are looked up in the
+        postings, and only the rarest trigram's ids are verified. When that
+        finds fewer than `limit` paths, the rest are scanned for fuzzy
+        matches until `deadline`.
+        """
+        terms = query.casefold().split()
+        if not terms:
+            return []
+        # id -> (score, path), paths are kept since they may be removed meanwhile
+        found: dict[int, tuple[float, str]] = {}
+        rarest = None
+        for term in terms:
+            for trigram in trigrams(term):
+                posting = self.postings.get(trigram)
+                if posting is None:
+                    rarest = ()
+                    break
+                if rarest is None or len(posting) < len(rarest):
+                    rarest = posting
+            if rarest == ():
+                break
+        candidates = rarest if rarest is not None else range(len(self.paths))
+
+        for n, i in enumerate(candidates):
+            if not n % CHECK_INTERVAL and self._expired(deadline, stale):
+                break
+            path = self.paths[i]
+            if path is None or i in found:
+                continue
+            text = path[self.offsets[i] :].casefold()
+            if all(term in text for term in terms):
+                found[i] = (self._score(terms, text), path)
+
+        if len(found) < limit and len(terms) == 1 and rarest is not None:
+            # Nothing spelled out the query, fall back to fuzzy matches of the names
+            term = terms[0]
+            for i in range(len(self.paths)):
+                if not i % CHECK_INTERVAL and self._expired(deadline, stale):
+                    break
+                path = self.paths[i]
+                if path is None or i in found:
+                    continue
+                score = fuzzy_score(term, os.path.basename(path).casefold())
+                if score is not None:
+                    found[i] = (score - PATH_MATCH_PENALTY, path)
+
+        ranked = sorted(found.values(), key=lambda match: (-match[0], len(match[1])))
+        return ranked[:limit]
+
+    @staticmethod
+    def _expired(deadline: float | None, stale: Callable[[], bool] | None) -> bool:
+        return (deadline is not None and time.monotonic() > deadline) or (stale is not None and stale())
+
+    @staticmethod
+    def _score(terms: list[str], text: str) -> float:
+        name = text[text.rfind(os.sep) + 1 :]
+        score = 0
+        for term in terms:
+            term_score = fuzzy_score(term, name)
+            if term_score is None:
+                term_score = fuzzy_score(term, text) - PATH_MATCH_PENALTY
+            score += term_score
+        return score
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, index: "FileIndex"):
+        self.index = index
+
+    def on_created(self, event):
+        self.index.submit(self.index._on_added, event.src_path, event.is_directory)
+
+    def on_deleted(self, event):
+        self.index.submit(self.index._on_removed, event.src_path)
+
+    def on_moved(self, event):
+        self.index.submit(self.index._on_removed, event.src_path)
+        self.index.submit(self.index._on_added, event.dest_path, event.is_directory)
+
+    def on_modified(self, event):
+        if not event.is_directory and os.path.basename(event.src_path) in IGNORE_FILES:
+            self.index.submit(self.index._on_ignore_file_changed, event.src_path)
+
+
+class FileIndex:
+    """
+    Background index of the files below the configured roots.
+
+    The index saved by the last session is loaded first, then the roots
+    are walked again in the background and the fresh index is swapped in.
+    From then on inotify events, through watchdog, keep it current. Every
+    indexed directory gets its own non-recursive watch, added as the walk
+    reaches it, so ignored trees never use up inotify watches. Every
+    change runs on one worker thread, queries may come from any thread.
+    """
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if FileIndex.instance is None:
+            FileIndex.instance = FileIndex()
+
+        return FileIndex.instance
+
+    def __init__(
+        self,
+        roots: list[str] | None = None,
+        ignore: list[str] | None = None,
+        path: str = INDEX_FILE,
+    ):
+        self.roots = [
+            os.path.realpath(os.path.expanduser(root)) for root in (roots or data.FILE_INDEX_ROOTS)
+        ]
+        self.roots = [root for root in self.roots if os.path.isdir(root)]
+        self.path = path
+        self.rules = IgnoreRules([*DEFAULT_IGNORE, *(ignore if ignore is not None else data.FILE_INDEX_IGNORE)])
+        self.index = PathIndex(self.roots)
+        self.ready = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="file-index")
+        self._save_id = 0
+
+        self._observer = Observer()
+        self._observer.daemon = True
+        self._handler = _EventHandler(self)
+        # Directory -> its watch, only touched on the worker
+        self._watches: dict[str, object] = {}
+        self._watching = True
+
+        # Queued behind these, events only apply once the fresh index is in place
+        self.submit(self._observer.start)
+        self.submit(self._restore)
+        self.submit(self._rebuild)
+
+    def submit(self, function, *args):
+        future = self._executor.submit(function, *args)
+        future.add_done_callback(self._log_failure)
+
+    @staticmethod
+    def _log_failure(future):
+        error = future.exception()
+        if error is not None:
+            logger.opt(exception=error).error(f"[FileIndex] Update failed: {error}")
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        deadline: float | None = None,
+        stale: Callable[[], bool] | None = None,
+    ) -> list[tuple[float, str]]:
+        """(score, path) of the best matches for `query`, see PathIndex.search."""
+        return self.index.search(query, limit, deadline, stale)
+
+    def _root_of(self, path: str) -> str | None:
+        for root in self.roots:
+            if path == root or path.startswith(root.rstrip(os.sep) + os.sep):
+                return root
+        return None
+
+    def _restore(self):
+        index = PathIndex.load(self.path, self.roots)
+        if index is not None:
+            self.index = index
+            self.ready = True
+            logger.debug(f"[FileIndex] Restored {len(index)} paths")
+
+    def _watch(self, directory: str):
+        if not self._watching or directory in self._watches:
+            return
+        try:
+            self._watches[directory] = self._observer.schedule(self._handler, directory, recursive=False)
+        except OSError as e:
+            # Usually the inotify watch limit, what is watched already keeps updating
+            self._watching = False
+            logger.warning(f"[FileIndex] Cannot watch for more changes, at {len(self._watches)} watches: {e}")
+
+    def _unwatch_tree(self, path: str):
+        prefix = path.rstrip(os.sep) + os.sep
+        for directory in [d for d in self._watches if d == path or d.startswith(prefix)]:
+            watch = self._watches.pop(directory)
+            try:
+                self._observer.unschedule(watch)
+            except (KeyError, OSError):
+                pass  # Already gone along with the directory
+
+    def _walk(self, index: PathIndex, root: str, directory: str, chain: list):
+        """Add everything below `directory` that isn't ignored, watching each directory."""
+        offset = len(root.rstrip(os.sep)) + 1
+        pending = [(directory, chain)]
+        while pending:
+            directory, chain = pending.pop()
+            # Watched before it is read, so nothing created meanwhile is missed
+            self._watch(directory)
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if self.rules.ignored(entry.path, is_dir, chain):
+                    continue
+                index.add(entry.path, offset)
+                if is_dir:
+                    pending.append((entry.path, [*chain, (entry.path, self.rules.rules_for(entry.path))]))
+
+    def _rebuild(self):
+        started = time.monotonic()
+        index = PathIndex(self.roots)
+        for root in self.roots:
+            self._walk(index, root, root, [(root, self.rules.rules_for(root))])
+        self.index = index
+        self.ready = True
+        logger.info(
+            f"[FileIndex] Indexed {len(index)} paths in {time.monotonic() - started:.1f}s"
+        )
+        self._save()
+
+    def _on_added(self, path: str, is_dir: bool):
+        root = self._root_of(path)
+        if root is None or path == root:
+            return
+        chain = self.rules.chain(root, os.path.dirname(path))
+        if chain is None or self.rules.ignored(path, is_dir, chain):
+            return
+        offset = len(root.rstrip(os.sep)) + 1
+        self.index.add(path, offset)
+        if is_dir:
+            # Moved-in directories arrive as one event, their contents are walked here
+            self._walk(self.index, root, path, [*chain, (path, self.rules.rules_for(path))])
+        self._schedule_save()
+
+    def _on_removed(self, path: str):
+        # Watches follow a moved directory's inode, they are re-added at its new path
+        self._unwatch_tree(path)
+        if path in self.index.ids:
+            self.index.remove_tree(path)
+            self._schedule_save()
+
+    def _on_ignore_file_changed(self, path: str):
+        self.rules.forget(os.path.dirname(path))
+
+    def _schedule_save(self):
+        if not self._save_id:
+            GLib.idle_add(self._arm_save)
+
+    def _arm_save(self):
+        if not self._save_id:
+            self._save_id = GLib.timeout_add_seconds(SAVE_DELAY_S, self._on_save_timeout)
+        return False
+
+    def _on_save_timeout(self):
+        self._save_id = 0
+        self.submit(self._save)
+        return False
+
+    def _save(self):
+        index = self.index
+        if index.removed > COMPACT_RATIO * max(1, len(index.paths)):
+            index = index.compacted()
+            self.index = index
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            index.save(self.path)
+        except OSError as e:
+            logger.warning(f"[FileIndex] Failed to save index: {e}")
@@ -0,0 +1,124 @@
+import math
+import os
+import time
+
+from loguru import logger
+
+import config.data as data
+
+USAGE_FILE = data.CACHE_DIR + "/launches.log"
+
+# A launch counts half as much after this long
+HALF_LIFE_SECONDS = 7 * 24 * 3600
+_DECAY = math.log(2) / HALF_LIFE_SECONDS
+
+# Scores below this are dropped when the log is compacted
+MIN_SCORE = 0.01
+
+# Appended lines tolerated before the log is rewritten, one line per key
+COMPACT_AFTER = 512
+
+# Bonus added to a fuzzy match score per doubling of the usage score
+FRECENCY_BONUS = 8
+
+
+def _normalize_key(key: str) -> str:
+    # Tabs and newlines would break the log format
+    return " ".join(key.split())
+
+
+class UsageStore:
+    """
+    Exponentially decaying launch counts, kept in an append-only log.
+
+    Each line is `time<TAB>weight<TAB>key`. Replaying the log decays a key's
+    score to the time of each line and adds its weight, so a launch is one
+    appended line with weight 1. Once enough lines piled up the log is
+    compacted to one line per key, holding its score at its last launch.
+    """
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if UsageStore.instance is None:
+            UsageStore.instance = UsageStore()
+
+        return UsageStore.instance
+
+    def __init__(self, path: str = USAGE_FILE):
+        self.path = path
+        # key -> (score at the last launch, time of the last launch)
+        self._scores: dict[str, tuple[float, float]] = {}
+        self._lines = 0
+        self._load()
+        if self._lines > len(self._scores) + COMPACT_AFTER // 2:
+            self.compact()
+
+    def _add(self, key: str, when: float, weight: float):
+        score, last = self._scores.get(key, (0.0, when))
+        if when >= last:
+            self._scores[key] = (score * math.exp(-_DECAY * (when - last)) + weight, when)
+        else:
+            # Clock went backwards, decay the new weight to the last launch instead
+            self._scores[key] = (score + weight * math.exp(-_DECAY * (last - when)), last)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    self._lines += 1
+                    try:
+                        when, weight, key = line.rstrip("\n").split("\t", 2)
+                        self._add(key, float(when), float(weight))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"[Usage] Failed to read launch history: {e}")
+
+    def record(self, key: str, when: float | None = None):
+        """Count one launch of `key`."""
+        if not key:
+            return
+        key = _normalize_key(key)
+        when = time.time() if when is None else when
+        self._add(key, when, 1.0)
+        try:
+            with open(self.path, "a") as f:
+                f.write(f"{when:.0f}\t1\t{key}\n")
+            self._lines += 1
+        except OSError as e:
+            logger.warning(f"[Usage] Failed to record launch: {e}")
+        if self._lines > len(self._scores) + COMPACT_AFTER:
+            self.compact()
+
+    def score(self, key: str, now: float | None = None) -> float:
+        entry = self._scores.get(_normalize_key(key))
+        if entry is None:
+            return 0.0
+        score, last = entry
+        now = time.time() if now is None else now
+        return score * math.exp(-_DECAY * max(0.0, now - last))
+
+    def bonus(self, key: str) -> float:
+        """Ranking bonus for `key`, growing with the log of its score."""
+        return FRECENCY_BONUS * math.log2(1 + self.score(key))
+
+    def compact(self):
+        """Rewrite the log with one line per key, forgetting keys that decayed away."""
+        now = time.time()
+        self._scores = {
+            key: entry for key, entry in self._scores.items() if self.score(key, now) >= MIN_SCORE
+        }
+        tmp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                for key, (score, last) in self._scores.items():
+                    f.write(f"{last:.0f}\t{score:.4g}\t{key}\n")
+            os.replace(tmp_path, self.path)
+            self._lines = len(self._scores)
+        except OSError as e:
+            logger.warning(f"[Usage] Failed to compact launch history: {e}")
@@ -7,10 +7,11 @@ from typing import Dict, List, Literal
 import gi
 import psutil
 from fabric.utils import exec_shell_command, exec_shell_command_async, get_relative_path
-from gi.repository import Gdk, GLib, Gtk
+from gi.repository import Gdk, GLib
 from loguru import logger
 
 from .colors import Colors
+from .icon_theme_cache import theme_has_icon
 from .icons import distro_text_icons
 
 gi.require_version("Gtk", "3.0")
@@ -25,6 +26,14 @@ class ExecutableNotFoundError(ImportError):
         )
 
 
+def open_file(filepath):
+    """Open a file or directory with its default application."""
+    try:
+        subprocess.Popen(["xdg-open", filepath])
+    except Exception as e:
+        logger.error(f"Error opening file {filepath}: {e}")
+
+
 # Function to escape the markup
 def parse_markup(text):
     return text
@@ -124,7 +133,7 @@ def convert_seconds_to_milliseconds(seconds: int):
 
 # Function to check if an icon exists, otherwise use a fallback icon
 def check_icon_exists(icon_name: str, fallback_icon: str) -> str:
-    if Gtk.IconTheme.get_default().has_icon(icon_name):
+    if theme_has_icon(icon_name):
         return icon_name
     return fallback_icon
 
@@ -0,0 +1,309 @@
+from collections import defaultdict
+from collections.abc import Callable, Sequence
+
+# Scores follow fzf's v1 algorithm, scaled down
+SCORE_MATCH = 16
+SCORE_GAP_START = -3
+SCORE_GAP_EXTENSION = -1
+BONUS_BOUNDARY = 8
+BONUS_CONSECUTIVE = 4
+BONUS_FIRST_CHAR_MULTIPLIER = 2
+# On top of the boundary bonus, for matches that start the haystack
+BONUS_PREFIX = 24
+# The query is the whole first field, e.g. the app's display name
+BONUS_EXACT = 64
+
+# Items scanned between two polls of a search's `cancelled` callback
+CANCEL_CHECK_INTERVAL = 256
+
+# Queries shorter than this match most items, their rankings are kept per
+# matcher and only the best SHORT_QUERY_LIMIT of them are returned
+SHORT_QUERY_LENGTH = 3
+SHORT_QUERY_LIMIT = 100
+
+# Separates the fields of one haystack, never typed into a query
+FIELD_SEPARATOR = "\x00"
+
+DELIMITERS = frozenset(" \t-_./:()[]" + FIELD_SEPARATOR)
+_TO_SEPARATOR = str.maketrans(dict.fromkeys(DELIMITERS, FIELD_SEPARATOR))
+
+
+def _score_positions(haystack: str, positions: Sequence[int]) -> int:
+    score = 0
+    previous = -2
+    chunk_bonus = 0
+    for i, position in enumerate(positions):
+        bonus = BONUS_BOUNDARY if position == 0 or haystack[position - 1] in DELIMITERS else 0
+        if position == previous + 1:
+            # A consecutive run keeps the bonus of the character that started it
+            bonus = max(bonus, chunk_bonus, BONUS_CONSECUTIVE)
+        else:
+            if i:
+                score += SCORE_GAP_START + SCORE_GAP_EXTENSION * (position - previous - 2)
+            chunk_bonus = bonus
+        if i == 0:
+            bonus *= BONUS_FIRST_CHAR_MULTIPLIER
+        score += SCORE_MATCH + bonus
+        previous = position
+    if positions[0] == 0:
+        score += BONUS_PREFIX
+    return score
+
+
+def _contiguous_score(length: int, position: int, boundary: bool) -> int:
+    # What _score_positions gives a run of `length` characters at `position`
+    bonus = BONUS_BOUNDARY if boundary else 0
+    score = length * SCORE_MATCH + bonus * BONUS_FIRST_CHAR_MULTIPLIER
+    score += (length - 1) * max(bonus, BONUS_CONSECUTIVE)
+    if position == 0:
+        score += BONUS_PREFIX
+    return score
+
+
+def _subsequence_score(query: str, haystack: str) -> tuple[int, int] | None:
+    # Forward pass with str.find, which rejects most haystacks in C
+    start = haystack.find(query[0])
+    if start < 0:
+        return None
+    end = start
+    for char in query[1:]:
+        end = haystack.find(char, end + 1)
+        if end < 0:
+            return None
+
+    # Backward pass from the last match to find the tightest window
+    position = end
+    for char in reversed(query[:-1]):
+        position = haystack.rfind(char, start, position)
+    positions = [position]
+    for char in query[1:]:
+        positions.append(haystack.find(char, positions[-1] + 1))
+    return _score_positions(haystack, positions), positions[0]
+
+
+def _words(text: str) -> str:
+    """`text` with every delimiter turned into FIELD_SEPARATOR, which is also prepended."""
+    return FIELD_SEPARATOR + text.translate(_TO_SEPARATOR)
+
+
+def _score(query: str, query_words: str, haystack: str, haystack_words: str) -> tuple[int, int] | None:
+    """(score, start of the match) or None"""
+    # Whole-query runs are found in C: on a word boundary first, then anywhere.
+    # Only haystacks that merely contain the query as a subsequence are walked in Python.
+    position = haystack_words.find(query_words)
+    if position >= 0:
+        return _contiguous_score(len(query), position, True), position
+    position = haystack.find(query)
+    if position >= 0:
+        return _contiguous_score(len(query), position, False), position
+    return _subsequence_score(query, haystack)
+
+
+def fuzzy_score(query: str, haystack: str) -> int | None:
+    """
+    Score of `query` as a subsequence of `haystack`, None if it isn't one.
+    Both are expected to be casefolded already.
+    """
+    if not query:
+        return 0
+    match = _score(query, _words(query), haystack, _words(haystack))
+    return match[0] if match is not None else None
+
+
+class FuzzyMatcher:
+    """
+    Ranks items against a query, best match first.
+
+    Whitespace separates the terms of a query: an item matches when every
+    term does, and scores the sum of the terms' scores. Haystacks are
+    casefolded and indexed by character once, when the matcher is built.
+    Rankings of every query typed since the last reset are kept, so a
+    query that extends an earlier one only looks at what that one matched,
+    a new term is only scored against the matches of the terms before it,
+    and deleting characters goes back to a kept ranking instead of
+    rescanning everything. Rankings of short queries, which match nearly
+    everything and so cost the most, are also kept, and their results are
+    capped. Equal scores rank the earlier match first, and then keep the
+    order the items were given in.
+    """
+
+    def __init__(self, items: Sequence, fields: Callable[[object], Sequence[str | None]]):
+        self.items = list(items)
+        self._haystacks: list[str] = []
+        self._words: list[str] = []
+        # first field -> indices of the items it belongs to, for the exact match bonus
+        self._first_fields: dict[str, list[int]] = {}
+        # character -> indices of the items containing it
+        self._char_items: dict[str, list[int]] = defaultdict(list)
+        for i, item in enumerate(self.items):
+            values = [value.casefold() for value in fields(item) if value]
+            haystack = FIELD_SEPARATOR.join(values)
+            self._haystacks.append(haystack)
+            self._words.append(_words(haystack))
+            self._first_fields.setdefault(values[0] if values else "", []).append(i)
+            for char in set(haystack):
+                self._char_items[char].append(i)
+        # (query, its ranking), each query extending the one before it
+        self._narrowed: list[tuple[str, list[tuple[int, int, int]]]] = []
+        # short query -> its ranking
+        self._short_rankings: dict[str, list[tuple[int, int, int]]] = {}
+
+    def search(
+        self,
+        query: str,
+        boost: Callable[[object], float] | None = None,
+        cancelled: Callable[[], bool] | None = None,
+    ) -> list | None:
+        """
+        Items matching `query`, best first. `boost` adds an extra score per
+        item, e.g. for usage, and also orders the items for an empty query.
+
+        `cancelled` is polled while scanning, once it returns True the search
+        stops and returns None. One matcher must not be searched from two
+        threads at once.
+        """
+        ranked = self.search_scored(query, boost, cancelled)
+        return None if ranked is None else [item for item, _ in ranked]
+
+    def search_scored(
+        self,
+        query: str,
+        boost: Callable[[object], float] | None = None,
+        cancelled: Callable[[], bool] | None = None,
+    ) -> list[tuple[object, float]] | None:
+        """Like `search`, with the score of every item next to it."""
+        terms = query.casefold().split()
+        if not terms:
+            self._narrowed = []
+            if boost is None:
+                return [(item, 0) for item in self.items]
+            boosted = [(item, boost(item)) for item in self.items]
+            boosted.sort(key=lambda pair: -pair[1])
+            return boosted
+
+        query = " ".join(terms)
+        while self._narrowed and not query.startswith(self._narrowed[-1][0]):
+            self._narrowed.pop()
+        short = len(query) < SHORT_QUERY_LENGTH
+        scored = self._short_rankings.get(query) if short else None
+        if scored is None:
+            scored = self._rank_terms(terms, cancelled)
+            if scored is None:
+                return None
+            if short:
+                self._short_rankings[query] = scored
+        if not self._narrowed or self._narrowed[-1][0] != query:
+            self._narrowed.append((query, scored))
+
+        exact = self._first_fields.get(query)
+        if exact:
+            # The query is the whole first field, e.g. the app's display name
+            exact = set(exact)
+            scored = sorted(
+                (negative - BONUS_EXACT if i in exact else negative, start, i)
+                for negative, start, i in scored
+            )
+        if short:
+            scored = scored[:SHORT_QUERY_LIMIT]
+        if boost is not None:
+            items = self.items
+            scored = sorted((negative - boost(items[i]), start, i) for negative, start, i in scored)
+        return [(self.items[i], -negative) for negative, _, i in scored]
+
+    def _previous(self, query: str) -> tuple[str, list[tuple[int, int, int]]] | None:
+        """The longest kept (query, ranking) that `query` extends."""
+        for previous in reversed(self._narrowed):
+            if query.startswith(previous[0]):
+                return previous
+        return None
+
+    def _rarest(self, query: str) -> Sequence[int]:
+        # Every match contains all of the query's characters, the rarest one prunes the most
+        return min((self._char_items.get(char, ()) for char in set(query) - {" "}), key=len)
+
+    def _rank_terms(
+        self, terms: list[str], cancelled: Callable[[], bool] | None
+    ) -> list[tuple[int, int, int]] | None:
+        """(-score, start, index) of every item matching all of `terms`, best first."""
+        query = " ".join(terms)
+        previous = self._previous(query)
+        if previous is not None and previous[0] == query:
+            return previous[1]
+        candidates = self._rarest(query)
+        if previous is not None and len(previous[1]) < len(candidates):
+            candidates = [i for _, _, i in previous[1]]
+        if len(terms) == 1:
+            return self._rank(query, candidates, cancelled)
+
+        base = self._rank_terms(terms[:-1], cancelled)
+        if base is None:
+            return None
+        base_scores = {i: (negative, start) for negative, start, i in base}
+        # The new term is only scored against what the terms before it matched
+        last = self._short_rankings.get(terms[-1])
+        if last is not None:
+            last = [match for match in last if match[2] in base_scores]
+        else:
+            last = self._rank(terms[-1], [i for i in candidates if i in base_scores], cancelled)
+            if last is None:
+                return None
+        scored = []
+        append = scored.append
+        for negative, _, i in last:
+            base_negative, start = base_scores[i]
+            append((base_negative + negative, start, i))
+        scored.sort()
+        return scored
+
+    def _rank(
+        self, query: str, candidates: Sequence[int], cancelled: Callable[[], bool] | None
+    ) -> list[tuple[int, int, int]] | None:
+        """(-score, start, index) of every candidate matching the single term `query`, best first."""
+        # _score inlined, most matches are contiguous and their score only
+        # depends on whether they start a word and whether they start the haystack
+        query_words = _words(query)
+        boundary_score = _contiguous_score(len(query), 1, True)
+        inner_score = _contiguous_score(len(query), 1, False)
+        # Two characters that aren't next to each other, scored like _score_positions would
+        pair = query if len(query) == 2 else None
+        gap_score = 2 * SCORE_MATCH + SCORE_GAP_START - 2 * SCORE_GAP_EXTENSION
+        first_boundary = BONUS_BOUNDARY * BONUS_FIRST_CHAR_MULTIPLIER
+        haystacks, words = self._haystacks, self._words
+        scored = []
+        append = scored.append
+        for chunk in range(0, len(candidates), CANCEL_CHECK_INTERVAL):
+            if cancelled is not None and cancelled():
+                return None
+            for i in candidates[chunk : chunk + CANCEL_CHECK_INTERVAL]:
+                start = words[i].find(query_words)
+                if start >= 0:
+                    score = boundary_score if start else boundary_score + BONUS_PREFIX
+                else:
+                    haystack = haystacks[i]
+                    start = haystack.find(query)
+                    if start >= 0:
+                        score = inner_score if start else inner_score + BONUS_PREFIX
+                    elif pair is not None:
+                        start = haystack.find(pair[0])
+                        if start < 0:
+                            continue
+                        end = haystack.find(pair[1], start + 1)
+                        if end < 0:
+                            continue
+                        start = haystack.rfind(pair[0], start, end)
+                        score = gap_score + SCORE_GAP_EXTENSION * (end - start)
+                        if not start:
+                            score += first_boundary + BONUS_PREFIX
+                        elif haystack[start - 1] in DELIMITERS:
+                            score += first_boundary
+                        if haystack[end - 1] in DELIMITERS:
+                            score += BONUS_BOUNDARY
+                    else:
+                        match = _subsequence_score(query, haystack)
+                        if match is None:
+                            continue
+                        score, start = match
+                # Equal scores go to the earlier match, which is usually in the name
+                append((-score, start, i))
+        scored.sort()
+        return scored
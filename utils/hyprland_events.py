@@ -0,0 +1,132 @@
+from typing import Callable, Iterable
+
+from fabric.core.service import Service
+from fabric.hyprland.widgets import get_hyprland_connection
+from gi.repository import GLib
+from loguru import logger
+
+
+class HyprlandEventDispatcher(Service):
+    """
+    Coalesces bursts of Hyprland events into one callback per subscriber.
+
+    Events are gathered until the main loop goes idle, deduplicated by
+    name, and every subscriber interested in at least one of them runs
+    once with the set of dirty keys.
+
+    A barrier can hold delivery back until some asynchronous work for the
+    burst is done, events arriving meanwhile go into the next burst.
+    """
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if HyprlandEventDispatcher.instance is None:
+            HyprlandEventDispatcher.instance = HyprlandEventDispatcher()
+
+        return HyprlandEventDispatcher.instance
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.conn = get_hyprland_connection()
+        # (priority, order, keys, callback), lower priority values run first
+        self._subscribers: list[tuple[int, int, frozenset, Callable]] = []
+        self._connected: set[str] = set()
+        self._dirty: set[str] = set()
+        self._flush_id = 0
+        self._barrier: tuple[frozenset, Callable] | None = None
+        self._waiting = False
+
+        self.events_received = 0
+        self.handler_runs = 0
+        self.flushes = 0
+
+    def subscribe(
+        self,
+        keys: Iterable[str],
+        callback: Callable[[frozenset], None],
+        priority: int = GLib.PRIORITY_DEFAULT,
+    ):
+        """Call `callback(dirty_keys)` once per burst that touches any of `keys`."""
+        keys = frozenset(keys)
+        self._subscribers.append((priority, len(self._subscribers), keys, callback))
+        self._subscribers.sort(key=lambda sub: sub[:2])
+        self._watch(keys)
+
+    def set_barrier(
+        self,
+        keys: Iterable[str],
+        barrier: Callable[[frozenset, Callable[[], None]], None],
+    ):
+        """
+        Run `barrier(dirty_keys, done)` before delivering a burst touching `keys`.
+        Subscribers are only called once the barrier calls `done()`.
+        """
+        keys = frozenset(keys)
+        self._barrier = (keys, barrier)
+        self._watch(keys)
+
+    def _watch(self, keys: frozenset):
+        for key in keys - self._connected:
+            self._connected.add(key)
+            self.conn.connect(f"event::{key}", self.on_event)
+
+    def unsubscribe(self, callback: Callable):
+        self._subscribers = [sub for sub in self._subscribers if sub[3] != callback]
+
+    def on_event(self, _, event):
+        self.events_received += 1
+        self.mark(event.name)
+
+    def mark(self, *keys: str):
+        """Mark keys dirty and schedule a single flush for the current burst."""
+        self._dirty.update(keys)
+        if not self._flush_id and not self._waiting:
+            self._flush_id = GLib.idle_add(self._flush)
+
+    def _flush(self):
+        self._flush_id = 0
+        dirty, self._dirty = frozenset(self._dirty), set()
+        if self._barrier is None or not dirty & self._barrier[0]:
+            self._deliver(dirty)
+            return False
+        keys, barrier = self._barrier
+
+        self._waiting = True
+        finished = False
+
+        def done():
+            nonlocal finished
+            if not finished:
+                finished = True
+                self._deliver(dirty)
+
+        try:
+            barrier(dirty & keys, done)
+        except Exception as e:
+            logger.exception(f"[Events] Barrier {barrier} failed: {e}")
+            done()
+        return False
+
+    def _deliver(self, dirty: frozenset):
+        self._waiting = False
+        self.flushes += 1
+        for _, _, keys, callback in list(self._subscribers):
+            hit = dirty & keys
+            if not hit:
+                continue
+            self.handler_runs += 1
+            try:
+                callback(hit)
+            except Exception as e:
+                logger.exception(f"[Events] Subscriber {callback} failed: {e}")
+        if self._dirty and not self._flush_id:
+            self._flush_id = GLib.idle_add(self._flush)
+
+    def stats(self) -> dict:
+        return {
+            "events_received": self.events_received,
+            "flushes": self.flushes,
+            "handler_runs": self.handler_runs,
+        }
@@ -0,0 +1,185 @@
+import json
+import os
+import time
+from typing import Callable, List
+
+from gi.repository import Gio, GLib
+from loguru import logger
+
+from utils.ipc_stats import IPCStats, find_caller
+
+# Hyprland separates the replies of a [[BATCH]] request with this
+BATCH_DELIMITER = b"\n\n\n"
+
+DEFAULT_TIMEOUT_MS = 1000
+READ_CHUNK = 65536
+
+
+def get_commands_socket_path() -> str:
+    signature = os.getenv("HYPRLAND_INSTANCE_SIGNATURE", "")
+    path = f"{GLib.get_user_runtime_dir()}/hypr/{signature}/.socket.sock"
+    # Hyprland before 0.40 kept its sockets in /tmp
+    if not os.path.exists(path) and os.path.exists(f"/tmp/hypr/{signature}/.socket.sock"):
+        return f"/tmp/hypr/{signature}/.socket.sock"
+    return path
+
+
+def parse_batch_reply(reply: bytes, count: int) -> List:
+    """Split a [[BATCH]] reply and parse each part, None for unparsable ones."""
+    parts = reply.split(BATCH_DELIMITER)
+    results = []
+    for i in range(count):
+        try:
+            results.append(json.loads(parts[i].decode()))
+        except (IndexError, UnicodeDecodeError, json.JSONDecodeError):
+            results.append(None)
+    return results
+
+
+class _Request:
+    """One request/reply exchange on its own connection."""
+
+    def __init__(self, path: str, command: str, callback, timeout_ms: int):
+        self.command = command
+        self.callback = callback
+        self.cancellable = Gio.Cancellable()
+        self.connection = None
+        self.chunks: list[bytes] = []
+        self.done = False
+        self.caller = find_caller()
+        self.started = time.monotonic()
+        self.timeout_id = GLib.timeout_add(timeout_ms, self._on_timeout)
+
+        Gio.SocketClient().connect_async(
+            Gio.UnixSocketAddress.new(path),
+            self.cancellable,
+            self._on_connected,
+            None,
+        )
+
+    def _on_timeout(self):
+        self.timeout_id = 0
+        self._finish(None, TimeoutError(f"Hyprland did not answer '{self.command}' in time"))
+        return False
+
+    def _on_connected(self, client, result, _):
+        try:
+            self.connection = client.connect_finish(result)
+        except GLib.Error as e:
+            return self._finish(None, e)
+        self.connection.get_output_stream().write_all_async(
+            self.command.encode(),
+            GLib.PRIORITY_DEFAULT,
+            self.cancellable,
+            self._on_written,
+            None,
+        )
+
+    def _on_written(self, stream, result, _):
+        try:
+            stream.write_all_finish(result)
+        except GLib.Error as e:
+            return self._finish(None, e)
+        self._read_next()
+
+    def _read_next(self):
+        self.connection.get_input_stream().read_bytes_async(
+            READ_CHUNK,
+            GLib.PRIORITY_DEFAULT,
+            self.cancellable,
+            self._on_read,
+            None,
+        )
+
+    def _on_read(self, stream, result, _):
+        try:
+            data = stream.read_bytes_finish(result).get_data()
+        except GLib.Error as e:
+            return self._finish(None, e)
+        if not data:
+            # Hyprland closes the connection once the reply is complete
+            return self._finish(b"".join(self.chunks), None)
+        self.chunks.append(data)
+        self._read_next()
+
+    def cancel(self):
+        self._finish(None, GLib.Error("Request cancelled"))
+
+    def _finish(self, reply, error):
+        if self.done:
+            return
+        self.done = True
+        if self.timeout_id:
+            GLib.source_remove(self.timeout_id)
+            self.timeout_id = 0
+        self.cancellable.cancel()
+        if self.connection is not None:
+            self.connection.close_async(GLib.PRIORITY_DEFAULT, None, None, None)
+        IPCStats.get_initial().record(
+            self.command, self.caller, self.started, len(reply or b""), error is not None
+        )
+        if error is not None:
+            logger.warning(f"[IPC] '{self.command}' failed: {error}")
+        if self.callback is not None:
+            self.callback(reply, error)
+
+
+class HyprlandIPC:
+    """
+    Non-blocking client for the Hyprland request socket.
+
+    Every call returns immediately; the reply is delivered to the callback
+    from the GLib main loop. Requests time out and can be cancelled through
+    the handle they return.
+    """
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if HyprlandIPC.instance is None:
+            HyprlandIPC.instance = HyprlandIPC()
+
+        return HyprlandIPC.instance
+
+    def __init__(self, socket_path: str | None = None, timeout_ms: int = DEFAULT_TIMEOUT_MS):
+        self.socket_path = socket_path or get_commands_socket_path()
+        self.timeout_ms = timeout_ms
+
+    def request(
+        self,
+        command: str,
+        callback: Callable[[bytes | None, Exception | None], None] | None = None,
+        timeout_ms: int | None = None,
+    ) -> _Request:
+        """Send a raw request, `callback(reply, error)` gets the raw reply bytes."""
+        return _Request(self.socket_path, command, callback, timeout_ms or self.timeout_ms)
+
+    def query(self, command: str, callback: Callable, timeout_ms: int | None = None) -> _Request:
+        """Run a `j/` query, `callback(result, error)` gets the parsed JSON."""
+
+        def on_reply(reply, error):
+            if error is not None:
+                return callback(None, error)
+            # Parsed first, so errors raised by the callback itself aren't taken for bad replies
+            try:
+                result = json.loads(reply.decode())
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                return callback(None, e)
+            callback(result, None)
+
+        return self.request(command, on_reply, timeout_ms)
+
+    def batch(self, commands: List[str], callback: Callable, timeout_ms: int | None = None) -> _Request:
+        """Run several `j/` queries in one round trip, results keep the order of `commands`."""
+        return self.request(
+            "[[BATCH]]" + ";".join(commands),
+            lambda reply, error: callback(
+                parse_batch_reply(reply, len(commands)) if error is None else None, error
+            ),
+            timeout_ms,
+        )
+
+    def dispatch(self, arguments: str, callback: Callable | None = None) -> _Request:
+        """Run `hyprctl dispatch <arguments>` without blocking."""
+        return self.request(f"dispatch {arguments}", callback)
@@ -1,5 +1,4 @@
-import json
-from typing import Dict
+from typing import Dict, List, NamedTuple
 
 import gi
 
@@ -7,6 +6,9 @@ import warnings
 
 from fabric.hyprland import Hyprland
 
+from utils.hyprland_events import HyprlandEventDispatcher
+from utils.hyprland_ipc import parse_batch_reply
+
 gi.require_version("Gdk", "3.0")
 from gi.repository import Gdk
 
@@ -29,29 +31,114 @@ warnings.filterwarnings("ignore", category=DeprecationWarning)
 #       which both can be used to uniquely identify a monitor
 
 
+class MonitorInfo(NamedTuple):
+    id: int
+    name: str
+    gdk_index: int | None
+    x: int
+    y: int
+    width: int
+    height: int
+    scale: float
+    transform: int
+
+
 class HyprlandWithMonitors(Hyprland):
     def __init__(self, commands_only: bool = False, **kwargs):
         self.display: Gdk.Display = Gdk.Display.get_default()
         super().__init__(commands_only, **kwargs)
+        # Monitor topology, rebuilt lazily after a hotplug
+        self._by_id: Dict[int, MonitorInfo] | None = None
+        self._by_name: Dict[str, MonitorInfo] = {}
+        self._by_gdk: Dict[int, MonitorInfo] = {}
+
+        if self.display is not None:
+            self.display.connect("monitor-added", self.invalidate_topology)
+            self.display.connect("monitor-removed", self.invalidate_topology)
+            self.display.get_default_screen().connect(
+                "monitors-changed", self.invalidate_topology
+            )
+        # Runs after the shared state has refreshed its monitors slice
+        HyprlandEventDispatcher.get_initial().subscribe(
+            ("monitoradded", "monitorremoved", "configreloaded"), self.invalidate_topology
+        )
+
+    def invalidate_topology(self, *_):
+        self._by_id = None
+
+    def _ensure_topology(self):
+        if self._by_id is not None:
+            return
+        # Imported here, the shared state sends its requests through this class
+        from utils.hyprland_state import HyprlandState
+
+        screen = self.display.get_default_screen() if self.display else None
+        gdk_indices = {}
+        if screen is not None:
+            for i in range(self.display.get_n_monitors()):
+                gdk_indices[screen.get_monitor_plug_name(i)] = i
+
+        self._by_id = {}
+        for monitor in HyprlandState.get_initial().monitors:
+            self._by_id[monitor.id] = MonitorInfo(
+                id=monitor.id,
+                name=monitor.name,
+                gdk_index=gdk_indices.get(monitor.name),
+                x=monitor.x,
+                y=monitor.y,
+                width=monitor.width,
+                height=monitor.height,
+                scale=monitor.scale,
+                transform=monitor.transform,
+            )
+        self._by_name = {info.name: info for info in self._by_id.values()}
+        self._by_gdk = {
+            info.gdk_index: info
+            for info in self._by_id.values()
+            if info.gdk_index is not None
+        }
+
+    def get_monitor_info(self, hyprland_id: int) -> MonitorInfo | None:
+        self._ensure_topology()
+        return self._by_id.get(hyprland_id)
+
+    def get_monitor_info_by_name(self, plug_name: str) -> MonitorInfo | None:
+        self._ensure_topology()
+        return self._by_name.get(plug_name)
+
+    def get_monitor_info_by_gdk_id(self, gdk_id: int) -> MonitorInfo | None:
+        self._ensure_topology()
+        return self._by_gdk.get(gdk_id)
+
+    def send_batch(self, commands: List[str]) -> List:
+        """
+        Run several `j/` queries over a single socket connection.
+
+        Returns the parsed replies in the same order as `commands`,
+        with None for any reply that could not be parsed.
+        """
+        if not commands:
+            return []
+        reply = self.send_command("[[BATCH]]" + ";".join(commands)).reply
+        return parse_batch_reply(reply, len(commands))
 
     # Add new arguments
     def get_all_monitors(self) -> Dict:
-        monitors = json.loads(self.send_command("j/monitors").reply)
-        return {monitor["id"]: monitor["name"] for monitor in monitors}
-
+        self._ensure_topology()
+        return {info.id: info.name for info in self._by_id.values()}
 
     def get_gdk_monitor_id_from_name(self, plug_name: str) -> int | None:
-        for i in range(self.display.get_n_monitors()):
-            if self.display.get_default_screen().get_monitor_plug_name(i) == plug_name:
-                return i
-        return None
+        info = self.get_monitor_info_by_name(plug_name)
+        return info.gdk_index if info else None
 
     def get_gdk_monitor_id(self, hyprland_id: int) -> int | None:
-        monitors = self.get_all_monitors()
-        if hyprland_id in monitors:
-            return self.get_gdk_monitor_id_from_name(monitors[hyprland_id])
-        return None
+        info = self.get_monitor_info(hyprland_id)
+        return info.gdk_index if info else None
 
     def get_current_gdk_monitor_id(self) -> int | None:
-        active_workspace = json.loads(self.send_command("j/activeworkspace").reply)
-        return self.get_gdk_monitor_id_from_name(active_workspace["monitor"])
+        from utils.hyprland_state import HyprlandState
+
+        active_workspace = HyprlandState.get_initial().active_workspace
+        if active_workspace is None:
+            return None
+        return self.get_gdk_monitor_id_from_name(active_workspace.monitor)
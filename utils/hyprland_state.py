@@ -0,0 +1,428 @@
+from typing import NamedTuple
+
+from fabric.core.service import Service, Signal
+from fabric.hyprland.widgets import get_hyprland_connection
+from gi.repository import GLib
+from loguru import logger
+
+from utils.hyprland_events import HyprlandEventDispatcher
+from utils.hyprland_ipc import HyprlandIPC
+from utils.hyprland_monitor import HyprlandWithMonitors
+from utils.ipc_stats import attribute_to, find_caller
+
+
+class Client(NamedTuple):
+    address: str
+    mapped: bool
+    hidden: bool
+    at: tuple[int, int]
+    size: tuple[int, int]
+    workspace_id: int
+    workspace_name: str
+    floating: bool
+    fullscreen: bool
+    monitor: int
+    class_name: str
+    title: str
+    initial_class: str
+    initial_title: str
+    pid: int
+
+    @staticmethod
+    def from_json(client: dict) -> "Client":
+        workspace = client.get("workspace", {})
+        return Client(
+            address=client.get("address", ""),
+            mapped=client.get("mapped", False),
+            hidden=client.get("hidden", False),
+            at=tuple(client.get("at", (0, 0))),
+            size=tuple(client.get("size", (0, 0))),
+            workspace_id=workspace.get("id", -1),
+            workspace_name=workspace.get("name", ""),
+            floating=client.get("floating", False),
+            # Older Hyprland versions report a bool, newer ones a mode int
+            fullscreen=bool(client.get("fullscreen", False)),
+            monitor=client.get("monitor", -1),
+            class_name=client.get("class", ""),
+            title=client.get("title", ""),
+            initial_class=client.get("initialClass", ""),
+            initial_title=client.get("initialTitle", ""),
+            pid=client.get("pid", -1),
+        )
+
+
+class Monitor(NamedTuple):
+    id: int
+    name: str
+    description: str
+    x: int
+    y: int
+    width: int
+    height: int
+    scale: float
+    transform: int
+    focused: bool
+    active_workspace_id: int
+
+    @staticmethod
+    def from_json(monitor: dict) -> "Monitor":
+        return Monitor(
+            id=monitor.get("id", -1),
+            name=monitor.get("name", ""),
+            description=monitor.get("description", ""),
+            x=monitor.get("x", 0),
+            y=monitor.get("y", 0),
+            width=monitor.get("width", 1920),
+            height=monitor.get("height", 1080),
+            scale=monitor.get("scale", 1.0),
+            transform=monitor.get("transform", 0),
+            focused=monitor.get("focused", False),
+            active_workspace_id=monitor.get("activeWorkspace", {}).get("id", -1),
+        )
+
+
+class Workspace(NamedTuple):
+    id: int
+    name: str
+    monitor: str
+    monitor_id: int
+    windows: int
+    has_fullscreen: bool
+
+    @staticmethod
+    def from_json(workspace: dict) -> "Workspace":
+        return Workspace(
+            id=workspace.get("id", -1),
+            name=workspace.get("name", ""),
+            monitor=workspace.get("monitor", ""),
+            monitor_id=workspace.get("monitorID", -1),
+            windows=workspace.get("windows", 0),
+            has_fullscreen=workspace.get("hasfullscreen", False),
+        )
+
+
+# Pause before slices whose refresh failed are fetched again
+RETRY_DELAY_MS = 1000
+
+# Hyprland request backing each slice of the store
+SLICE_COMMANDS = {
+    "clients": "j/clients",
+    "monitors": "j/monitors",
+    "workspaces": "j/workspaces",
+    "activewindow": "j/activewindow",
+    "activeworkspace": "j/activeworkspace",
+}
+
+# Slices that an event can invalidate
+EVENT_SLICES = {
+    "openwindow": ("clients", "workspaces"),
+    "closewindow": ("clients", "workspaces"),
+    "movewindow": ("clients", "workspaces"),
+    "changefloatingmode": ("clients",),
+    "windowtitle": ("clients",),
+    "fullscreen": ("clients", "workspaces"),
+    "activewindow": ("activewindow",),
+    # Hyprland has no event while a floating window is dragged around, but
+    # the window gets focused, so focus changes also refresh client geometry
+    "activewindowv2": ("activewindow", "clients"),
+    "workspace": ("activeworkspace", "monitors"),
+    "focusedmon": ("activeworkspace", "monitors", "clients"),
+    "createworkspace": ("workspaces",),
+    "destroyworkspace": ("workspaces",),
+    "moveworkspace": ("workspaces", "monitors"),
+    "renameworkspace": ("workspaces",),
+    "monitoradded": ("monitors", "workspaces"),
+    "monitorremoved": ("monitors", "workspaces"),
+    "configreloaded": ("monitors", "workspaces", "clients"),
+}
+
+
+def _caller_names(caller: str | tuple[str, ...]) -> tuple[str, ...]:
+    return (caller,) if isinstance(caller, str) else caller
+
+
+class HyprlandState(Service):
+    """
+    Shared snapshot of the compositor state, invalidated by Hyprland events.
+
+    Only the slices touched by an event are fetched again, and each slice
+    announces real changes through its own signal. Refreshes go out without
+    blocking the main loop, and the store holds the event dispatcher back
+    until they land, so dispatcher subscribers always read a snapshot that
+    already reflects the burst they handle.
+    """
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if HyprlandState.instance is None:
+            HyprlandState.instance = HyprlandState()
+
+        return HyprlandState.instance
+
+    @Signal
+    def clients_changed(self) -> None: ...
+
+    @Signal
+    def monitors_changed(self) -> None: ...
+
+    @Signal
+    def workspaces_changed(self) -> None: ...
+
+    @Signal
+    def active_window_changed(self) -> None: ...
+
+    @Signal
+    def active_workspace_changed(self) -> None: ...
+
+    _SLICE_SIGNALS = {
+        "clients": "clients-changed",
+        "monitors": "monitors-changed",
+        "workspaces": "workspaces-changed",
+        "activewindow": "active-window-changed",
+        "activeworkspace": "active-workspace-changed",
+    }
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.conn = get_hyprland_connection()
+        # Requests go out batched, events come from the shared connection
+        self.ipc = HyprlandWithMonitors(commands_only=True)
+        self.async_ipc = HyprlandIPC.get_initial()
+        self._snapshot: dict[str, object] = {
+            "clients": (),
+            "monitors": (),
+            "workspaces": (),
+            "activewindow": None,
+            "activeworkspace": None,
+        }
+        self._dirty: set[str] = set()
+        # Who made each stale slice stale, the refresh is counted against them
+        self._invalidated_by: dict[str, set[str]] = {}
+        self._pending_emit: set[str] = set()
+        self._loaded: set[str] = set()
+        # Generation of the request each slice's data came from, older replies are dropped
+        self._stored_at: dict[str, int] = {}
+        self._flush_id = 0
+        self._retry_id = 0
+        self._request = None
+        # Number of refresh requests sent so far (blocking ones included), each one's generation
+        self._issued = 0
+        # (generation that must land first, callback)
+        self._waiters: list[tuple[int, object]] = []
+
+        self.events = HyprlandEventDispatcher.get_initial()
+        self.events.set_barrier(EVENT_SLICES, self.on_events)
+        self.conn.connect(
+            "event::ready", lambda *_: self.invalidate(*SLICE_COMMANDS, caller="event:ready")
+        )
+        self.invalidate(*SLICE_COMMANDS)
+
+    def on_events(self, events: frozenset, done):
+        for event in events:
+            self._mark(EVENT_SLICES[event], f"event:{event}")
+        self.flush(done)
+
+    def invalidate(self, *slices: str, caller: str | None = None):
+        """
+        Mark slices stale and schedule one refresh for the whole burst.
+
+        The refresh shows up in the IPC statistics under `caller`,
+        the function calling this by default.
+        """
+        self._mark(slices, caller or find_caller())
+        if self._dirty and not self._flush_id:
+            self._flush_id = GLib.idle_add(self._idle_flush)
+
+    def _mark(self, slices, caller: str | tuple[str, ...]):
+        for name in slices:
+            self._dirty.add(name)
+            self._invalidated_by.setdefault(name, set()).update(_caller_names(caller))
+
+    def _take_callers(self, slices) -> set[str]:
+        callers = set()
+        for name in slices:
+            callers.update(self._invalidated_by.pop(name, ()))
+        return callers
+
+    def _idle_flush(self):
+        self._flush_id = 0
+        self.flush()
+        return False
+
+    def flush(self, callback=None):
+        """
+        Refresh every stale slice without blocking, emit signals for the ones
+        that changed and then call `callback()`.
+
+        The callback only runs once a request sent after this call has
+        landed, so it never sees a snapshot taken before the slices it
+        waits for were invalidated.
+        """
+        if self._flush_id:
+            GLib.source_remove(self._flush_id)
+            self._flush_id = 0
+        if self._request is not None:
+            if callback is not None:
+                # The request in flight went out before this burst, wait for the next one
+                self._waiters.append((self._issued + 1, callback))
+            return
+
+        slices = [name for name in SLICE_COMMANDS if name in self._dirty]
+        if not slices:
+            # Nothing stale and nothing in flight, every waiter can go
+            if callback is not None:
+                self._waiters.append((self._issued, callback))
+            self._finish_flush()
+            return
+        if self._retry_id:
+            GLib.source_remove(self._retry_id)
+            self._retry_id = 0
+        # Events landing while the request is in flight mark them stale again
+        self._dirty.difference_update(slices)
+        callers = self._take_callers(slices)
+        self._issued += 1
+        generation = self._issued
+        if callback is not None:
+            self._waiters.append((generation, callback))
+        with attribute_to(callers):
+            self._request = self.async_ipc.batch(
+                [SLICE_COMMANDS[name] for name in slices],
+                lambda payloads, error: self._on_refreshed(
+                    generation, slices, callers, payloads, error
+                ),
+            )
+
+    def _on_refreshed(self, generation: int, slices: list[str], callers: set[str], payloads, error):
+        self._request = None
+        if error is None:
+            self._store_all(generation, slices, callers, payloads)
+        else:
+            logger.warning(f"[HyprlandState] Failed to refresh {', '.join(slices)}: {error}")
+            # Fetched again after a pause, instead of waiting for an unrelated event,
+            # unless a blocking refresh got them in the meantime
+            self._mark(
+                [name for name in slices if self._stored_at.get(name, 0) < generation],
+                tuple(callers),
+            )
+            self._schedule_retry()
+        self._finish_flush(generation)
+        if self._waiters:
+            # Barriers that arrived while the request was in flight
+            self.flush()
+        elif error is None and self._dirty:
+            # Slices invalidated while the request was in flight
+            self.invalidate()
+
+    def _schedule_retry(self):
+        if not self._retry_id:
+            self._retry_id = GLib.timeout_add(RETRY_DELAY_MS, self._retry)
+
+    def _retry(self):
+        self._retry_id = 0
+        self.flush()
+        return False
+
+    def _emit_pending(self):
+        pending, self._pending_emit = self._pending_emit, set()
+        for name in SLICE_COMMANDS:
+            if name in pending:
+                self.emit(self._SLICE_SIGNALS[name])
+
+    def _finish_flush(self, generation: int | None = None):
+        """Emit pending signals, then release the waiters `generation` satisfies, or all of them."""
+        self._emit_pending()
+        if generation is None:
+            ready, self._waiters = [callback for _, callback in self._waiters], []
+        else:
+            ready = [callback for needed, callback in self._waiters if needed <= generation]
+            self._waiters = [(needed, callback) for needed, callback in self._waiters if needed > generation]
+        for callback in ready:
+            callback()
+
+    def _parse(self, name: str, payload):
+        if name == "clients":
+            return tuple(Client.from_json(c) for c in payload)
+        if name == "monitors":
+            return tuple(Monitor.from_json(m) for m in payload)
+        if name == "workspaces":
+            return tuple(Workspace.from_json(w) for w in payload)
+        if name == "activewindow":
+            return Client.from_json(payload) if payload else None
+        if name == "activeworkspace":
+            return Workspace.from_json(payload) if payload else None
+
+    def refresh(self, *slices: str):
+        """
+        Fetch the given slices now, in a single blocking round trip, and
+        emit signals for the ones that changed.
+
+        A refresh still in flight that was sent earlier can't overwrite
+        what this one stores.
+        """
+        slices = [name for name in SLICE_COMMANDS if name in slices]
+        self._dirty.difference_update(slices)
+        self._issued += 1
+        generation = self._issued
+        # Counted against the reader as well as whoever made the slices stale
+        callers = self._take_callers(slices)
+        callers.update(_caller_names(find_caller()))
+        try:
+            with attribute_to(callers):
+                payloads = self.ipc.send_batch([SLICE_COMMANDS[name] for name in slices])
+        except Exception as e:
+            logger.warning(f"[HyprlandState] Failed to refresh {', '.join(slices)}: {e}")
+            self._mark(slices, tuple(callers))
+            self._schedule_retry()
+            return
+        self._store_all(generation, slices, callers, payloads)
+        self._emit_pending()
+
+    def _store_all(self, generation: int, slices: list[str], callers: set[str], payloads):
+        for name, payload in zip(slices, payloads):
+            if self._stored_at.get(name, 0) > generation:
+                # A later request already stored newer data
+                continue
+            if payload is None:
+                logger.warning(f"[HyprlandState] Malformed reply for {name}")
+                self._mark((name,), tuple(callers))
+                self._schedule_retry()
+                continue
+            self._stored_at[name] = generation
+            self._store(name, payload)
+
+    def _store(self, name: str, payload):
+        self._loaded.add(name)
+        value = self._parse(name, payload)
+        if value != self._snapshot[name]:
+            self._snapshot[name] = value
+            self._pending_emit.add(name)
+
+    def _get(self, name: str):
+        # Only the very first read has to wait for Hyprland, later reads get
+        # the last snapshot while a refresh is on its way. Anything stale is
+        # likely read next, so fetch it in the same batch.
+        if name not in self._loaded:
+            self.refresh(name, *self._dirty)
+        return self._snapshot[name]
+
+    @property
+    def clients(self) -> tuple[Client, ...]:
+        return self._get("clients")
+
+    @property
+    def monitors(self) -> tuple[Monitor, ...]:
+        return self._get("monitors")
+
+    @property
+    def workspaces(self) -> tuple[Workspace, ...]:
+        return self._get("workspaces")
+
+    @property
+    def active_window(self) -> Client | None:
+        return self._get("activewindow")
+
+    @property
+    def active_workspace(self) -> Workspace | None:
+        return self._get("activeworkspace")
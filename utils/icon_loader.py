@@ -0,0 +1,211 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+gi.require_version("GdkPixbuf", "2.0")
+from fabric.hyprland.widgets import get_hyprland_connection
+from gi.repository import GdkPixbuf, GLib, Gtk
+from loguru import logger
+
+from utils.app_resolver import AppResolver
+from utils.desktop_apps import app_id
+from utils.icon_resolver import IconResolver
+from utils.pixbuf_cache import PixbufCache
+
+PLACEHOLDER_ICON = "application-x-executable-symbolic"
+
+# A failed load shows the placeholder for this long before it is tried again
+FAILURE_RETRY_S = 30
+
+
+def _base_ids(identifier: str) -> list[str]:
+    """Shorter ids to retry a window class by, e.g. "firefox-esr" -> "firefox"."""
+    candidates = []
+    if "-" in identifier:
+        candidates.append(identifier.split("-")[0])
+    if "." in identifier:
+        candidates.append(identifier.rsplit(".", 1)[-1])
+    return [c for i, c in enumerate(candidates) if c and c != identifier and c not in candidates[:i]]
+
+
+def _decode(path: str, size: int):
+    # GdkPixbuf loaders are thread safe, unlike Gtk.IconTheme
+    return GdkPixbuf.Pixbuf.new_from_file_at_scale(path, size, size, True)
+
+
+class IconLoader:
+    """
+    Resolves and decodes window icons off the main thread.
+
+    Only in-memory lookups (app index, icon theme) run on the main loop.
+    Desktop file scans and image decoding run on a worker and the result
+    is handed back through GLib.idle_add. Callers get a placeholder until
+    the icon is ready. Classes of newly opened windows are loaded as soon
+    as `openwindow` arrives, for every size a consumer asked to prefetch.
+    """
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if IconLoader.instance is None:
+            IconLoader.instance = IconLoader()
+
+        return IconLoader.instance
+
+    def __init__(self):
+        self.cache = PixbufCache.get_initial()
+        self.icons = IconResolver.get_initial()
+        self.resolver = AppResolver.get_initial()
+        self.theme = Gtk.IconTheme.get_default()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="icons")
+        # cache key -> callbacks waiting for it
+        self._pending: dict[tuple, list[Callable]] = {}
+        # cache key -> when a failed load may be retried, failures are never cached as icons
+        self._failed: dict[tuple, float] = {}
+        self.prefetch_sizes: set[int] = set()
+
+        get_hyprland_connection().connect("event::openwindow", self._on_openwindow)
+
+    def _on_openwindow(self, _, event):
+        # openwindow>>ADDRESS,WORKSPACE,CLASS,TITLE
+        if len(event.data) < 3 or not event.data[2]:
+            return
+        window_class = event.data[2]
+        desktop_app = self.resolver.find(window_class, fuzzy=True)
+        for size in self.prefetch_sizes:
+            self.load(window_class, size, desktop_app=desktop_app)
+
+    def placeholder(self, size: int):
+        return self.cache.icon(PLACEHOLDER_ICON, size) or self.cache.icon("image-missing", size)
+
+    def load(self, identifier: str, size: int, callback: Callable | None = None, desktop_app=None):
+        """
+        Icon of `desktop_app`, or of whatever `identifier` resolves to.
+
+        Returns the pixbuf right away when it is ready. Otherwise returns
+        None and calls `callback(pixbuf)` from the main loop once loaded.
+        """
+        if desktop_app is not None:
+            key = ("window", app_id(desktop_app), size)
+        else:
+            key = ("window", None, str(identifier or "").lower(), size)
+
+        pixbuf = self.cache.get(key)
+        if pixbuf is not None:
+            return pixbuf
+        retry_at = self._failed.get(key)
+        if retry_at is not None:
+            if time.monotonic() < retry_at:
+                return self.placeholder(size)
+            del self._failed[key]
+
+        waiters = self._pending.get(key)
+        if waiters is not None:
+            if callback is not None:
+                waiters.append(callback)
+            return None
+        self._pending[key] = [callback] if callback is not None else []
+
+        def done(pixbuf):
+            self._finish(key, size, pixbuf)
+
+        if desktop_app is None:
+            self._resolve_name(identifier, size, done)
+            return None
+
+        gicon = getattr(desktop_app, "icon", None)
+        icon_info = (
+            self.theme.lookup_by_gicon(gicon, size, Gtk.IconLookupFlags.FORCE_SIZE)
+            if gicon is not None
+            else None
+        )
+        if icon_info is None:
+            self._resolve_name(identifier, size, done)
+        else:
+            self._decode_info(
+                icon_info,
+                size,
+                lambda pixbuf: done(pixbuf) if pixbuf else self._resolve_name(identifier, size, done),
+            )
+        return None
+
+    def _resolve_name(self, identifier, size: int, then: Callable, fallbacks: list[str] | None = None):
+        if not identifier:
+            return then(None)
+        identifier = str(identifier)
+        if fallbacks is None:
+            # Flatpak-style classes often only have an icon under a shorter id
+            fallbacks = _base_ids(identifier)
+
+        def miss():
+            if fallbacks:
+                return self._resolve_name(fallbacks[0], size, then, fallbacks[1:])
+            then(None)
+
+        def loaded(pixbuf):
+            if pixbuf is None:
+                return miss()
+            then(pixbuf)
+
+        name = self.icons.known_icon_name(identifier)
+        if name is not None:
+            return self._load_name(name, size, loaded)
+
+        def found(name):
+            if not name or name == self.icons.default_applicaiton_icon:
+                # A miss, tried again later since the desktop file may still show up
+                return miss()
+            self.icons.store_icon(identifier, name)
+            self._load_name(name, size, loaded)
+
+        self._run(lambda: self.icons.find_desktop_icon(identifier), found)
+
+    def _load_name(self, name: str, size: int, then: Callable):
+        if os.path.isabs(name):
+            return self._run(lambda: _decode(name, size), then)
+        icon_info = self.theme.lookup_icon(name, size, Gtk.IconLookupFlags.FORCE_SIZE)
+        if icon_info is None:
+            return then(None)
+        self._decode_info(icon_info, size, then)
+
+    def _decode_info(self, icon_info, size: int, then: Callable):
+        filename = icon_info.get_filename()
+        if filename:
+            return self._run(lambda: _decode(filename, size), then)
+        # Icons built into GTK have no file, they are cheap to load
+        try:
+            pixbuf = icon_info.load_icon()
+        except GLib.Error:
+            pixbuf = None
+        then(pixbuf)
+
+    def _run(self, work: Callable, then: Callable):
+        future = self._executor.submit(work)
+        future.add_done_callback(lambda f: GLib.idle_add(self._deliver, f, then))
+
+    def _deliver(self, future, then: Callable):
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.debug(f"[IconLoader] Background load failed: {e}")
+            result = None
+        then(result)
+        return False
+
+    def _finish(self, key: tuple, size: int, pixbuf):
+        if pixbuf is None:
+            self._failed[key] = time.monotonic() + FAILURE_RETRY_S
+            pixbuf = self.placeholder(size)
+        else:
+            self._failed.pop(key, None)
+            self.cache.put(key, pixbuf)
+        for callback in self._pending.pop(key, []):
+            try:
+                callback(pixbuf)
+            except Exception as e:
+                logger.exception(f"[IconLoader] Icon callback failed: {e}")
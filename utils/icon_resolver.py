@@ -1,6 +1,8 @@
+import atexit
 import json
 import os
 import re
+import threading
 
 import gi
 
@@ -9,13 +11,32 @@ from gi.repository import GLib, Gtk
 from loguru import logger
 
 import config.data as data
+from utils.desktop_apps import DesktopAppRegistry
+from utils.icon_theme_cache import theme_has_icon
+from utils.pixbuf_cache import PixbufCache
 
 ICON_CACHE_FILE = data.CACHE_DIR + "/icons.json"
 if not os.path.exists(data.CACHE_DIR):
     os.makedirs(data.CACHE_DIR)
 
+# New icons are written out together once lookups have settled
+PERSIST_DELAY_MS = 2000
+
+
+def _tokens(name: str) -> list[str]:
+    return list(filter(None, re.split(r"-|\.|_|\s", name.lower())))
+
 
 class IconResolver:
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if IconResolver.instance is None:
+            IconResolver.instance = IconResolver()
+
+        return IconResolver.instance
+
     def __init__(self, default_applicaiton_icon: str = "application-x-executable-symbolic"):
         if os.path.exists(ICON_CACHE_FILE):
             with open(ICON_CACHE_FILE) as f:
@@ -28,6 +49,17 @@ class IconResolver:
             self._icon_dict = {}
 
         self.default_applicaiton_icon = default_applicaiton_icon
+        # Desktop files per applications dir, built on first use
+        self._desktop_index: list[tuple[str, list[str], list[str], dict[str, int]]] | None = None
+        # app id -> desktop file path, None once a lookup came up empty
+        self._desktop_file_cache: dict[str, str | None] = {}
+        # Guards both of the above, the icon loader looks up desktop files from a worker
+        self._desktop_lock = threading.Lock()
+        self._persist_id = 0
+        self._unsaved = False
+        atexit.register(self.flush)
+
+        DesktopAppRegistry.get_initial().connect("changed", self.invalidate_desktop_files)
 
     def get_icon_name(self, app_id: str):
         if app_id in self._icon_dict:
@@ -36,34 +68,80 @@ class IconResolver:
         logger.info(
             f"[ICONS] found new icon: '{new_icon}' for app id: '{app_id}', storing..."
         )
-        self._store_new_icon(app_id, new_icon)
+        self.store_icon(app_id, new_icon)
         return new_icon
 
     def get_icon_pixbuf(self, app_id: str, size: int = 16):
-        icon_theme = Gtk.IconTheme.get_default()
+        pixbufs = PixbufCache.get_initial()
         icon_name = self.get_icon_name(app_id)
-        try:
-            # Try to load the resolved icon.
-            return icon_theme.load_icon(icon_name, size, Gtk.IconLookupFlags.FORCE_SIZE)
-        except GLib.Error as primary_error:
-            logger.warning(
-                f"Warning: Icon '{icon_name}' not found in theme. Error: {primary_error}"
+        # Try to load the resolved icon.
+        pixbuf = pixbufs.icon(icon_name, size)
+        if pixbuf is not None:
+            return pixbuf
+        logger.warning(f"Warning: Icon '{icon_name}' not found in theme.")
+        # Fallback to the default application icon.
+        pixbuf = pixbufs.icon(self.default_applicaiton_icon, size)
+        if pixbuf is None:
+            logger.error(
+                f"Error: Fallback icon '{self.default_applicaiton_icon}' also not found."
             )
-            try:
-                # Fallback to the default application icon.
-                return icon_theme.load_icon(
-                    self.default_applicaiton_icon, size, Gtk.IconLookupFlags.FORCE_SIZE
-                )
-            except GLib.Error as fallback_error:
-                logger.error(
-                    f"Error: Fallback icon '{self.default_applicaiton_icon}' also not found. Error: {fallback_error}"
-                )
-                return None
-
-    def _store_new_icon(self, app_id: str, icon: str):
+        return pixbuf
+
+    def store_icon(self, app_id: str, icon: str):
+        """Remember `icon` for `app_id`, written to the cache file shortly after."""
         self._icon_dict[app_id] = icon
-        with open(ICON_CACHE_FILE, "w") as f:
-            json.dump(self._icon_dict, f)
+        self._unsaved = True
+        if not self._persist_id:
+            self._persist_id = GLib.timeout_add(PERSIST_DELAY_MS, self._persist)
+
+    def _persist(self):
+        self._persist_id = 0
+        self.flush()
+        return False
+
+    def flush(self):
+        """Write pending icons now, replacing the cache file atomically."""
+        if self._persist_id:
+            GLib.source_remove(self._persist_id)
+            self._persist_id = 0
+        if not self._unsaved:
+            return
+        tmp_path = ICON_CACHE_FILE + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self._icon_dict, f)
+            os.replace(tmp_path, ICON_CACHE_FILE)
+            self._unsaved = False
+        except OSError as e:
+            logger.warning(f"[ICONS] Failed to write icon cache: {e}")
+
+    def invalidate_desktop_files(self, *_):
+        """Forget the desktop file index after applications were (un)installed."""
+        with self._desktop_lock:
+            self._desktop_index = None
+            self._desktop_file_cache.clear()
+
+    def _ensure_desktop_index(self):
+        with self._desktop_lock:
+            index = self._desktop_index
+        if index is not None:
+            return index
+        # Built outside the lock and swapped in whole
+        index = []
+        for data_dir in GLib.get_system_data_dirs():
+            data_dir = os.path.join(data_dir, "applications")
+            if not os.path.isdir(data_dir):
+                continue
+            files = os.listdir(data_dir)
+            names = [f.lower() for f in files]
+            tokens: dict[str, int] = {}
+            for i, name in enumerate(names):
+                for token in _tokens(name.removesuffix(".desktop")):
+                    tokens.setdefault(token, i)
+            index.append((data_dir, files, names, tokens))
+        with self._desktop_lock:
+            self._desktop_index = index
+        return index
 
     def _get_icon_from_desktop_file(self, desktop_file_path: str):
         # Retrieve the icon specified in the [Desktop Entry] section.
@@ -74,29 +152,52 @@ class IconResolver:
             return self.default_applicaiton_icon
 
     def _get_desktop_file(self, app_id: str) -> str | None:
-        data_dirs = GLib.get_system_data_dirs()
-        for data_dir in data_dirs:
-            data_dir = os.path.join(data_dir, "applications")
-            if os.path.exists(data_dir):
-                files = os.listdir(data_dir)
-                matching = [s for s in files if "".join(app_id.lower().split()) in s.lower()]
-                if matching:
-                    return os.path.join(data_dir, matching[0])
-                for word in list(filter(None, re.split(r"-|\.|_|\s", app_id))):
-                    matching = [s for s in files if word.lower() in s.lower()]
-                    if matching:
-                        return os.path.join(data_dir, matching[0])
-        return None
+        with self._desktop_lock:
+            if app_id in self._desktop_file_cache:
+                return self._desktop_file_cache[app_id]
+        desktop_index = self._ensure_desktop_index()
 
-    def _compositor_find_icon(self, app_id: str):
-        icon_theme = Gtk.IconTheme.get_default()
-        if icon_theme.has_icon(app_id):
+        def lookup(needle, files, names, tokens):
+            # A whole-token hit is cheap and usually the better match
+            i = tokens.get(needle)
+            if i is None:
+                i = next((i for i, name in enumerate(names) if needle in name), None)
+            return files[i] if i is not None else None
+
+        found = None
+        for data_dir, files, names, tokens in desktop_index:
+            for needle in ["".join(app_id.lower().split()), *_tokens(app_id)]:
+                match = lookup(needle, files, names, tokens)
+                if match:
+                    found = os.path.join(data_dir, match)
+                    break
+            if found:
+                break
+
+        with self._desktop_lock:
+            # Dropped if the applications changed while this lookup ran
+            if self._desktop_index is desktop_index:
+                self._desktop_file_cache[app_id] = found
+        return found
+
+    def known_icon_name(self, app_id: str) -> str | None:
+        """Icon name found without touching the disk, None if a desktop file scan is needed."""
+        if app_id in self._icon_dict:
+            return self._icon_dict[app_id]
+        if theme_has_icon(app_id):
             return app_id
-        if icon_theme.has_icon(app_id + "-desktop"):
+        if theme_has_icon(app_id + "-desktop"):
             return app_id + "-desktop"
+        return None
+
+    def find_desktop_icon(self, app_id: str) -> str:
+        """Icon named by the app's desktop file. Safe to call from a worker thread."""
         desktop_file = self._get_desktop_file(app_id)
         return (
             self._get_icon_from_desktop_file(desktop_file)
             if desktop_file
             else self.default_applicaiton_icon
         )
+
+    def _compositor_find_icon(self, app_id: str):
+        return self.known_icon_name(app_id) or self.find_desktop_icon(app_id)
@@ -0,0 +1,259 @@
+import configparser
+import mmap
+import os
+import struct
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gtk
+from loguru import logger
+
+CACHE_FILE_NAME = "icon-theme.cache"
+FALLBACK_THEME = "hicolor"
+
+# Image flags, see gtk/updateiconcache.c
+HAS_SUFFIX_XPM = 1 << 0
+HAS_SUFFIX_SVG = 1 << 1
+HAS_SUFFIX_PNG = 1 << 2
+SUFFIXES = ((HAS_SUFFIX_PNG, ".png"), (HAS_SUFFIX_SVG, ".svg"), (HAS_SUFFIX_XPM, ".xpm"))
+UNTHEMED_SUFFIXES = (".symbolic.png", ".png", ".svg", ".xpm")
+
+_NO_OFFSET = 0xFFFFFFFF
+
+
+def icon_name_hash(name: bytes) -> int:
+    """GTK's hash for icon names, computed over signed chars."""
+    if not name:
+        return 0
+    h = (name[0] - 256 if name[0] > 127 else name[0]) & 0xFFFFFFFF
+    for c in name[1:]:
+        h = ((h << 5) - h + (c - 256 if c > 127 else c)) & 0xFFFFFFFF
+    return h
+
+
+class IconCacheFile:
+    """
+    One memory-mapped `icon-theme.cache`, read in place.
+
+    Lookups hash the name and walk its bucket chain directly in the map,
+    nothing is copied out besides the names that are compared.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        major, minor, self._hash_offset, dir_list_offset = struct.unpack_from(">HHII", self._buffer)
+        if (major, minor) != (1, 0):
+            raise ValueError(f"unsupported icon cache version {major}.{minor}")
+        (self._n_buckets,) = struct.unpack_from(">I", self._buffer, self._hash_offset)
+        (n_dirs,) = struct.unpack_from(">I", self._buffer, dir_list_offset)
+        self.directories = [
+            self._string(struct.unpack_from(">I", self._buffer, dir_list_offset + 4 + 4 * i)[0])
+            for i in range(n_dirs)
+        ]
+
+    def _string(self, offset: int) -> str:
+        end = self._buffer.find(b"\0", offset)
+        return self._buffer[offset:end].decode("utf-8", "replace")
+
+    def _find(self, name: bytes) -> int | None:
+        if not self._n_buckets:
+            return None
+        bucket = icon_name_hash(name) % self._n_buckets
+        (chain,) = struct.unpack_from(">I", self._buffer, self._hash_offset + 4 + 4 * bucket)
+        terminated = name + b"\0"
+        while chain != _NO_OFFSET:
+            next_chain, name_offset, image_list = struct.unpack_from(">III", self._buffer, chain)
+            if self._buffer[name_offset : name_offset + len(terminated)] == terminated:
+                return image_list
+            chain = next_chain
+        return None
+
+    def has_icon(self, icon_name: str) -> bool:
+        return self._find(icon_name.encode()) is not None
+
+    def lookup(self, icon_name: str) -> list[tuple[str, int]]:
+        """(directory, flags) of every image of `icon_name` in this cache."""
+        image_list = self._find(icon_name.encode())
+        if image_list is None:
+            return []
+        (n_images,) = struct.unpack_from(">I", self._buffer, image_list)
+        images = []
+        for i in range(n_images):
+            dir_index, flags = struct.unpack_from(">HH", self._buffer, image_list + 4 + 8 * i)
+            if dir_index < len(self.directories):
+                images.append((self.directories[dir_index], flags))
+        return images
+
+
+def _read_index(path: str) -> configparser.RawConfigParser | None:
+    index = configparser.RawConfigParser(strict=False, interpolation=None)
+    index.optionxform = str
+    try:
+        index.read(path, encoding="utf-8")
+    except (configparser.Error, UnicodeDecodeError) as e:
+        logger.debug(f"[IconThemeCache] Failed to parse {path}: {e}")
+        return None
+    return index
+
+
+class _ThemeDir:
+    def __init__(self, root: str, cache: IconCacheFile | None, sizes: dict[str, int]):
+        self.root = root
+        self.cache = cache
+        self.sizes = sizes
+
+
+class IconThemeCache:
+    """
+    Answers icon name lookups for the active theme from its cache files.
+
+    The active theme, everything it inherits and hicolor are searched in
+    GTK's order, together with the loose icons in the search path roots.
+    A name missing from all of them is only reported as missing when every
+    theme directory had an up-to-date cache, otherwise the answer is None
+    and the caller should ask Gtk.IconTheme. Icons compiled into GTK itself
+    are not covered.
+
+    Unlike Gtk.IconTheme the lookups are safe from any thread.
+    """
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if IconThemeCache.instance is None:
+            IconThemeCache.instance = IconThemeCache()
+            Gtk.IconTheme.get_default().connect(
+                "changed", lambda *_: IconThemeCache.instance.reload()
+            )
+
+        return IconThemeCache.instance
+
+    def __init__(self, theme_name: str | None = None, search_path: list[str] | None = None):
+        self._theme_name = theme_name
+        self._search_path = search_path
+        self._dirs: list[_ThemeDir] = []
+        self._unthemed: dict[str, str] = {}
+        self.complete = False
+        self.reload()
+
+    def reload(self):
+        """Re-read the theme chain, after the theme or its files changed."""
+        theme_name = self._theme_name or (
+            Gtk.Settings.get_default().get_property("gtk-icon-theme-name") or FALLBACK_THEME
+        )
+        search_path = self._search_path or Gtk.IconTheme.get_default().get_search_path()
+
+        dirs: list[_ThemeDir] = []
+        complete = True
+        pending = [theme_name]
+        seen = set()
+        while pending:
+            name = pending.pop(0)
+            if name in seen:
+                continue
+            seen.add(name)
+            inherits = []
+            for base in search_path:
+                root = os.path.join(base, name)
+                if not os.path.isdir(root):
+                    continue
+                index = _read_index(os.path.join(root, "index.theme"))
+                sizes = {}
+                if index is not None and index.has_section("Icon Theme"):
+                    if not inherits and index.has_option("Icon Theme", "Inherits"):
+                        inherits = [
+                            theme.strip()
+                            for theme in index.get("Icon Theme", "Inherits").split(",")
+                            if theme.strip()
+                        ]
+                    for section in index.sections():
+                        if index.has_option(section, "Size"):
+                            try:
+                                sizes[section] = int(index.get(section, "Size"))
+                            except ValueError:
+                                pass
+                cache = self._open_cache(root)
+                complete = complete and cache is not None
+                dirs.append(_ThemeDir(root, cache, sizes))
+            pending.extend(inherits)
+            if not pending and FALLBACK_THEME not in seen:
+                pending.append(FALLBACK_THEME)
+
+        unthemed = {}
+        for base in search_path:
+            try:
+                entries = list(os.scandir(base))
+            except OSError:
+                continue
+            for entry in entries:
+                for suffix in UNTHEMED_SUFFIXES:
+                    if entry.name.endswith(suffix):
+                        unthemed.setdefault(entry.name[: -len(suffix)], entry.path)
+                        break
+
+        # Swapped in whole, lookups may be running on other threads
+        self._dirs, self._unthemed, self.complete = dirs, unthemed, complete
+        logger.debug(
+            f"[IconThemeCache] {theme_name}: {len(dirs)} theme dirs, "
+            f"{sum(d.cache is not None for d in dirs)} cached"
+        )
+
+    @staticmethod
+    def _open_cache(root: str) -> IconCacheFile | None:
+        path = os.path.join(root, CACHE_FILE_NAME)
+        try:
+            # GTK ignores caches older than their theme directory, so do we
+            if os.stat(path).st_mtime < os.stat(root).st_mtime:
+                return None
+            return IconCacheFile(path)
+        except (OSError, ValueError, struct.error) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.debug(f"[IconThemeCache] Ignoring {path}: {e}")
+            return None
+
+    def has_icon(self, icon_name: str) -> bool | None:
+        """True or False when the caches know, None when only GTK can tell."""
+        if not icon_name:
+            return False
+        dirs, unthemed, complete = self._dirs, self._unthemed, self.complete
+        for theme_dir in dirs:
+            if theme_dir.cache is not None and theme_dir.cache.has_icon(icon_name):
+                return True
+        if icon_name in unthemed:
+            return True
+        return False if complete else None
+
+    def lookup(self, icon_name: str) -> list[tuple[int | None, str]]:
+        """
+        (size, path) of every cached image of `icon_name`, in lookup order.
+        The size is None for directories the theme doesn't describe.
+        """
+        found = []
+        for theme_dir in self._dirs:
+            if theme_dir.cache is None:
+                continue
+            for directory, flags in theme_dir.cache.lookup(icon_name):
+                for flag, suffix in SUFFIXES:
+                    if flags & flag:
+                        found.append(
+                            (
+                                theme_dir.sizes.get(directory),
+                                os.path.join(theme_dir.root, directory, icon_name + suffix),
+                            )
+                        )
+        path = self._unthemed.get(icon_name)
+        if path is not None:
+            found.append((None, path))
+        return found
+
+
+def theme_has_icon(icon_name: str) -> bool:
+    """Gtk.IconTheme.has_icon on the default theme, answered from the caches when possible."""
+    found = IconThemeCache.get_initial().has_icon(icon_name)
+    if found is None:
+        found = Gtk.IconTheme.get_default().has_icon(icon_name)
+    return found
@@ -0,0 +1,239 @@
+import functools
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from fabric.hyprland.service import Hyprland
+from gi.repository import GLib
+from loguru import logger
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, float("inf"))
+
+# Seconds between summary log lines, 0 disables them
+LOG_INTERVAL = int(os.getenv("HYPRFABRICATED_IPC_STATS_INTERVAL", "0") or 0)
+
+# Frames from these files are IPC plumbing, the caller is whoever called into them
+_PLUMBING = (
+    "ipc_stats.py",
+    "hyprland_ipc.py",
+    "hyprland_monitor.py",
+    "hyprland_state.py",
+    os.path.join("fabric", "hyprland", "service.py"),
+)
+
+# Callers set by `attribute_to`, they take precedence over the call stack
+_attributed = threading.local()
+
+
+def command_name(command: str) -> str:
+    """
+    Reduce a raw request to something worth counting,
+    e.g. "j/clients" -> "clients", "dispatch focuswindow address:0x1" -> "dispatch focuswindow".
+    """
+    if command.startswith("[[BATCH]]"):
+        names = (command_name(part) for part in command[len("[[BATCH]]"):].split(";"))
+        return "batch(" + ",".join(names) + ")"
+    head, _, tail = command.partition(" ")
+    # Drop the flags in front of the command ("j/clients", "/dispatch")
+    words = [head.split("/", 1)[-1], *tail.split()]
+    if words[0] in ("dispatch", "keyword") and len(words) > 1:
+        return f"{words[0]} {words[1]}"
+    return words[0]
+
+
+def find_caller() -> str | tuple[str, ...]:
+    """
+    `module:function` of the first frame outside the IPC plumbing, or the
+    callers set by an enclosing `attribute_to`.
+    """
+    callers = getattr(_attributed, "callers", None)
+    if callers:
+        return callers
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.endswith(_PLUMBING):
+            module = frame.f_globals.get("__name__", "?")
+            return f"{module}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+@contextmanager
+def attribute_to(callers):
+    """
+    Attribute requests sent inside the block to `callers` instead of the
+    call stack, for requests made on someone else's behalf (e.g. a refresh
+    of state that several modules invalidated).
+    """
+    previous = getattr(_attributed, "callers", None)
+    _attributed.callers = tuple(sorted(callers))
+    try:
+        yield
+    finally:
+        _attributed.callers = previous
+
+
+def count_fabric_requests():
+    """
+    Record every `Hyprland.send_command` round trip, including the ones
+    fabric's own widgets make. Call once, before any widget is created.
+    """
+    send = Hyprland.__dict__["send_command"]
+    is_static = isinstance(send, staticmethod)
+    send = send.__func__ if is_static else send
+    if getattr(send, "_ipc_stats", False):
+        return
+
+    @functools.wraps(send)
+    def send_command(*args, **kwargs):
+        command = kwargs.get("command", args[-1] if args else "")
+        started = time.monotonic()
+        reply = None
+        try:
+            reply = send(*args, **kwargs)
+            return reply
+        finally:
+            IPCStats.get_initial().record(
+                command,
+                find_caller(),
+                started,
+                len(reply.reply) if reply is not None else 0,
+                reply is None,
+            )
+
+    send_command._ipc_stats = True
+    Hyprland.send_command = staticmethod(send_command) if is_static else send_command
+
+
+class _Entry:
+    __slots__ = ("calls", "errors", "bytes", "total_ms", "max_ms", "histogram")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.bytes = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * len(LATENCY_BUCKETS_MS)
+
+    def add(self, latency_ms: float, nbytes: int, error: bool):
+        self.calls += 1
+        self.errors += error
+        self.bytes += nbytes
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if latency_ms <= bound:
+                self.histogram[i] += 1
+                break
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "histogram": {
+                f"<={bound}ms" if bound != float("inf") else f">{LATENCY_BUCKETS_MS[-2]}ms": count
+                for bound, count in zip(LATENCY_BUCKETS_MS, self.histogram)
+                if count
+            },
+        }
+
+
+class IPCStats:
+    """
+    Counts Hyprland IPC round trips per command and per caller.
+
+    Every request through `HyprlandIPC` or fabric's `Hyprland.send_command`
+    is recorded with its latency and reply size. A request made for several
+    callers counts once for each of them, so the per-caller numbers can add
+    up to more than the total. Read the numbers with
+    `fabric-cli exec hyprfabricated "app.ipc_stats()"`.
+    """
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if IPCStats.instance is None:
+            IPCStats.instance = IPCStats()
+            if LOG_INTERVAL > 0:
+                GLib.timeout_add_seconds(LOG_INTERVAL, IPCStats.instance._log_summary)
+
+        return IPCStats.instance
+
+    def __init__(self):
+        # Blocking requests are also sent from worker threads
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.started = time.monotonic()
+        self.total = _Entry()
+        self.by_command: dict[str, _Entry] = defaultdict(_Entry)
+        self.by_caller: dict[str, _Entry] = defaultdict(_Entry)
+        self._logged_calls = 0
+        self._logged_at = self.started
+
+    def record(
+        self,
+        command: str,
+        caller: str | tuple[str, ...],
+        started: float,
+        nbytes: int = 0,
+        error: bool = False,
+    ):
+        """Record one round trip that began at `started` (time.monotonic())."""
+        latency_ms = (time.monotonic() - started) * 1000
+        name = command_name(command)
+        with self._lock:
+            self.total.add(latency_ms, nbytes, error)
+            self.by_command[name].add(latency_ms, nbytes, error)
+            for caller in (caller,) if isinstance(caller, str) else caller:
+                self.by_caller[caller].add(latency_ms, nbytes, error)
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            uptime = time.monotonic() - self.started
+            return {
+                "uptime_s": round(uptime, 1),
+                "calls_per_s": round(self.total.calls / uptime, 3) if uptime else 0.0,
+                "total": self.total.as_dict(),
+                "commands": {
+                    name: entry.as_dict()
+                    for name, entry in sorted(self.by_command.items(), key=lambda kv: -kv[1].calls)
+                },
+                "callers": {
+                    name: entry.as_dict()
+                    for name, entry in sorted(self.by_caller.items(), key=lambda kv: -kv[1].calls)
+                },
+            }
+
+    def _log_summary(self):
+        now = time.monotonic()
+        with self._lock:
+            total_calls, total_errors = self.total.calls, self.total.errors
+            top = ", ".join(
+                f"{name}={entry.calls}"
+                for name, entry in sorted(self.by_command.items(), key=lambda kv: -kv[1].calls)[:5]
+            )
+        calls = total_calls - self._logged_calls
+        rate = calls / (now - self._logged_at) if now > self._logged_at else 0.0
+        logger.info(
+            f"[IPC] {calls} calls in the last {LOG_INTERVAL}s ({rate:.2f}/s), "
+            f"{total_calls} total, {total_errors} errors, top: {top or 'none'}"
+        )
+        self._logged_calls = total_calls
+        self._logged_at = now
+        return True
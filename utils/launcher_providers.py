@@ -0,0 +1,437 @@
+import ast
+import json
+import os
+import re
+import subprocess
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from fabric.utils import exec_shell_command_async, get_relative_path
+from gi.repository import GLib
+from loguru import logger
+
+from utils.app_resolver import AppResolver
+from utils.calculator import CalculatorError, evaluate, format_result
+from utils.desktop_apps import DesktopAppRegistry, app_id
+from utils.file_index import FileIndex
+from utils.frecency import UsageStore
+from utils.functions import open_file
+from utils.fuzzy import FuzzyMatcher
+from utils.hyprland_ipc import HyprlandIPC
+from utils.hyprland_state import HyprlandState
+from utils.pixbuf_cache import PixbufCache
+
+FALLBACK_ICON = "application-x-executable-symbolic"
+
+# Scored above any fuzzy match, a valid expression is almost surely what was meant
+CALCULATOR_SCORE = 1000
+
+EMOJI_FILE = get_relative_path("../assets/emoji.json")
+
+
+def copy_to_clipboard(text: str):
+    try:
+        subprocess.run(["wl-copy"], input=text.encode(), check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.warning(f"[Launcher] Clipboard copy failed: {e}")
+
+
+class SearchResult:
+    """One launcher row, from any provider."""
+
+    __slots__ = ("title", "subtitle", "score", "activate", "icon_name", "icon_getter", "app", "usage_key")
+
+    def __init__(
+        self,
+        title: str,
+        score: float,
+        activate: Callable[[], object],
+        subtitle: str | None = None,
+        icon_name: str | None = None,
+        icon_getter: Callable[[int], object] | None = None,
+        app=None,
+        usage_key: str | None = None,
+    ):
+        self.title = title
+        self.score = score
+        self.activate = activate
+        self.subtitle = subtitle
+        self.icon_name = icon_name
+        self.icon_getter = icon_getter
+        self.app = app
+        self.usage_key = usage_key
+
+    def icon(self, size: int):
+        """Icon pixbuf, only to be called from the main thread."""
+        pixbufs = PixbufCache.get_initial()
+        pixbuf = None
+        if self.app is not None:
+            pixbuf = pixbufs.app_icon(self.app, size)
+        elif self.icon_getter is not None:
+            pixbuf = self.icon_getter(size)
+        return pixbuf or pixbufs.icon(self.icon_name or FALLBACK_ICON, size)
+
+
+class Provider:
+    """
+    A source of launcher results.
+
+    `prepare` runs on the main thread before every search and may collect
+    whatever GTK or service state the search needs. `search` then runs on
+    the provider's own worker thread, so one provider never searches twice
+    at once. Long searches should return what they found by `deadline`,
+    and stop early once `stale()` is True.
+    """
+
+    name = ""
+    # Time a search may take before its results are considered late
+    budget_ms = 50
+    # Added to every score, to weigh providers against each other
+    weight = 0
+    min_query_length = 1
+    max_results = 10
+
+    def accepts(self, query: str) -> bool:
+        return len(query.strip()) >= self.min_query_length
+
+    def prepare(self, query: str):
+        return None
+
+    def search(self, query: str, context, deadline: float, stale: Callable[[], bool]) -> list[SearchResult] | None:
+        raise NotImplementedError
+
+
+class AppProvider(Provider):
+    name = "apps"
+    budget_ms = 100
+    min_query_length = 0
+    max_results = None
+
+    def __init__(self):
+        self.registry = DesktopAppRegistry.get_initial()
+        self.usage = UsageStore.get_initial()
+        self._matcher: FuzzyMatcher | None = None
+        self._generation = -1
+
+    def prepare(self, query: str) -> FuzzyMatcher:
+        # Rebuilt only when the installed applications changed
+        if self._matcher is None or self._generation != self.registry.generation:
+            self._matcher = FuzzyMatcher(
+                sorted(self.registry.apps, key=lambda app: (app.display_name or "").casefold()),
+                lambda app: (app.display_name, app.name, app.generic_name),
+            )
+            self._generation = self.registry.generation
+        return self._matcher
+
+    def search(self, query, matcher, deadline, stale):
+        ranked = matcher.search_scored(query, lambda app: self.usage.bonus(app_id(app)), stale)
+        if ranked is None:
+            return None
+        return [
+            SearchResult(
+                app.display_name or "Unknown",
+                score + self.weight,
+                app.launch,
+                subtitle=app.description,
+                app=app,
+                usage_key=app_id(app),
+            )
+            for app, score in ranked
+        ]
+
+
+class CalculatorProvider(Provider):
+    name = "calculator"
+    budget_ms = 20
+
+    def accepts(self, query: str) -> bool:
+        # Bare numbers and lone constants like `e` are more likely part of an app name than a sum
+        query = query.strip()
+        if not query or re.fullmatch(r"[\d.,\s]+", query):
+            return False
+        try:
+            return not isinstance(ast.parse(query, mode="eval").body, ast.Name)
+        except SyntaxError:
+            return True  # Shorthands like `5!` only parse once the calculator rewrote them
+
+    def search(self, query, context, deadline, stale):
+        try:
+            result = format_result(evaluate(query))
+        except CalculatorError:
+            return []
+        return [
+            SearchResult(
+                f"= {result}",
+                CALCULATOR_SCORE,
+                lambda: copy_to_clipboard(result),
+                subtitle=f"{query.strip()} = {result}",
+                icon_name="accessories-calculator-symbolic",
+            )
+        ]
+
+
+class WindowProvider(Provider):
+    name = "windows"
+    budget_ms = 30
+    min_query_length = 2
+
+    def prepare(self, query: str):
+        return HyprlandState.get_initial().clients
+
+    def search(self, query, clients, deadline, stale):
+        clients = [client for client in clients if client.mapped and client.title]
+        ranked = FuzzyMatcher(clients, lambda client: (client.title, client.class_name)).search_scored(
+            query, cancelled=stale
+        )
+        if ranked is None:
+            return None
+        return [
+            SearchResult(
+                client.title,
+                score + self.weight,
+                lambda address=client.address: HyprlandIPC.get_initial().dispatch(
+                    f"focuswindow address:{address}"
+                ),
+                subtitle=f"{client.class_name} on workspace {client.workspace_name or client.workspace_id}",
+                icon_getter=lambda size, window_class=client.class_name: PixbufCache.get_initial().app_icon(
+                    AppResolver.get_initial().find(window_class, fuzzy=True), size
+                ),
+            )
+            for client, score in ranked[: self.max_results]
+        ]
+
+
+class EmojiProvider(Provider):
+    name = "emoji"
+    budget_ms = 50
+    weight = -32
+    min_query_length = 2
+    max_results = 8
+
+    def __init__(self):
+        self._matcher: FuzzyMatcher | None = None
+
+    def _build(self) -> FuzzyMatcher:
+        try:
+            with open(EMOJI_FILE) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[Launcher] Failed to read emoji data: {e}")
+            data = {}
+        return FuzzyMatcher(
+            [(char, info.get("name", "")) for char, info in data.items()],
+            lambda entry: (entry[1],),
+        )
+
+    def search(self, query, context, deadline, stale):
+        if self._matcher is None:
+            # Built on the worker, the emoji data is only read on first use
+            self._matcher = self._build()
+        ranked = self._matcher.search_scored(query, cancelled=stale)
+        if ranked is None:
+            return None
+        return [
+            SearchResult(
+                f"{char}  {name.capitalize()}",
+                score + self.weight,
+                lambda char=char: copy_to_clipboard(char),
+                subtitle="Copy to clipboard",
+                icon_name="face-smile-symbolic",
+            )
+            for (char, name), score in ranked[: self.max_results]
+        ]
+
+
+class CommandProvider(Provider):
+    name = "commands"
+    budget_ms = 50
+    weight = -16
+    min_query_length = 2
+
+    def __init__(self):
+        self.usage = UsageStore.get_initial()
+        self._matcher: FuzzyMatcher | None = None
+        self._path_state: tuple = ()
+
+    def _ensure_commands(self):
+        dirs = [d for d in os.environ.get("PATH", "").split(os.pathsep) if d]
+        state = tuple((d, os.stat(d).st_mtime_ns if os.path.isdir(d) else None) for d in dirs)
+        if self._matcher is not None and state == self._path_state:
+            return
+        commands = set()
+        for d in dirs:
+            try:
+                for entry in os.scandir(d):
+                    if entry.is_file() and os.access(entry.path, os.X_OK):
+                        commands.add(entry.name)
+            except OSError:
+                continue
+        self._matcher = FuzzyMatcher(sorted(commands), lambda name: (name,))
+        self._path_state = state
+
+    def search(self, query, context, deadline, stale):
+        self._ensure_commands()
+        ranked = self._matcher.search_scored(
+            query.split()[0], lambda name: self.usage.bonus(f"command:{name}"), stale
+        )
+        if ranked is None:
+            return None
+        command = query.strip()
+        results = []
+        for name, score in ranked[: self.max_results]:
+            # Arguments typed after the command are kept when it is the one run
+            line = command if command.split()[0] == name else name
+            results.append(
+                SearchResult(
+                    line,
+                    score + self.weight,
+                    lambda line=line: exec_shell_command_async(f"nohup {line}"),
+                    subtitle="Run command",
+                    icon_name="utilities-terminal-symbolic",
+                    usage_key=f"command:{name}",
+                )
+            )
+        return results
+
+
+class FileProvider(Provider):
+    name = "files"
+    budget_ms = 50
+    weight = -24
+    min_query_length = 3
+
+    def __init__(self):
+        self.index = FileIndex.get_initial()
+
+    def search(self, query, context, deadline, stale):
+        results = []
+        for score, path in self.index.search(query, self.max_results, deadline, stale):
+            results.append(
+                SearchResult(
+                    os.path.basename(path),
+                    score + self.weight,
+                    lambda path=path: open_file(path),
+                    subtitle=path,
+                    icon_name="folder-symbolic" if os.path.isdir(path) else "text-x-generic-symbolic",
+                )
+            )
+        return results
+
+
+def default_providers() -> list[Provider]:
+    return [
+        AppProvider(),
+        CalculatorProvider(),
+        WindowProvider(),
+        CommandProvider(),
+        EmojiProvider(),
+        FileProvider(),
+    ]
+
+
+class SearchPipeline:
+    """
+    Runs every provider that accepts a query in parallel.
+
+    Each query gets a new generation. Results of a provider are handed to
+    `on_results(provider, results)` on the main loop as soon as it
+    finishes, and dropped when a newer query was started meanwhile.
+    `on_settled()` follows once every provider answered or the largest
+    budget ran out, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        providers: list[Provider],
+        on_results: Callable[[Provider, list[SearchResult]], None],
+        on_settled: Callable[[], None],
+    ):
+        self.providers = providers
+        self.on_results = on_results
+        self.on_settled = on_settled
+        self.generation = 0
+        self._executors = {
+            provider: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"search-{provider.name}")
+            for provider in providers
+        }
+        self._outstanding = 0
+        self._settled = True
+        self._settle_id = 0
+
+    def search(self, query: str) -> int:
+        self.cancel()
+        generation = self.generation
+        started = time.monotonic()
+        active = [provider for provider in self.providers if provider.accepts(query)]
+        self._outstanding = len(active)
+        self._settled = False
+        if not active:
+            GLib.idle_add(self._settle, generation)
+            return generation
+        self._settle_id = GLib.timeout_add(
+            max(provider.budget_ms for provider in active), self._settle, generation
+        )
+
+        for provider in active:
+            try:
+                context = provider.prepare(query)
+            except Exception as e:
+                logger.exception(f"[Launcher] {provider.name} provider failed to prepare: {e}")
+                self._outstanding -= 1
+                continue
+            deadline = started + provider.budget_ms / 1000
+            future = self._executors[provider].submit(
+                self._run, provider, query, context, deadline, generation
+            )
+            future.add_done_callback(
+                lambda f, provider=provider: GLib.idle_add(self._deliver, generation, provider, f)
+            )
+        if not self._outstanding:
+            self._settle(generation)
+        return generation
+
+    def _run(self, provider: Provider, query: str, context, deadline: float, generation: int):
+        if generation != self.generation:
+            return None  # Superseded while queued
+        results = provider.search(query, context, deadline, lambda: generation != self.generation)
+        overrun_ms = (time.monotonic() - deadline) * 1000
+        if overrun_ms > 0 and results is not None:
+            logger.debug(f"[Launcher] {provider.name} provider ran {overrun_ms:.0f} ms over its budget")
+        return results
+
+    def _deliver(self, generation: int, provider: Provider, future):
+        if generation != self.generation:
+            return False
+        try:
+            results = future.result()
+        except Exception as e:
+            logger.exception(f"[Launcher] {provider.name} provider failed: {e}")
+            results = []
+        self._outstanding -= 1
+        # Empty answers are passed on too, the first one of a query replaces the old rows
+        self.on_results(provider, results or [])
+        if self._outstanding <= 0:
+            self._settle(generation)
+        return False
+
+    def _settle(self, generation: int):
+        if generation == self.generation and not self._settled:
+            self._settled = True
+            if self._settle_id:
+                GLib.source_remove(self._settle_id)
+            self._settle_id = 0
+            self.on_settled()
+        return False
+
+    @property
+    def settled(self) -> bool:
+        return self._settled
+
+    def cancel(self):
+        """Drop everything still in flight."""
+        self.generation += 1
+        if self._settle_id:
+            GLib.source_remove(self._settle_id)
+            self._settle_id = 0
+        self._settled = True
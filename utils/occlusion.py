@@ -1,58 +1,163 @@
-import subprocess
-import json
+from fabric.core.service import Service, Signal
+from loguru import logger
 
-def get_current_workspace():
+from utils.hyprland_state import HyprlandState
+from utils.spatial_index import SpatialIndex, monitor_layout_rect
+
+
+def resolve_region(occlusion_region, monitor_rect):
+    """
+    Convert a side-based region ("bottom", size) into absolute (x, y, width, height)
+    on the monitor `monitor_rect` (x, y, width, height in layout pixels).
+    Regions already in the full format are absolute and returned unchanged.
+    """
+    mon_x, mon_y, screen_width, screen_height = monitor_rect
+    if isinstance(occlusion_region, tuple) and len(occlusion_region) == 2:
+        side, size = occlusion_region
+        if isinstance(side, str):
+            side = side.lower()
+            if side == "bottom":
+                return (mon_x, mon_y + screen_height - size, screen_width, size)
+            elif side == "top":
+                return (mon_x, mon_y, screen_width, size)
+            elif side == "left":
+                return (mon_x, mon_y, size, screen_height)
+            elif side == "right":
+                return (mon_x + screen_width - size, mon_y, size, screen_height)
+
+    if not isinstance(occlusion_region, tuple) or len(occlusion_region) != 4:
+        return None
+    return occlusion_region
+
+
+class OcclusionEngine(Service):
     """
-    Get the current workspace ID using hyprctl.
+    In-process window geometry model fed by the Hyprland event socket.
+
+    Occlusion queries are answered from memory and subscribers are told
+    through `occlusion-changed` whenever a registered region flips state.
     """
-    try:
-        result = subprocess.run(
-            ["hyprctl", "activeworkspace"],
-            capture_output=True,
-            text=True
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if OcclusionEngine.instance is None:
+            OcclusionEngine.instance = OcclusionEngine()
+
+        return OcclusionEngine.instance
+
+    @Signal
+    def occlusion_changed(self, name: str, occluded: bool) -> None: ...
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.state = HyprlandState.get_initial()
+        # Window rectangles per workspace, also used by the overview for hit-testing
+        self.index = SpatialIndex()
+        # name -> (region, monitor name or None for the focused monitor)
+        self._regions: dict[str, tuple] = {}
+        self._states: dict[str, bool] = {}
+
+        self.state.connect("clients-changed", lambda *_: self.refresh())
+        self.state.connect("monitors-changed", lambda *_: self.evaluate())
+        self.state.connect("active-workspace-changed", lambda *_: self.evaluate())
+
+        self.refresh()
+
+    def refresh(self):
+        """Sync the geometry model with the shared state and re-evaluate regions."""
+        changed = self.index.sync(
+            (
+                client.address,
+                client.workspace_id,
+                (client.at[0], client.at[1], client.size[0], client.size[1]),
+            )
+            for client in self.state.clients
+            if client.mapped
         )
-        # Assume the output similar to: "ID <number>"
-        # Extracting the number from the output
-        parts = result.stdout.split()
-        for i, part in enumerate(parts):
-            if part == "ID" and i + 1 < len(parts):
-                return int(parts[i+1])
-    except Exception as e:
-        print(f"Error getting current workspace: {e}")
-    return -1
+        if changed:
+            self.evaluate()
+
+    @property
+    def workspace_id(self) -> int:
+        workspace = self.state.active_workspace
+        return workspace.id if workspace else -1
+
+    def get_monitor(self, name: str | None = None):
+        """Monitor by connector name, or the focused one when `name` is None."""
+        monitors = self.state.monitors
+        for monitor in monitors:
+            if (monitor.name == name) if name else monitor.focused:
+                return monitor
+        return monitors[0] if monitors else None
+
+    def screen_dimensions(self, monitor_name: str | None = None):
+        """Return (width, height) of a monitor in layout pixels."""
+        monitor = self.get_monitor(monitor_name)
+        if monitor is None:
+            return 1920, 1080
+        return monitor_layout_rect(monitor)[2:]
+
+    def is_region_occupied(self, occlusion_region, workspace=None, monitor_name=None) -> bool:
+        """
+        Check if a region of a monitor is covered by any window, answered from memory.
+        Side-based regions are placed on that monitor, (x, y, width, height)
+        regions are absolute. By default the workspace checked is the one
+        shown on that monitor.
+        """
+        monitor = self.get_monitor(monitor_name)
+        if monitor is None:
+            return False
+
+        if workspace is None:
+            workspace = monitor.active_workspace_id
+
+        region = resolve_region(occlusion_region, monitor_layout_rect(monitor))
+        if region is None:
+            logger.warning(f"[Occlusion] Invalid occlusion region format: {occlusion_region}")
+            return False
+
+        return self.index.is_occupied(workspace, region)
+
+    def register(self, name: str, occlusion_region, monitor_name: str | None = None) -> bool:
+        """Track a named region and return its current occluded state."""
+        self._regions[name] = (occlusion_region, monitor_name)
+        self._states[name] = self.is_region_occupied(occlusion_region, monitor_name=monitor_name)
+        return self._states[name]
+
+    def unregister(self, name: str):
+        self._regions.pop(name, None)
+        self._states.pop(name, None)
+
+    def is_occluded(self, name: str) -> bool:
+        return self._states.get(name, False)
+
+    def evaluate(self):
+        """Recompute registered regions and notify about the ones that changed."""
+        for name, (region, monitor_name) in self._regions.items():
+            occluded = self.is_region_occupied(region, monitor_name=monitor_name)
+            if occluded != self._states.get(name):
+                self._states[name] = occluded
+                self.emit("occlusion-changed", name, occluded)
+
+
+def get_current_workspace():
+    """
+    Get the current workspace ID from the occlusion engine.
+    """
+    return OcclusionEngine.get_initial().workspace_id
+
 
 def get_screen_dimensions():
     """
-    Get screen dimensions from hyprctl.
-    
+    Get screen dimensions of the focused monitor.
+
     Returns:
-        tuple: (width, height) of the monitor containing the current workspace
+        tuple: (width, height) of the focused monitor in layout pixels
     """
-    try:
-        # Get current workspace
-        workspace_id = get_current_workspace()
-        
-        # Get monitor information
-        result = subprocess.run(
-            ["hyprctl", "-j", "monitors"],
-            capture_output=True,
-            text=True
-        )
-        monitors = json.loads(result.stdout)
-        
-        # Find the monitor containing our workspace
-        for monitor in monitors:
-            if monitor.get("activeWorkspace", {}).get("id") == workspace_id:
-                return monitor.get("width", 1920), monitor.get("height", 1080)
-                
-        # Fallback to first monitor
-        if monitors:
-            return monitors[0].get("width", 1920), monitors[0].get("height", 1080)
-    except Exception as e:
-        print(f"Error getting screen dimensions: {e}")
-    
-    # Default fallback values
-    return 1920, 1080
+    return OcclusionEngine.get_initial().screen_dimensions()
+
 
 def check_occlusion(occlusion_region, workspace=None):
     """
@@ -62,74 +167,12 @@ def check_occlusion(occlusion_region, workspace=None):
         occlusion_region: Can be one of:
             - tuple (side, size): where side is "top", "bottom", "left", or "right"
               and size is the pixel width of the region
-            - tuple (x, y, width, height): The full region coordinates (legacy format)
-        workspace (int, optional): The workspace ID to check. If None, the current workspace is used.
+            - tuple (x, y, width, height): The full region in absolute layout
+              coordinates (legacy format)
+        workspace (int, optional): The workspace ID to check. If None, the workspace shown
+            on the focused monitor is used.
 
     Returns:
         bool: True if any window overlaps with the occlusion region, False otherwise.
     """
-    if workspace is None:
-        workspace = get_current_workspace()
-    
-    # Handle simplified side-based format
-    if isinstance(occlusion_region, tuple) and len(occlusion_region) == 2:
-        side, size = occlusion_region
-        if isinstance(side, str):
-            # Convert side-based format to coordinates
-            screen_width, screen_height = get_screen_dimensions()
-            
-            if side.lower() == "bottom":
-                occlusion_region = (0, screen_height - size, screen_width, size)
-            elif side.lower() == "top":
-                occlusion_region = (0, 0, screen_width, size)
-            elif side.lower() == "left":
-                occlusion_region = (0, 0, size, screen_height)
-            elif side.lower() == "right":
-                occlusion_region = (screen_width - size, 0, size, screen_height)
-    
-    # Ensure occlusion_region is in the correct format (x, y, width, height)
-    if not isinstance(occlusion_region, tuple) or len(occlusion_region) != 4:
-        print(f"Invalid occlusion region format: {occlusion_region}")
-        return False
-
-    try:
-        result = subprocess.run(
-            ["hyprctl", "-j", "clients"],
-            capture_output=True,
-            text=True
-        )
-        clients = json.loads(result.stdout)
-    except Exception as e:
-        print(f"Error retrieving client windows: {e}")
-        return False
-
-    occ_x, occ_y, occ_width, occ_height = occlusion_region
-    occ_x2 = occ_x + occ_width
-    occ_y2 = occ_y + occ_height
-
-    for client in clients:
-        # Check if client is mapped
-        if not client.get("mapped", False):
-            continue
-
-        # Ensure client has proper workspace information and matches the workspace
-        client_workspace = client.get("workspace", {})
-        if client_workspace.get("id") != workspace:
-            continue
-
-        # Ensure client has position and size info
-        position = client.get("at")
-        size = client.get("size")
-        if not position or not size:
-            continue
-
-        x, y = position
-        width, height = size
-        win_x1, win_y1 = x, y
-        win_x2, win_y2 = x + width, y + height
-
-        # Check for intersection between the window and occlusion region
-        if not (win_x2 <= occ_x or win_x1 >= occ_x2 or win_y2 <= occ_y or win_y1 >= occ_y2):
-            return True  # Occlusion region is occupied
-
-    return False  # No window overlaps the occlusion region
+    return OcclusionEngine.get_initial().is_region_occupied(occlusion_region, workspace)
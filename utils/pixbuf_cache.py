@@ -0,0 +1,192 @@
+import os
+from collections import OrderedDict
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+gi.require_version("GdkPixbuf", "2.0")
+from gi.repository import GdkPixbuf, GLib, Gtk
+from loguru import logger
+
+from utils.desktop_apps import app_id
+from utils.icon_theme_cache import IconThemeCache
+
+# Decoded pixels kept around, a 48px RGBA icon is about 9 KiB
+CACHE_BUDGET_BYTES = 32 * 1024 * 1024
+
+# Icon themes kept for tray icon search paths, which some apps change on every launch
+MAX_SEARCH_PATH_THEMES = 8
+
+# Stored for lookups that failed, so they are not retried on every rebuild
+_MISSING = object()
+
+
+def _pixbuf_bytes(pixbuf) -> int:
+    return pixbuf.get_rowstride() * pixbuf.get_height()
+
+
+class PixbufCache:
+    """
+    Process-wide LRU of decoded pixbufs, keyed by what was asked for
+    (icon name or file, size and scale) and bounded by a byte budget.
+
+    Icon entries are dropped when the icon theme changes. Failed lookups
+    are remembered too and cost nothing against the budget.
+    """
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if PixbufCache.instance is None:
+            PixbufCache.instance = PixbufCache()
+
+        return PixbufCache.instance
+
+    def __init__(self, budget_bytes: int = CACHE_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self._entries: OrderedDict[tuple, object] = OrderedDict()
+        self._themes: OrderedDict[str, Gtk.IconTheme] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.theme_cache = IconThemeCache.get_initial()
+
+        Gtk.IconTheme.get_default().connect("changed", self.clear_icons)
+
+    def _get(self, key: tuple):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def _put(self, key: tuple, pixbuf):
+        old = self._entries.pop(key, None)
+        if old is not None and old is not _MISSING:
+            self.bytes -= _pixbuf_bytes(old)
+        self._entries[key] = pixbuf if pixbuf is not None else _MISSING
+        if pixbuf is not None:
+            self.bytes += _pixbuf_bytes(pixbuf)
+        while self.bytes > self.budget_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.evictions += 1
+            if evicted is not _MISSING:
+                self.bytes -= _pixbuf_bytes(evicted)
+
+    def _cached(self, key: tuple, load):
+        entry = self._get(key)
+        if entry is None:
+            try:
+                pixbuf = load()
+            except GLib.Error as e:
+                logger.debug(f"[Pixbufs] Failed to load {key}: {e}")
+                pixbuf = None
+            self._put(key, pixbuf)
+            return pixbuf
+        return None if entry is _MISSING else entry
+
+    def get(self, key: tuple):
+        """Pixbuf stored under `key` by `put`, or None."""
+        entry = self._get(key)
+        return None if entry is _MISSING else entry
+
+    def put(self, key: tuple, pixbuf):
+        self._put(key, pixbuf)
+
+    def _theme(self, search_path: str | None) -> Gtk.IconTheme:
+        if not search_path:
+            return Gtk.IconTheme.get_default()
+        theme = self._themes.get(search_path)
+        if theme is None:
+            theme = Gtk.IconTheme.new()
+            theme.prepend_search_path(search_path)
+            self._themes[search_path] = theme
+            if len(self._themes) > MAX_SEARCH_PATH_THEMES:
+                self._themes.popitem(last=False)
+        else:
+            self._themes.move_to_end(search_path)
+            # Picks up icon files added or removed since the last lookup
+            theme.rescan_if_needed()
+        return theme
+
+    def _search_path_icon(self, icon_name: str, size: int, scale: int, search_path: str):
+        # Tray apps rewrite their icon files under the same name, so the
+        # file's mtime is part of the key and a rewritten file is decoded again
+        info = self._theme(search_path).lookup_icon_for_scale(
+            icon_name, size, scale, Gtk.IconLookupFlags.FORCE_SIZE
+        )
+        if info is None:
+            return None
+        filename = info.get_filename()
+        try:
+            mtime = os.stat(filename).st_mtime_ns if filename else None
+        except OSError:
+            mtime = None
+        return self._cached(("icon", icon_name, size, scale, search_path, mtime), info.load_icon)
+
+    def icon(self, icon_name: str, size: int, scale: int = 1, search_path: str | None = None):
+        """Themed icon forced to `size`, or None when the theme doesn't have it."""
+        if not icon_name:
+            return None
+        if search_path:
+            return self._search_path_icon(icon_name, size, scale, search_path)
+        return self._cached(
+            ("icon", icon_name, size, scale, search_path),
+            lambda: self._theme(search_path).load_icon_for_scale(
+                icon_name, size, scale, Gtk.IconLookupFlags.FORCE_SIZE
+            ),
+        )
+
+    def app_icon(self, app, size: int):
+        """Icon of a DesktopApp, as returned by `app.get_icon_pixbuf(size=size)`."""
+        if app is None:
+            return None
+        icon_name = app.icon_name
+        if icon_name and not os.path.isabs(icon_name) and self.theme_cache.has_icon(icon_name) is False:
+            # Known to be missing from the theme, skip straight to the fallback
+            return self.icon("image-missing", size)
+        return self._cached(
+            ("app", icon_name or app_id(app), size, 1, None),
+            lambda: app.get_icon_pixbuf(size=size),
+        )
+
+    def file(self, path: str, width: int, height: int):
+        """Image file scaled to width x height, reloaded if the file changed."""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        return self._cached(
+            ("file", path, width, height, mtime),
+            lambda: GdkPixbuf.Pixbuf.new_from_file_at_scale(path, width, height, False),
+        )
+
+    def clear_icons(self, *_):
+        """Drop everything that came from an icon theme."""
+        for key in [k for k in self._entries if k[0] in ("icon", "app", "window")]:
+            entry = self._entries.pop(key)
+            if entry is not _MISSING:
+                self.bytes -= _pixbuf_bytes(entry)
+        for theme in self._themes.values():
+            theme.rescan_if_needed()
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
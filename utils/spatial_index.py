@@ -0,0 +1,122 @@
+from typing import Iterable, Iterator
+
+# Side of a grid cell in layout pixels. Windows are rarely smaller than this,
+# so most of them cover only a handful of cells.
+CELL_SIZE = 256
+
+
+def rects_intersect(a, b):
+    """Check whether two (x, y, width, height) rectangles overlap."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return not (ax + aw <= bx or ax >= bx + bw or ay + ah <= by or ay >= by + bh)
+
+
+def monitor_layout_rect(monitor):
+    """
+    Rectangle a monitor covers in Hyprland's layout coordinates.
+
+    Window positions are logical, so the mode size has to be divided by
+    the scale and swapped for rotated outputs.
+    """
+    width, height = monitor.width, monitor.height
+    if monitor.transform % 2 == 1:
+        width, height = height, width
+    scale = monitor.scale or 1.0
+    return (monitor.x, monitor.y, round(width / scale), round(height / scale))
+
+
+def _cells(rect) -> Iterator[tuple[int, int]]:
+    x, y, width, height = rect
+    if width <= 0 or height <= 0:
+        return
+    for cx in range(x // CELL_SIZE, (x + width - 1) // CELL_SIZE + 1):
+        for cy in range(y // CELL_SIZE, (y + height - 1) // CELL_SIZE + 1):
+            yield cx, cy
+
+
+class SpatialIndex:
+    """
+    Uniform grid of window rectangles, one grid per workspace.
+
+    Queries only look at the windows sharing a cell with the query
+    rectangle instead of scanning every client.
+    """
+
+    def __init__(self):
+        # address -> (workspace_id, rect)
+        self._windows: dict[str, tuple[int, tuple]] = {}
+        # (workspace_id, cx, cy) -> addresses
+        self._grid: dict[tuple[int, int, int], set[str]] = {}
+
+    def __len__(self):
+        return len(self._windows)
+
+    def __contains__(self, address: str):
+        return address in self._windows
+
+    def get(self, address: str):
+        return self._windows.get(address)
+
+    def insert(self, address: str, workspace_id: int, rect: tuple):
+        """Add or move a window, touching only the cells it left or entered."""
+        old = self._windows.get(address)
+        if old == (workspace_id, rect):
+            return False
+        if old is not None:
+            self.remove(address)
+        self._windows[address] = (workspace_id, rect)
+        for cx, cy in _cells(rect):
+            self._grid.setdefault((workspace_id, cx, cy), set()).add(address)
+        return True
+
+    def remove(self, address: str):
+        old = self._windows.pop(address, None)
+        if old is None:
+            return False
+        workspace_id, rect = old
+        for cx, cy in _cells(rect):
+            cell = self._grid.get((workspace_id, cx, cy))
+            if cell is not None:
+                cell.discard(address)
+                if not cell:
+                    del self._grid[(workspace_id, cx, cy)]
+        return True
+
+    def sync(self, windows: Iterable[tuple[str, int, tuple]]) -> bool:
+        """
+        Bring the index in line with a full snapshot of (address, workspace, rect).
+        Only windows that appeared, vanished, moved or resized are touched.
+        """
+        changed = False
+        seen = set()
+        for address, workspace_id, rect in windows:
+            seen.add(address)
+            changed |= self.insert(address, workspace_id, rect)
+        for address in [a for a in self._windows if a not in seen]:
+            changed |= self.remove(address)
+        return changed
+
+    def _candidates(self, workspace_id: int, rect) -> set[str]:
+        found = set()
+        for cx, cy in _cells(rect):
+            found |= self._grid.get((workspace_id, cx, cy), set())
+        return found
+
+    def query(self, workspace_id: int, rect) -> list[str]:
+        """Addresses of windows on a workspace overlapping `rect`."""
+        return [
+            address
+            for address in self._candidates(workspace_id, rect)
+            if rects_intersect(self._windows[address][1], rect)
+        ]
+
+    def is_occupied(self, workspace_id: int, rect) -> bool:
+        return any(
+            rects_intersect(self._windows[address][1], rect)
+            for address in self._candidates(workspace_id, rect)
+        )
+
+    def windows_at(self, workspace_id: int, x: int, y: int) -> list[str]:
+        """Addresses of windows on a workspace containing the point (x, y)."""
+        return self.query(workspace_id, (x, y, 1, 1))